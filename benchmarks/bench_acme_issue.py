@@ -0,0 +1,67 @@
+"""Measure issuing wildcard certificates with StratoDnsApiAcmeIssuer against the local fake Strato and fake ACME server.
+
+For 1, 8 and 32 domains a certificate for '<domain>' and '*.<domain>' is issued
+with a fresh StratoDnsApi, without waiting for propagation (the fake ACME server
+reads the records of the fake Strato). Reported are the wall-clock time, the requests
+to Strato, the pushes and logins, and the requests to the ACME server. The acme.sh
+hook would push (and without agent log in) twice per challenge, i.e. 4 times per domain.
+
+Needs the "acme" extra (cryptography).
+
+Usage: python benchmarks/bench_acme_issue.py [--records 100] [--latency 0.05] [--jobs 8]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import fake_acme
+import fake_strato
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_lock import StratoDnsApiLock
+from strato_dns_api.strato_dns_api_credentials import StratoDnsApiCredentials
+from strato_dns_api.strato_dns_api_acme_client import StratoDnsApiAcmeClient
+from strato_dns_api.strato_dns_api_acme_issue import StratoDnsApiAcmeIssuer
+
+DOMAIN_COUNTS = [1, 8, 32]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100, help='Records per domain')
+    parser.add_argument('--latency', type=float, default=0.05, help='Delay of every response of the fake servers in seconds')
+    parser.add_argument('--jobs', type=int, default=8, help='Concurrent requests of the issuer')
+    args = parser.parse_args()
+
+    print(f'records per domain: {args.records}, latency: {args.latency * 1000:.0f} ms, jobs: {args.jobs}')
+    print(f'{"domains":>8} {"wall [ms]":>10} {"requests":>9} {"pushes":>7} {"logins":>7} {"acme requests":>14} {"hook pushes":>12}')
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        account_key = StratoDnsApiAcmeClient.load_account_key(os.path.join(work_dir, 'account.key'))
+
+        for count in DOMAIN_COUNTS:
+            strato = fake_strato.FakeStrato(domains=fake_strato.domains(count, args.records), latency=args.latency)
+            acme = fake_acme.FakeAcme(fake_acme.strato_resolver(strato), latency=args.latency)
+            with fake_strato.FakeStratoServer(strato) as strato_server, fake_acme.FakeAcmeServer(acme) as acme_server:
+                api = StratoDnsApi('de', StratoDnsApiCredentials.from_dict({'username': strato.username, 'password': strato.password}),
+                    log_level=logging.WARNING, lock=StratoDnsApiLock(work_dir), api_url=strato_server.api_url)
+                client = StratoDnsApiAcmeClient(acme_server.directory_url, account_key, poll_interval=args.latency,
+                    log_level=logging.WARNING)
+                issuer = StratoDnsApiAcmeIssuer(api, client, os.path.join(work_dir, f'certs{count}'), propagation_timeout=0,
+                    workers=args.jobs, log_level=logging.WARNING)
+
+                start = time.perf_counter()
+                results = issuer.issue(list(strato.records))
+                wall = time.perf_counter() - start
+            assert all(results.values()), 'issuing failed'
+
+            print(f'{count:>8} {wall * 1000:>10.1f} {strato.stats["requests"]:>9} {strato.stats["pushes"]:>7} '
+                f'{strato.stats["logins"]:>7} {acme.stats["requests"]:>14} {4 * count:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Measure the cold start time of each strato-dns-api CLI subcommand.
+
+Every subcommand of the CLI group is started with --help in a fresh interpreter,
+which runs the whole CLI startup (imports, config loading) without talking to Strato.
+
+Usage: python benchmarks/bench_cli_startup.py [--runs N]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from strato_dns_api.__main__ import cli
+
+
+def measure(args: list[str], runs: int, env: dict) -> list[float]:
+    """Run the python interpreter with args several times and return the wall-clock time of each run."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings: list[float]):
+    print(f'{name:<14} {min(timings) * 1000:>10.1f} '
+        f'{statistics.median(timings) * 1000:>12.1f} {max(timings) * 1000:>10.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Runs per subcommand')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')])))
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json') as config:
+        json.dump({'location': 'de', 'credentials': {'username': 'user', 'password': 'password'}}, config)
+        config.flush()
+
+        print(f'{"subcommand":<14} {"min [ms]":>10} {"median [ms]":>12} {"max [ms]":>10}')
+        report('(interpreter)', measure(['-c', 'pass'], args.runs, env))
+        for subcommand in [None, *sorted(cli.commands)]:
+            cli_args = ['-m', 'strato_dns_api', '--config', config.name] + ([subcommand] if subcommand else []) + ['--help']
+            report(subcommand or '(group)', measure(cli_args, args.runs, env))
+
+
+if __name__ == '__main__':
+    main()
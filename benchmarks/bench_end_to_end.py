@@ -0,0 +1,145 @@
+"""Measure StratoDnsApi flows end to end against the local fake Strato server.
+
+Every flow starts with a fresh StratoDnsApi instance (no session, no package index),
+like a single CLI call does:
+
+  get       read the records of a domain
+  add       add a TXT record
+  remove    remove the TXT record again
+  batch     add and remove 10 TXT records with one batch
+  parallel  add a TXT record to N domains concurrently, sharing one instance
+  async     same as parallel with AsyncStratoDnsApi from one event loop (needs httpx)
+
+For each flow the wall-clock time, the HTTP round trips, the bytes sent and received
+(as seen by the server) and the logins are reported, best of --repeat runs.
+
+Usage: python benchmarks/bench_end_to_end.py [--records 100] [--latency 0.05] [--domains 8] [--repeat 3] [--totp]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import concurrent.futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import fake_strato
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_lock import StratoDnsApiLock
+from strato_dns_api.strato_dns_api_credentials import StratoDnsApiCredentials
+
+try:
+    from strato_dns_api.strato_dns_api_async import AsyncStratoDnsApi
+except ImportError:
+    AsyncStratoDnsApi = None
+
+TOTP_SECRET = 'JBSWY3DPEHPK3PXP'
+TOTP_DEVICENAME = 'benchmark'
+
+
+def new_api(server: fake_strato.FakeStratoServer, lock_dir: str, api_class: type = StratoDnsApi) -> StratoDnsApi:
+    fake = server.fake
+    credentials = StratoDnsApiCredentials.from_dict({
+        'username': fake.username,
+        'password': fake.password,
+        **({'totp_secret': fake.totp_secret, 'totp_devicename': fake.totp_devicename} if fake.totp_secret else {}),
+    })
+    return api_class('de', credentials, log_level=logging.WARNING, lock=StratoDnsApiLock(lock_dir),
+        api_url=server.api_url)
+
+
+def flow_get(api: StratoDnsApi, domains: list[str]) -> bool:
+    return len(api.get_txt_records(domains[0])) > 0
+
+
+def flow_add(api: StratoDnsApi, domains: list[str]) -> bool:
+    return api.add_txt_record(f'_acme-challenge.{domains[0]}', 'TXT', 'benchmark-value')
+
+
+def flow_remove(api: StratoDnsApi, domains: list[str]) -> bool:
+    return api.remove_txt_record(f'_acme-challenge.{domains[0]}', 'TXT', 'benchmark-value')
+
+
+def flow_batch(api: StratoDnsApi, domains: list[str]) -> bool:
+    with api.batch(domains[0]) as batch:
+        for i in range(10):
+            batch.add(f'_acme-challenge.batch{i}.{domains[0]}', 'TXT', f'benchmark-value-{i}')
+    if not batch.success:
+        return False
+    with api.batch(domains[0]) as batch:
+        for i in range(10):
+            batch.remove(f'_acme-challenge.batch{i}.{domains[0]}', 'TXT', f'benchmark-value-{i}')
+    return batch.success
+
+
+def flow_parallel(api: StratoDnsApi, domains: list[str]) -> bool:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(domains)) as executor:
+        return all(executor.map(lambda domain: api.add_txt_record(f'_acme-challenge.{domain}', 'TXT', 'parallel-value'), domains))
+
+
+def flow_async(api: 'AsyncStratoDnsApi', domains: list[str]) -> bool:
+    async def run() -> bool:
+        async with api:
+            return all(await asyncio.gather(*(api.add_txt_record(f'_acme-challenge.{domain}', 'TXT', 'async-value')
+                for domain in domains)))
+    return asyncio.run(run())
+
+
+FLOWS = {
+    'get': flow_get,
+    'add': flow_add,
+    'remove': flow_remove,
+    'batch': flow_batch,
+    'parallel': flow_parallel,
+}
+if AsyncStratoDnsApi is not None:
+    FLOWS['async'] = flow_async
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100, help='Records per domain')
+    parser.add_argument('--latency', type=float, default=0.05, help='Delay of every response of the fake server in seconds')
+    parser.add_argument('--domains', type=int, default=8, help='Number of domains of the parallel flow')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per flow, the fastest one is reported')
+    parser.add_argument('--totp', action='store_true', help='Require 2FA on login')
+    args = parser.parse_args()
+
+    print(f'records per domain: {args.records}, latency: {args.latency * 1000:.0f} ms, 2FA: {"on" if args.totp else "off"}')
+    print(f'{"flow":<10} {"wall [ms]":>10} {"requests":>9} {"sent [kB]":>10} {"received [kB]":>14} {"logins":>7}')
+
+    with tempfile.TemporaryDirectory() as lock_dir:
+        # warm up, the first call imports the third party modules
+        fake = fake_strato.FakeStrato(domains=fake_strato.domains(1, 1))
+        with fake_strato.FakeStratoServer(fake) as server:
+            flow_get(new_api(server, lock_dir), list(fake.records))
+
+        for name, flow in FLOWS.items():
+            best = None
+            for _ in range(args.repeat):
+                fake = fake_strato.FakeStrato(domains=fake_strato.domains(args.domains, args.records), latency=args.latency,
+                    totp_secret=TOTP_SECRET if args.totp else None, totp_devicename=TOTP_DEVICENAME)
+                # the remove flow needs the record of the add flow
+                if name == 'remove':
+                    fake.records['example0.com'].append({'prefix': '_acme-challenge', 'type': 'TXT', 'value': 'benchmark-value'})
+
+                with fake_strato.FakeStratoServer(fake) as server:
+                    api = new_api(server, lock_dir, AsyncStratoDnsApi if name == 'async' else StratoDnsApi)
+                    start = time.perf_counter()
+                    success = flow(api, list(fake.records))
+                    wall = time.perf_counter() - start
+                assert success, f'flow {name} failed'
+
+                if best is None or wall < best[0]:
+                    best = (wall, dict(fake.stats))
+
+            wall, stats = best
+            print(f'{name:<10} {wall * 1000:>10.1f} {stats["requests"]:>9} {stats["request_bytes"] / 1024:>10.1f} '
+                f'{stats["response_bytes"] / 1024:>14.1f} {stats["logins"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
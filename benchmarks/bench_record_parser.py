@@ -0,0 +1,70 @@
+"""Compare the record parser with the regex previously used by get_txt_records.
+
+Both are run over fixture pages with 10, 100 and 1000 records, one record per
+line, which is the only markup the regex can read. Both results are checked to
+be the fixture records before timing, so only equal work is compared. The runs
+of both are interleaved, the best one of each is reported.
+
+Usage: python benchmarks/bench_record_parser.py [--repeat N]
+"""
+import os
+import re
+import sys
+import html
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import fixtures
+from strato_dns_api.strato_dns_api_record_parser import StratoDnsApiRecordParser
+
+RECORD_COUNTS = [10, 100, 1000]
+
+LEGACY_REGEX = re.compile(
+    r'<select [^>]*name="type"[^>]*>.*?'
+    r'<option[^>]*value="(?P<type>[^"]*)"[^>]*selected[^>]*>'
+    r'.*?</select>.*?'
+    r'<input [^>]*value="(?P<prefix>[^"]*)"[^>]*name="prefix"[^>]*>'
+    r'.*?<textarea [^>]*name="value"[^>]*>(?P<value>.*?)</textarea>')
+
+
+def parse_legacy(page: str) -> list[dict]:
+    return [{
+        'prefix': record.group('prefix'),
+        'type': record.group('type'),
+        'value': record.group('value'),
+    } for record in LEGACY_REGEX.finditer(page)]
+
+
+def parse_records(page: str) -> list[dict]:
+    return [record._asdict() for record in StratoDnsApiRecordParser.parse(page)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions, the best one is reported')
+    args = parser.parse_args()
+
+    print(f'{"records":>8} {"page [kB]":>10} {"regex [ms]":>11} {"parser [ms]":>12} {"ratio":>7}')
+    for count in RECORD_COUNTS:
+        expected = fixtures.records(count)
+        page = fixtures.records_page('example.com', expected)
+
+        # the regex returns values with HTML entities, the parser decodes them
+        legacy = [dict(r, value=html.unescape(r['value'])) for r in parse_legacy(page)]
+        assert legacy == expected, 'regex returned unexpected records'
+        assert parse_records(page) == expected, 'parser returned unexpected records'
+
+        number = max(1, 1000 // count)
+        legacy_time, parser_time = float('inf'), float('inf')
+        for _ in range(args.repeat):
+            legacy_time = min(legacy_time, timeit.timeit(lambda: parse_legacy(page), number=number) / number)
+            parser_time = min(parser_time, timeit.timeit(lambda: StratoDnsApiRecordParser.parse(page), number=number) / number)
+
+        print(f'{count:>8} {len(page) / 1024:>10.1f} {legacy_time * 1000:>11.3f} {parser_time * 1000:>12.3f} '
+            f'{parser_time / legacy_time:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Compare StratoDnsApiRecordSet with the list of dicts previously used for record changes.
+
+A batch adding and then removing one ACME challenge per 10 records is applied to
+record sets of 100, 1000 and 10000 records, with the add/remove logic previously
+used on lists (one scan per add, a reverse scan per remove) and with the record set.
+Both results are checked against each other before timing.
+
+Usage: python benchmarks/bench_record_set.py [--repeat N]
+"""
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import fixtures
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecord, StratoDnsApiRecordSet
+
+RECORD_COUNTS = [100, 1000, 10000]
+
+
+def apply_legacy(records: list[dict], challenges: list[tuple[str, str]]) -> list[dict]:
+    records = [dict(r) for r in records]
+    for prefix, value in challenges:
+        matching = [r for r in records if r['prefix'] == prefix and r['type'] == 'TXT']
+        if not any(r['value'] == value for r in matching):
+            records.append({'prefix': prefix, 'type': 'TXT', 'value': value})
+    for prefix, value in challenges:
+        for i in reversed(range(len(records))):
+            if records[i]['prefix'] == prefix and records[i]['type'] == 'TXT' and value in records[i]['value']:
+                records[i]['value'] = records[i]['value'].replace(value, '').strip()
+                if not records[i]['value']:
+                    records.pop(i)
+    return records
+
+
+def apply_record_set(records: StratoDnsApiRecordSet, challenges: list[tuple[str, str]]) -> StratoDnsApiRecordSet:
+    records = records.copy()
+    for prefix, value in challenges:
+        records.add(StratoDnsApiRecord(prefix, 'TXT', value))
+    for prefix, value in challenges:
+        records.remove(StratoDnsApiRecord(prefix, 'TXT', value))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions, the best one is reported')
+    args = parser.parse_args()
+
+    print(f'{"records":>8} {"changes":>8} {"list [ms]":>10} {"record set [ms]":>16} {"ratio":>7}')
+    for count in RECORD_COUNTS:
+        records = fixtures.records(count)
+        record_set = StratoDnsApiRecordSet.from_list(records)
+        challenges = [(f'_acme-challenge.new{i}', f'new-challenge-{i:08d}') for i in range(count // 10)]
+
+        assert apply_legacy(records, challenges) == records, 'list returned unexpected records'
+        assert apply_record_set(record_set, challenges).to_list() == records, 'record set returned unexpected records'
+
+        number = max(1, 1000 // count)
+        legacy_time = min(timeit.repeat(lambda: apply_legacy(records, challenges), number=number, repeat=args.repeat)) / number
+        record_set_time = min(timeit.repeat(lambda: apply_record_set(record_set, challenges), number=number, repeat=args.repeat)) / number
+
+        print(f'{count:>8} {2 * len(challenges):>8} {legacy_time * 1000:>10.3f} {record_set_time * 1000:>16.3f} '
+            f'{record_set_time / legacy_time:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""Local stand-in for an ACME server (RFC 8555) validating DNS-01 challenges, for benchmarks and offline tests.
+
+It implements the parts of the protocol used by StratoDnsApiAcmeClient: directory,
+nonces, accounts, orders with one authorization per identifier, DNS-01 challenges,
+finalization and the certificate download. Every request must be a JWS signed with
+the account key (ES256) carrying a nonce issued by the server and its own URL.
+Instead of querying DNS, challenges are validated with a resolver function, e.g.
+the records of a FakeStrato. Certificates are signed by a CA created at start.
+
+Usage: python benchmarks/fake_acme.py [--port 14000] [--strato-port 8080] [--domains 3]
+
+Starts a fake Strato together with the fake ACME server, challenges are validated
+against the records of the fake Strato. Issue with
+"strato-dns-api issue --server <printed URL> --propagation-timeout 0 ...".
+"""
+import sys
+import json
+import time
+import base64
+import typing
+import secrets
+import argparse
+import datetime
+import threading
+import http.server
+
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
+import fake_strato
+
+
+def b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+class FakeAcme:
+    """Accounts, orders and the CA of the fake ACME server."""
+
+    def __init__(self, resolver: typing.Callable[[str], list[str]], latency: float = 0.0):
+        # TXT values of a name
+        self.resolver = resolver
+        self.latency = latency
+
+        self.ca_key = ec.generate_private_key(ec.SECP256R1())
+        now = datetime.datetime.now(datetime.timezone.utc)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'Fake ACME CA')])
+        self.ca_cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(self.ca_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=3650))
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .sign(self.ca_key, hashes.SHA256()))
+
+        # reentrant, responses take a nonce while the request holds it
+        self.lock = threading.RLock()
+        self.nonces: set[str] = set()
+        self.accounts: dict[str, ec.EllipticCurvePublicKey] = {}
+        self.orders: dict[str, dict] = {}
+        self.authorizations: dict[str, dict] = {}
+        self.challenges: dict[str, tuple[str, dict]] = {}
+        self.certificates: dict[str, str] = {}
+        self.stats = {'requests': 0, 'orders': 0, 'validations': 0, 'certificates': 0}
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def new_nonce(self) -> str:
+        nonce = secrets.token_urlsafe(16)
+        self.nonces.add(nonce)
+        return nonce
+
+    def new_order(self, base_url: str, identifiers: list[dict]) -> str:
+        order_id = secrets.token_hex(8)
+        authorizations = []
+        for identifier in identifiers:
+            wildcard = identifier['value'].startswith('*.')
+            authorization_id = secrets.token_hex(8)
+            challenge_id = secrets.token_hex(8)
+            self.challenges[challenge_id] = (authorization_id, {
+                'type': 'dns-01',
+                'url': f'{base_url}/chall/{challenge_id}',
+                'token': secrets.token_urlsafe(32),
+                'status': 'pending',
+            })
+            self.authorizations[authorization_id] = {
+                'identifier': {'type': 'dns', 'value': identifier['value'].removeprefix('*.')},
+                'status': 'pending',
+                'wildcard': wildcard,
+                'challenge_id': challenge_id,
+            }
+            authorizations.append(authorization_id)
+
+        self.orders[order_id] = {
+            'status': 'pending',
+            'identifiers': identifiers,
+            'authorization_ids': authorizations,
+            'authorizations': [f'{base_url}/authz/{a}' for a in authorizations],
+            'finalize': f'{base_url}/finalize/{order_id}',
+        }
+        self.stats['orders'] += 1
+        return order_id
+
+    def authorization(self, authorization_id: str) -> dict:
+        authorization = self.authorizations[authorization_id]
+        challenge = self.challenges[authorization['challenge_id']][1]
+        return {**{k: v for k, v in authorization.items() if k != 'challenge_id'}, 'challenges': [challenge]}
+
+    def validate(self, challenge_id: str, thumbprint: str):
+        authorization_id, challenge = self.challenges[challenge_id]
+        authorization = self.authorizations[authorization_id]
+        if challenge['status'] != 'pending':
+            return
+
+        name = f'_acme-challenge.{authorization["identifier"]["value"]}'
+        expected = b64encode(hashes_sha256(f'{challenge["token"]}.{thumbprint}'.encode('ascii')))
+        valid = expected in self.resolver(name)
+        challenge['status'] = authorization['status'] = 'valid' if valid else 'invalid'
+        if not valid:
+            challenge['error'] = {'type': 'urn:ietf:params:acme:error:unauthorized', 'detail': f'No TXT record {expected} at {name}'}
+        self.stats['validations'] += 1
+
+    def order(self, order_id: str) -> dict:
+        order = self.orders[order_id]
+        if order['status'] == 'pending':
+            statuses = {self.authorizations[a]['status'] for a in order['authorization_ids']}
+            if 'invalid' in statuses:
+                order['status'] = 'invalid'
+            elif statuses == {'valid'}:
+                order['status'] = 'ready'
+        elif order['status'] == 'processing':
+            # finalization takes one poll
+            order['status'] = 'valid'
+        return {k: v for k, v in order.items() if k != 'authorization_ids'}
+
+    def finalize(self, base_url: str, order_id: str, csr_der: bytes) -> typing.Optional[str]:
+        order = self.order(order_id)
+        if order['status'] != 'ready':
+            return f'Order is {order["status"]}'
+
+        csr = x509.load_der_x509_csr(csr_der)
+        names = set(csr.extensions.get_extension_for_class(x509.SubjectAlternativeName).value.get_values_for_type(x509.DNSName))
+        if names != {i['value'] for i in order['identifiers']} or not csr.is_signature_valid:
+            return 'CSR does not match the order'
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (x509.CertificateBuilder()
+            .subject_name(csr.subject).issuer_name(self.ca_cert.subject)
+            .public_key(csr.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=90))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(n) for n in sorted(names)]), critical=False)
+            .sign(self.ca_key, hashes.SHA256()))
+        self.certificates[order_id] = (certificate.public_bytes(serialization.Encoding.PEM)
+            + self.ca_cert.public_bytes(serialization.Encoding.PEM)).decode('ascii')
+        self.orders[order_id].update(status='processing', certificate=f'{base_url}/cert/{order_id}')
+        self.stats['certificates'] += 1
+        return None
+
+
+def hashes_sha256(data: bytes) -> bytes:
+    digest = hashes.Hash(hashes.SHA256())
+    digest.update(data)
+    return digest.finalize()
+
+
+def jwk_key(jwk: dict) -> ec.EllipticCurvePublicKey:
+    return ec.EllipticCurvePublicNumbers(
+        int.from_bytes(b64decode(jwk['x']), 'big'), int.from_bytes(b64decode(jwk['y']), 'big'), ec.SECP256R1()).public_key()
+
+
+def jwk_thumbprint(key: ec.EllipticCurvePublicKey) -> str:
+    numbers = key.public_numbers()
+    jwk = {'crv': 'P-256', 'kty': 'EC', 'x': b64encode(numbers.x.to_bytes(32, 'big')), 'y': b64encode(numbers.y.to_bytes(32, 'big'))}
+    return b64encode(hashes_sha256(json.dumps(jwk, sort_keys=True, separators=(',', ':')).encode('utf-8')))
+
+
+class FakeAcmeHandler(http.server.BaseHTTPRequestHandler):
+    """Handler answering like an ACME server."""
+
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeAcmeServer'
+
+    def do_HEAD(self):
+        if self.path != '/new-nonce':
+            return self._send(404, {})
+        self._send(200, None)
+
+    def do_GET(self):
+        if self.path == '/directory':
+            base_url = self.server.base_url
+            return self._send(200, {
+                'newNonce': f'{base_url}/new-nonce',
+                'newAccount': f'{base_url}/new-account',
+                'newOrder': f'{base_url}/new-order',
+            })
+        if self.path == '/new-nonce':
+            return self._send(204, None)
+        self._send(404, {})
+
+    def do_POST(self):
+        fake = self.server.fake
+        base_url = self.server.base_url
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+        with fake.lock:
+            fake.stats['requests'] += 1
+            protected = json.loads(b64decode(body['protected']))
+            if protected.get('nonce') not in fake.nonces:
+                return self._problem(400, 'badNonce', 'Invalid nonce')
+            fake.nonces.discard(protected['nonce'])
+            if protected.get('url') != f'{base_url}{self.path}':
+                return self._problem(401, 'unauthorized', 'URL of the JWS does not match the request')
+
+            if self.path == '/new-account':
+                key = jwk_key(protected['jwk'])
+                account_id = jwk_thumbprint(key)
+            else:
+                account_id = protected.get('kid', '').rsplit('/', 1)[-1]
+                key = fake.accounts.get(account_id)
+                if key is None:
+                    return self._problem(400, 'accountDoesNotExist', 'Unknown account')
+
+            r_s = b64decode(body['signature'])
+            try:
+                key.verify(encode_dss_signature(int.from_bytes(r_s[:32], 'big'), int.from_bytes(r_s[32:], 'big')),
+                    f'{body["protected"]}.{body["payload"]}'.encode('ascii'), ec.ECDSA(hashes.SHA256()))
+            except InvalidSignature:
+                return self._problem(401, 'unauthorized', 'Invalid signature')
+            payload = json.loads(b64decode(body['payload'])) if body['payload'] else None
+
+            kind, _, object_id = self.path[1:].partition('/')
+            if kind == 'new-account':
+                status = 200 if account_id in fake.accounts else 201
+                fake.accounts[account_id] = key
+                return self._send(status, {'status': 'valid'}, location=f'{base_url}/account/{account_id}')
+            if kind == 'new-order':
+                order_id = fake.new_order(base_url, payload['identifiers'])
+                return self._send(201, fake.order(order_id), location=f'{base_url}/order/{order_id}')
+            if kind == 'authz' and object_id in fake.authorizations:
+                return self._send(200, fake.authorization(object_id))
+            if kind == 'chall' and object_id in fake.challenges:
+                fake.validate(object_id, jwk_thumbprint(key))
+                return self._send(200, fake.challenges[object_id][1])
+            if kind == 'order' and object_id in fake.orders:
+                return self._send(200, fake.order(object_id))
+            if kind == 'finalize' and object_id in fake.orders:
+                error = fake.finalize(base_url, object_id, b64decode(payload['csr']))
+                if error:
+                    return self._problem(403, 'orderNotReady' if 'Order' in error else 'badCSR', error)
+                return self._send(200, {k: v for k, v in fake.orders[object_id].items() if k != 'authorization_ids'})
+            if kind == 'cert' and object_id in fake.certificates:
+                return self._send(200, fake.certificates[object_id], content_type='application/pem-certificate-chain')
+            return self._problem(404, 'malformed', 'Not found')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _problem(self, status: int, error: str, detail: str):
+        self._send(status, {'type': f'urn:ietf:params:acme:error:{error}', 'detail': detail},
+            content_type='application/problem+json')
+
+    def _send(self, status: int, body: typing.Union[dict, str, None], location: str = None,
+            content_type: str = 'application/json'):
+        if self.server.fake.latency:
+            time.sleep(self.server.fake.latency)
+
+        data = b'' if body is None else (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-store')
+        with self.server.fake.lock:
+            self.send_header('Replay-Nonce', self.server.fake.new_nonce())
+        if location:
+            self.send_header('Location', location)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+
+class FakeAcmeServer(http.server.ThreadingHTTPServer):
+    """HTTP server running a FakeAcme on localhost in a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self, fake: FakeAcme, port: int = 0):
+        super().__init__(('127.0.0.1', port), FakeAcmeHandler)
+        self.fake = fake
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    @property
+    def directory_url(self) -> str:
+        return f'{self.base_url}/directory'
+
+    def __enter__(self) -> 'FakeAcmeServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-acme', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self._thread.join()
+        self.server_close()
+
+
+def strato_resolver(fake: fake_strato.FakeStrato) -> typing.Callable[[str], list[str]]:
+    """Resolver serving the TXT records of a FakeStrato, as if they propagated immediately.
+
+    :param FakeStrato fake: Fake Strato with the records
+
+    :returns: Function returning the TXT values of a name
+    :rtype: typing.Callable[[str], list[str]]
+
+    """
+    def resolve(name: str) -> list[str]:
+        with fake.lock:
+            for root_domain, records in fake.records.items():
+                if name == root_domain or name.endswith(f'.{root_domain}'):
+                    prefix = name[:-len(root_domain)].rstrip('.')
+                    return [r['value'] for r in records if r['type'] == 'TXT' and r['prefix'] == prefix]
+        return []
+
+    return resolve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=14000, help='Port of the ACME server (localhost)')
+    parser.add_argument('--strato-port', type=int, default=8080, help='Port of the fake Strato (localhost)')
+    parser.add_argument('--domains', type=int, default=3, help='Number of domains example<N>.com')
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay of every response in seconds')
+    args = parser.parse_args()
+
+    strato = fake_strato.FakeStrato(domains=fake_strato.domains(args.domains, 0), latency=args.latency)
+    acme = FakeAcme(strato_resolver(strato), latency=args.latency)
+    with fake_strato.FakeStratoServer(strato, args.strato_port) as strato_server, FakeAcmeServer(acme, args.port) as acme_server:
+        print(f'Serving fake Strato CustomerService on {strato_server.api_url}, domains: {", ".join(strato.records)}')
+        print(f'Serving fake ACME directory on {acme_server.directory_url}')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
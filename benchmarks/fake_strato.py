@@ -0,0 +1,273 @@
+"""Local stand-in for the Strato CustomerService, for benchmarks and offline tests.
+
+It reproduces the parts of the customer service used by StratoDnsApi: the login
+form with the redirect carrying the sessionID, the optional 2FA page, the customer
+entry page with the package list ('kds_CustomerEntryPage'), the record form
+('action_show_txt_records') and pushing records ('action_change_txt_records').
+Every response can be delayed to simulate the latency of Strato, and all requests
+are counted with their sizes.
+
+Usage: python benchmarks/fake_strato.py [--port 8080] [--domains 3] [--records 20] [--latency 0.05]
+
+StratoDnsApi talks to it by setting "api_url" in its config file to the printed URL.
+"""
+import sys
+import time
+import secrets
+import argparse
+import threading
+import http.server
+import urllib.parse
+
+import fixtures
+
+PATH = '/apps/CustomerService'
+
+LOGIN_PAGE = (
+    '<!DOCTYPE html>\n<html><head><title>STRATO Kunden-Login</title></head>\n<body>\n'
+    f'<form method="post" action="{PATH}">\n'
+    '<input type="text" name="identifier" value="">\n'
+    '<input type="password" name="passwd" value="">\n'
+    '<input type="submit" name="action_customer_login" value="Login">\n'
+    '</form>\n</body></html>\n'
+)
+
+
+class FakeStrato:
+    """Accounts, packages and records of the fake customer service."""
+
+    def __init__(
+            self,
+            username: str = 'user',
+            password: str = 'password',
+            domains: dict[str, list[dict]] = None,
+            totp_secret: str = None,
+            totp_devicename: str = None,
+            latency: float = 0.0,
+        ):
+        self.username = username
+        self.password = password
+        # records by root domain, every domain is in its own package
+        self.records = dict(domains or {})
+        self.packages = {str(100 + i): domain for i, domain in enumerate(self.records)}
+        self.totp_secret = totp_secret
+        self.totp_devicename = totp_devicename
+        self.latency = latency
+
+        self.lock = threading.Lock()
+        self.sessions: set[str] = set()
+        self.totp_tokens: set[str] = set()
+        self.stats = {'requests': 0, 'request_bytes': 0, 'response_bytes': 0, 'logins': 0, 'pushes': 0}
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def entry_page(self) -> str:
+        rows = ''.join(
+            '<tr>'
+            f'<td class="jss_with_own_packagename"><a href="{PATH}?sessionID=x&amp;cID={package_id}&amp;node=kds_PackageOverview">'
+            f'Paket {package_id}</a></td>'
+            f'<td class="package-information">Domains: {domain}</td>'
+            '</tr>\n'
+            for package_id, domain in self.packages.items())
+        return ('<!DOCTYPE html>\n<html><head><title>STRATO Kundenservice</title></head>\n<body>\n'
+            f'<table id="package_list"><thead><tr><th>Paket</th><th>Info</th></tr></thead>\n<tbody>\n{rows}</tbody></table>\n'
+            '</body></html>\n')
+
+    def totp_page(self) -> str:
+        token = secrets.token_hex(8)
+        self.totp_tokens.add(token)
+        return ('<!DOCTYPE html>\n<html><head><title>STRATO Kunden-Login</title></head>\n<body>\n'
+            '<h1>Zwei-Faktor-Authentifizierung</h1>\n'
+            f'<form method="post" action="{PATH}">\n'
+            f'<input type="hidden" name="totp_token" value="{token}">\n'
+            f'<select name="pw_id"><option value="S.{self.username}.1234" selected="selected">{self.totp_devicename}</option>'
+            f'<option value="S.{self.username}.5678">Other device</option></select>\n'
+            '<input type="text" name="totp" value="">\n'
+            '</form>\n</body></html>\n')
+
+    def new_session(self) -> str:
+        session_id = secrets.token_hex(16)
+        self.sessions.add(session_id)
+        self.stats['logins'] += 1
+        return session_id
+
+
+class FakeStratoHandler(http.server.BaseHTTPRequestHandler):
+    """Handler answering like the Strato customer service."""
+
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeStratoServer'
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+        self._count_request(0)
+        fake = self.server.fake
+
+        if url.path != PATH:
+            return self._send(404, 'Not found')
+        if self._session(params) is None:
+            return self._send(200, LOGIN_PAGE)
+
+        node = self._param(params, 'node')
+        if node == 'kds_CustomerEntryPage':
+            return self._send(200, fake.entry_page())
+        if node == 'ManageDomains' and 'action_show_txt_records' in params:
+            domain = self._param(params, 'vhost')
+            with fake.lock:
+                records = list(fake.records.get(domain, [])) if fake.packages.get(self._param(params, 'cID')) == domain else None
+            if records is None:
+                # Strato shows the package overview if the package does not contain the domain
+                return self._send(200, fake.entry_page())
+            return self._send(200, fixtures.records_page(domain, records))
+        return self._send(200, fake.entry_page())
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        params = urllib.parse.parse_qs(body, keep_blank_values=True)
+        self._count_request(length)
+        fake = self.server.fake
+
+        if 'action_change_txt_records' in params:
+            if self._session(params) is None:
+                return self._send(200, LOGIN_PAGE)
+            domain = self._param(params, 'vhost')
+            if fake.packages.get(self._param(params, 'cID')) != domain:
+                return self._send(200, fake.entry_page())
+            records = [{'prefix': prefix, 'type': record_type, 'value': value} for prefix, record_type, value
+                in zip(params.get('prefix', []), params.get('type', []), params.get('value', []))]
+            with fake.lock:
+                fake.records[domain] = records
+                fake.stats['pushes'] += 1
+            return self._send(200, fixtures.records_page(domain, records))
+
+        if 'totp' in params:
+            import pyotp
+
+            with fake.lock:
+                valid_token = self._param(params, 'totp_token') in fake.totp_tokens
+                fake.totp_tokens.discard(self._param(params, 'totp_token'))
+            if (not valid_token or self._param(params, 'identifier') != fake.username
+                    or not pyotp.TOTP(fake.totp_secret).verify(self._param(params, 'totp'), valid_window=1)):
+                return self._send(200, LOGIN_PAGE)
+            return self._redirect_logged_in()
+
+        if 'passwd' in params:
+            if self._param(params, 'identifier') != fake.username or self._param(params, 'passwd') != fake.password:
+                return self._send(200, LOGIN_PAGE)
+            if fake.totp_secret:
+                with fake.lock:
+                    page = fake.totp_page()
+                return self._send(200, page)
+            return self._redirect_logged_in()
+
+        return self._send(400, 'Bad request')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _redirect_logged_in(self):
+        with self.server.fake.lock:
+            session_id = self.server.fake.new_session()
+        self._send(302, '', location=f'{PATH}?sessionID={session_id}&node=kds_CustomerEntryPage')
+
+    def _session(self, params: dict):
+        session_id = self._param(params, 'sessionID')
+        with self.server.fake.lock:
+            return session_id if session_id in self.server.fake.sessions else None
+
+    @staticmethod
+    def _param(params: dict, name: str):
+        return params.get(name, [None])[0]
+
+    def _count_request(self, body_length: int):
+        # request line and headers as received, plus the body
+        request_bytes = len(self.requestline) + sum(len(k) + len(v) + 4 for k, v in self.headers.items()) + body_length
+        with self.server.fake.lock:
+            self.server.fake.stats['requests'] += 1
+            self.server.fake.stats['request_bytes'] += request_bytes
+
+    def _send(self, status: int, body: str, location: str = None):
+        if self.server.fake.latency:
+            time.sleep(self.server.fake.latency)
+
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if location:
+            self.send_header('Location', location)
+        self.end_headers()
+        self.wfile.write(data)
+        with self.server.fake.lock:
+            self.server.fake.stats['response_bytes'] += len(data)
+
+
+class FakeStratoServer(http.server.ThreadingHTTPServer):
+    """HTTP server running a FakeStrato on localhost in a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self, fake: FakeStrato, port: int = 0):
+        super().__init__(('127.0.0.1', port), FakeStratoHandler)
+        self.fake = fake
+        self._thread = None
+
+    @property
+    def api_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}{PATH}'
+
+    def __enter__(self) -> 'FakeStratoServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-strato', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self._thread.join()
+        self.server_close()
+
+
+def domains(count: int, records: int) -> dict[str, list[dict]]:
+    """Generate root domains with fixture records.
+
+    :param int count: Number of domains
+    :param int records: Number of records per domain
+
+    :returns: Records by root domain
+    :rtype: dict[str, list[dict]]
+
+    """
+    return {f'example{i}.com': fixtures.records(records) for i in range(count)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on (localhost)')
+    parser.add_argument('--domains', type=int, default=3, help='Number of domains example<N>.com')
+    parser.add_argument('--records', type=int, default=20, help='Records per domain')
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay of every response in seconds')
+    parser.add_argument('--username', default='user')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--totp-secret', help='Require 2FA with this TOTP secret')
+    parser.add_argument('--totp-devicename', default='fake-device', help='Device name shown on the 2FA page')
+    args = parser.parse_args()
+
+    fake = FakeStrato(args.username, args.password, domains(args.domains, args.records),
+        totp_secret=args.totp_secret, totp_devicename=args.totp_devicename, latency=args.latency)
+    with FakeStratoServer(fake, args.port) as server:
+        print(f'Serving fake Strato CustomerService on {server.api_url}, domains: {", ".join(fake.records)}')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
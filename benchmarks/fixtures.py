@@ -0,0 +1,66 @@
+"""Fixture pages resembling the Strato customer service, for benchmarks."""
+import html
+
+SELECTED = ' selected="selected"'
+
+
+def records(count: int) -> list[dict]:
+    """Generate a record set with a mix of TXT and CNAME records.
+
+    :param int count: Number of records
+
+    :returns: Records as used by StratoDnsApi
+    :rtype: list[dict]
+
+    """
+    result = []
+    for i in range(count):
+        if i % 4 == 3:
+            result.append({'prefix': f'host{i}', 'type': 'CNAME', 'value': f'target{i}.example.net'})
+        elif i % 4 == 2:
+            result.append({'prefix': f'_dmarc{i}', 'type': 'TXT', 'value': f'v=DMARC1; p=none; rua="mailto:dmarc{i}@example.com"'})
+        else:
+            result.append({'prefix': f'_acme-challenge.sub{i}', 'type': 'TXT', 'value': f'challenge-{i:08d}-XKrxpRBosdIKFzxW_CT3KLZNf6q0HG9i01zxXp5CPBs'})
+    return result
+
+
+def records_page(root_domain: str, record_set: list[dict], pretty: bool = False) -> str:
+    """Render the 'action_show_txt_records' page for a record set.
+
+    :param str root_domain: Domain the records belong to
+    :param list record_set: Records to render
+    :param bool pretty: Put every cell of a record on its own line instead of one line per record
+
+    :returns: HTML of the page
+    :rtype: str
+
+    """
+    separator = '\n  ' if pretty else ''
+    rows = []
+    for record in record_set:
+        options = ''.join(
+            f'<option value="{record_type}"{SELECTED if record_type == record["type"] else ""}>{record_type}</option>'
+            for record_type in ('TXT', 'CNAME'))
+        rows.append(separator.join([
+            '<tr class="txt-record">',
+            f'<td><select class="form-select" name="type">{options}</select></td>',
+            f'<td><input type="text" class="form-control" value="{html.escape(record["prefix"])}" name="prefix" maxlength="63">'
+            f'<span class="suffix">.{root_domain}</span></td>',
+            f'<td><textarea class="form-control" name="value" rows="2" cols="40">{html.escape(record["value"], quote=False)}</textarea></td>',
+            '<td><a href="#" class="jss_remove_row">Entfernen</a></td>',
+            '</tr>',
+        ]))
+
+    return (
+        '<!DOCTYPE html>\n<html><head><title>STRATO Kunden-Login</title>'
+        '<link rel="stylesheet" href="/apps/CustomerService/static/style.css"></head>\n<body>\n'
+        '<div id="header"><nav><ul><li><a href="#">Paketübersicht</a></li><li><a href="#">Domains</a></li></ul></nav></div>\n'
+        f'<h1>TXT- und CNAME-Records für {root_domain}</h1>\n'
+        '<form method="post" action="/apps/CustomerService">\n'
+        '<select name="spf_type"><option value="NONE" selected="selected">Kein SPF</option><option value="STRATO">STRATO</option></select>\n'
+        '<table class="records">\n'
+        + '\n'.join(rows) +
+        '\n</table>\n'
+        '<input type="submit" class="btn" name="action_change_txt_records" value="Einstellung übernehmen">\n'
+        '</form>\n<div id="footer">&copy; STRATO AG</div>\n</body></html>\n'
+    )
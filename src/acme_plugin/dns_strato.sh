@@ -4,9 +4,12 @@ dns_cf_info='Strato
 Site: strato.de
 Options:
   STRATO_API_CONFIG_FILE  Strato API configuration file path
+  STRATO_API_SOCKET  Optional socket of a running "strato-dns-api serve" agent
+  STRATO_API_PROPAGATION_TIMEOUT  Optional seconds to wait for the record on the authoritative nameservers
 Requires:
   - python > 3.10
   - python package strato-dns-api
+  - socat (only to use the agent socket)
 '
 
 PYTHON_STRATO_DNS_API_MODULE="strato-dns-api"
@@ -25,7 +28,22 @@ dns_strato_add() {
 
   _saveaccountconf_mutable STRATO_API_CONFIG_FILE "$STRATO_API_CONFIG_FILE"
 
-  python3 -m strato_dns_api --config "$STRATO_API_CONFIG_FILE" add-record --record-type TXT --domain "$fulldomain" --value "$txtvalue"
+  wait_request=""
+  wait_opts=""
+  if [ -n "$STRATO_API_PROPAGATION_TIMEOUT" ]; then
+    _saveaccountconf_mutable STRATO_API_PROPAGATION_TIMEOUT "$STRATO_API_PROPAGATION_TIMEOUT"
+    wait_request=", \"wait\": $STRATO_API_PROPAGATION_TIMEOUT"
+    wait_opts="--wait --wait-timeout $STRATO_API_PROPAGATION_TIMEOUT"
+  fi
+
+  _strato_agent_request "{\"action\": \"add\", \"type\": \"TXT\", \"domain\": \"$fulldomain\", \"value\": \"$txtvalue\"$wait_request}"
+  agent_result=$?
+  if [ $agent_result -ne 2 ]; then
+    return $agent_result
+  fi
+
+  # shellcheck disable=SC2086
+  python3 -m strato_dns_api --config "$STRATO_API_CONFIG_FILE" add-record --record-type TXT --domain "$fulldomain" --value "$txtvalue" $wait_opts
 
   return $?
 }
@@ -39,13 +57,21 @@ dns_strato_rm() {
     return 1
   fi
 
-  python3 -m strato_dns_api --config "$STRATO_API_CONFIG_FILE" del-record --record-type TXT --domain "$fulldomain"
+  # only remove this challenge, other processes may have published challenges for the same name
+  _strato_agent_request "{\"action\": \"remove\", \"type\": \"TXT\", \"domain\": \"$fulldomain\", \"value\": \"$txtvalue\"}"
+  agent_result=$?
+  if [ $agent_result -ne 2 ]; then
+    return $agent_result
+  fi
+
+  python3 -m strato_dns_api --config "$STRATO_API_CONFIG_FILE" del-record --record-type TXT --domain "$fulldomain" --value "$txtvalue"
 
   return $?
 }
 
 _load_env() {
   STRATO_API_CONFIG_FILE="${STRATO_API_CONFIG_FILE:-$(_readaccountconf_mutable STRATO_API_CONFIG_FILE)}"
+  STRATO_API_PROPAGATION_TIMEOUT="${STRATO_API_PROPAGATION_TIMEOUT:-$(_readaccountconf_mutable STRATO_API_PROPAGATION_TIMEOUT)}"
 
   if [ -z "$STRATO_API_CONFIG_FILE" ]; then
     _err "You must specify 'STRATO_API_CONFIG_FILE' in your account conf file."
@@ -55,3 +81,35 @@ _load_env() {
 
   return 0
 }
+
+#Usage: _strato_agent_request '{"action": "add", ...}'
+#Returns 0 on success, 1 if the agent failed the request and 2 if the agent is not available
+_strato_agent_request() {
+  request=$1
+
+  if [ -z "$STRATO_API_SOCKET" ] || [ ! -S "$STRATO_API_SOCKET" ]; then
+    _debug "No Strato API agent socket available, using CLI"
+    return 2
+  fi
+  if ! _exists socat; then
+    _debug "socat not available, using CLI"
+    return 2
+  fi
+
+  _debug "Sending request to Strato API agent at $STRATO_API_SOCKET: $request"
+  response=$(printf '%s\n' "$request" | socat -t 300 - "UNIX-CONNECT:$STRATO_API_SOCKET" 2>/dev/null)
+  _debug "Strato API agent response: $response"
+
+  case "$response" in
+    *'"ok": true'*)
+      return 0
+      ;;
+    *'"ok": false'*)
+      _err "Strato API agent failed: $response"
+      return 1
+      ;;
+  esac
+
+  _debug "No valid response from Strato API agent, using CLI"
+  return 2
+}
@@ -5,11 +5,12 @@ USER_ID=${PUID:-0}
 GROUP_ID=${PGID:-0}
 
 # Parse options
+domains=""
 extra_opts=""
 while [ $# -gt 0 ]; do
   case "$1" in
     --domain)
-      domain="$2"
+      domains="$domains $2"
       shift 2
       ;;
     --email)
@@ -27,22 +28,44 @@ while [ $# -gt 0 ]; do
   esac
 done
 
-if [ -z "$domain" ] || [ -z "$email" ]; then
-  echo "Usage: $(basename $0) --domain DOMAIN --email EMAIL [extra acme.sh options]"
+if [ -z "$domains" ] || [ -z "$email" ]; then
+  echo "Usage: $(basename $0) --domain DOMAIN [--domain DOMAIN ...] --email EMAIL [extra acme.sh options]"
   exit 1
 fi
 
 echo "Creating certificates as user=$USER_ID and group=$GROUP_ID..." &&
 source /etc/environment
 source ${STRATO_ACME_VENV_DIR}/bin/activate
+set -- $domains
 set -x
-su-exec $USER_ID:$GROUP_ID sh -c "acme.sh --issue \
-  -d '$domain' -d '*.$domain' \
-  --no-cron \
-  --dns dns_strato \
-  --cert-home ${STRATO_ACME_CERTS_DIR} \
-  --config-home ${STRATO_ACME_CONFIG_DIR} \
-  --log ${STRATO_ACME_LOG_FILE}" $extra_opts
+if [ $# -eq 1 ]; then
+  domain="$1"
+  su-exec $USER_ID:$GROUP_ID sh -c "acme.sh --issue \
+    -d '$domain' -d '*.$domain' \
+    --no-cron \
+    --dns dns_strato \
+    --renew-hook '${STRATO_ACME_SCRIPTS_DIR}/deploy-cert.sh' \
+    --cert-home ${STRATO_ACME_CERTS_DIR} \
+    --config-home ${STRATO_ACME_CONFIG_DIR} \
+    --log ${STRATO_ACME_LOG_FILE}" $extra_opts
+else
+  # several domains share one Strato session and are issued in parallel
+  domain_opts=""
+  for domain in "$@"; do
+    domain_opts="$domain_opts --domain $domain"
+  done
+  # issue-certs passes the cert home to acme.sh and deploys the certificates of the run itself
+  su-exec $USER_ID:$GROUP_ID sh -c "strato-dns-api --config ${STRATO_API_CONFIG_FILE} issue-certs \
+    $domain_opts \
+    --jobs ${STRATO_API_ISSUE_JOBS:-4} \
+    --certs-dir ${STRATO_ACME_CERTS_DIR} \
+    -- \
+    --no-cron \
+    --renew-hook ${STRATO_ACME_SCRIPTS_DIR}/deploy-cert.sh \
+    --config-home ${STRATO_ACME_CONFIG_DIR} \
+    --log ${STRATO_ACME_LOG_FILE} \
+    $extra_opts"
+fi
 
 Result=$?
 { set +x; } &> /dev/null
@@ -54,4 +77,10 @@ fi
 
 echo "Certificates created!"
 
+# write the certificate to the deploy directory and notify its subscribers, if configured
+# (acme.sh runs the renew hook on renewals only, issue-certs deployed its certificates already)
+if [ $# -eq 1 ]; then
+  su-exec $USER_ID:$GROUP_ID ${STRATO_ACME_SCRIPTS_DIR}/deploy-cert.sh "$@"
+fi
+
 deactivate
\ No newline at end of file
@@ -0,0 +1,27 @@
+#! /bin/sh
+
+# Deploy certificates of the cert home to the "deploy" directory of the config and announce the changed ones.
+# Called with the domains after issuing, and as renew hook of acme.sh with the domain in $Le_Domain.
+
+# issue-certs and renew deploy all certificates of their run at once afterwards
+if [ "${STRATO_API_DEPLOY_DEFERRED:-false}" = "true" ]; then
+  exit 0
+fi
+
+if [ $# -eq 0 ]; then
+  set -- $Le_Domain
+fi
+if [ $# -eq 0 ]; then
+  echo "Usage: $(basename $0) DOMAIN [DOMAIN ...]"
+  exit 1
+fi
+
+source /etc/environment
+domain_opts=""
+for domain in "$@"; do
+  domain_opts="$domain_opts --domain $domain"
+done
+
+${STRATO_ACME_VENV_DIR}/bin/strato-dns-api --config "${STRATO_API_CONFIG_FILE}" deploy \
+  --certs-dir "${STRATO_ACME_CERTS_DIR}" \
+  $domain_opts
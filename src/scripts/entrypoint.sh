@@ -32,6 +32,29 @@ fi
 env | grep STRATO_ | sed 's/^/export /' > /etc/environment &&
 chmod +x /etc/environment
 
+# Start the Strato DNS API agent, so the acme.sh hooks share one logged in session
+if [ "${STRATO_API_AGENT:-true}" = "true" ]; then
+    echo "Starting Strato DNS API agent on ${STRATO_API_SOCKET}..."
+    mkdir -p "$(dirname "${STRATO_API_SOCKET}")" &&
+    chown $USER_ID:$GROUP_ID "$(dirname "${STRATO_API_SOCKET}")" &&
+    chmod 700 "$(dirname "${STRATO_API_SOCKET}")"
+    su-exec $USER_ID:$GROUP_ID ${STRATO_ACME_VENV_DIR}/bin/strato-dns-api \
+        --config "${STRATO_API_CONFIG_FILE}" serve --socket "${STRATO_API_SOCKET}" \
+        >> "${STRATO_ACME_LOGS_DIR}/strato-dns-api-agent.log" 2>&1 &
+fi
+
+# Renew the certificates spread over time and grouped per Strato account instead of all at once by the acme.sh cron job
+if [ "${STRATO_API_RENEW_SCHEDULER:-false}" = "true" ]; then
+    echo "Starting renewal scheduler for ${STRATO_ACME_CERTS_DIR}..."
+    # the cron job of acme.sh would renew every certificate as soon as it is due
+    acme.sh --uninstall-cronjob --config-home "${STRATO_ACME_CONFIG_DIR}" > /dev/null 2>&1
+    su-exec $USER_ID:$GROUP_ID ${STRATO_ACME_VENV_DIR}/bin/strato-dns-api \
+        --config "${STRATO_API_CONFIG_FILE}" renew --loop --certs-dir "${STRATO_ACME_CERTS_DIR}" \
+        --jobs "${STRATO_API_ISSUE_JOBS:-4}" \
+        -- --config-home "${STRATO_ACME_CONFIG_DIR}" --log "${STRATO_ACME_LOG_FILE}" \
+        >> "${STRATO_ACME_LOGS_DIR}/strato-dns-api-renew.log" 2>&1 &
+fi
+
 # Start cron and keep container running
 echo "Starting crond..."
 crond -f &
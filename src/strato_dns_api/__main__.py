@@ -1,41 +1,74 @@
+import os
 import sys
+import json
+import typing
+import datetime
 import click
 import logging
 
-from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_router import StratoDnsApiRouter
+from strato_dns_api.strato_dns_api_agent import StratoDnsApiAgent
+from strato_dns_api.strato_dns_api_bulk_issue import StratoDnsApiBulkIssuer
+from strato_dns_api.strato_dns_api_metrics import StratoDnsApiMetrics
+from strato_dns_api.strato_dns_api_sync import StratoDnsApiSync
+from strato_dns_api.strato_dns_api_renewal import StratoDnsApiRenewalScheduler
+from strato_dns_api.strato_dns_api_acme_issue import StratoDnsApiAcmeIssuer
+from strato_dns_api.strato_dns_api_deploy import StratoDnsApiDeployer
+from strato_dns_api.strato_dns_api_transport import StratoDnsApiTransport
 
 @click.group()
 @click.option('--config', '-c', type=click.Path(exists=True), required=True, help='Path to configuration file')
 @click.option('--log-level', '-l', type=click.Choice([level for level,_ in logging.getLevelNamesMapping().items()]), help='Logging level')
+@click.option('--metrics-file', type=click.Path(dir_okay=False), help='Write latency, status, size and retries of the Strato requests to this file on exit')
+@click.option('--metrics-format', type=click.Choice(StratoDnsApiMetrics.FORMATS),
+    help='Format of --metrics-file, default: "prometheus" for *.prom files (textfile collector), "json" otherwise')
 @click.pass_context
-def cli(ctx, config, log_level):
+def cli(ctx, config, log_level, metrics_file, metrics_format):
     """Strato DNS API command line interface."""
-    api = StratoDnsApi.from_config_file(config, log_level=logging.getLevelNamesMapping().get(log_level, logging.INFO))
+    level = logging.getLevelNamesMapping().get(log_level, logging.INFO)
+    api = StratoDnsApiRouter.from_config_file(config, log_level=level)
+    if metrics_file:
+        ctx.call_on_close(lambda: api.metrics.write(metrics_file, metrics_format))
     
     ctx.ensure_object(dict)
     ctx.obj['API'] = api
+    ctx.obj['LOG_LEVEL'] = level
+    ctx.obj['CONFIG'] = config
 
 @cli.command()
 @click.option('--domain', '-n', required=True, help='Full domain name to get records for')
+@click.option('--max-age', type=click.FloatRange(min=0), help='Accept records from the cache up to this age in seconds, '
+    'default: "records_max_age" of the cache config')
 @click.pass_context
-def get_records(ctx, domain):
+def get_records(ctx, domain, max_age):
     """Get DNS records."""
-    api: StratoDnsApi = ctx.obj['API']
+    api: StratoDnsApiRouter = ctx.obj['API']
 
-    records = api.get_txt_records(domain)
-    click.echo(f"Records for {domain}: {records}")
+    records = api.get_txt_records(domain, max_age=max_age)
+    click.echo(f"Records for {domain}: {records.to_list()}")
 
 @cli.command()
 @click.option('--record-type', '-t', type=click.Choice(['CNAME', 'TXT']), required=True, help='Type of DNS record to add')
 @click.option('--domain', '-n', required=True, help='Full domain name for the DNS record')
 @click.option('--value', '-v', required=True, help='Value of the DNS record')
 @click.option('--overwrite', is_flag=True, help='Overwrite existing record if it exists')
+@click.option('--wait', is_flag=True, help='Wait until all authoritative nameservers serve the TXT record')
+@click.option('--wait-timeout', type=float, default=300, show_default=True, help='Maximum seconds to wait with --wait')
+@click.option('--nameserver', 'nameservers', multiple=True, metavar='HOST[:PORT]',
+    help='Nameserver to check with --wait instead of the authoritative ones, can be repeated')
 @click.pass_context
-def add_record(ctx, record_type, domain, value, overwrite):
+def add_record(ctx, record_type, domain, value, overwrite, wait, wait_timeout, nameservers):
     """Add a DNS record."""
-    api: StratoDnsApi = ctx.obj['API']
+    api: StratoDnsApiRouter = ctx.obj['API']
     
     success = api.add_txt_record(full_domain=domain, record_type=record_type, value=value, overwrite=overwrite)
+
+    if success and wait and record_type == 'TXT':
+        # imports dnspython, only needed here
+        from strato_dns_api.strato_dns_api_propagation import StratoDnsApiPropagation
+
+        success = api.wait_for_propagation(domain, value, timeout=wait_timeout,
+            nameservers=[StratoDnsApiPropagation.parse_nameserver(ns) for ns in nameservers] or None)
     
     sys.exit(0 if success else 1)
 
@@ -46,11 +79,315 @@ def add_record(ctx, record_type, domain, value, overwrite):
 @click.pass_context
 def del_record(ctx, domain, record_type, value):
     """Delete a DNS record."""
-    api: StratoDnsApi = ctx.obj['API']
+    api: StratoDnsApiRouter = ctx.obj['API']
     
     success = api.remove_txt_record(full_domain=domain, record_type=record_type, value=value)
     
     sys.exit(0 if success else 1)
 
+@cli.command()
+@click.option('--file', '-f', 'operations_file', type=click.File('r'), required=True,
+    help='JSON file with a list of operations, "-" for stdin')
+@click.pass_context
+def apply(ctx, operations_file):
+    """Apply several record changes with one push per domain.
+
+    Each operation is an object like
+    {"action": "add", "domain": "_acme-challenge.example.com", "type": "TXT", "value": "...", "overwrite": false}
+    or {"action": "remove", "domain": "_acme-challenge.example.com", "type": "TXT", "value": "..."}.
+    """
+    api: StratoDnsApiRouter = ctx.obj['API']
+
+    try:
+        operations = json.load(operations_file)
+    except ValueError as e:
+        raise click.BadParameter(f'Invalid JSON: {e}', param_hint='--file')
+
+    if not isinstance(operations, list):
+        raise click.BadParameter('Expected a list of operations', param_hint='--file')
+    # all operations are checked before any is applied
+    for index, operation in enumerate(operations):
+        _check_operation(index, operation)
+
+    batches = {}
+    for operation in operations:
+        batch = api.new_batch(operation['domain'])
+        batch = batches.setdefault(batch.root_domain, batch)
+        if operation['action'] == 'add':
+            batch.add(operation['domain'], operation['type'], operation['value'], operation.get('overwrite', False))
+        else:
+            batch.remove(operation['domain'], operation['type'], operation.get('value'))
+
+    success = all([api.apply_batch(batch) for batch in batches.values()])
+
+    sys.exit(0 if success else 1)
+
+@cli.command()
+@click.option('--file', '-f', 'state_file', type=click.File('r'), required=True,
+    help='JSON file with the desired records per root domain, "-" for stdin')
+@click.option('--prune', is_flag=True, help='Also remove records of names and types not in the file (except ACME challenges)')
+@click.option('--dry-run', is_flag=True, help='Only print the changes')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=StratoDnsApiSync.DEFAULT_WORKERS, show_default=True,
+    help='Number of domains to read and change in parallel')
+@click.pass_context
+def sync(ctx, state_file, prune, dry_run, jobs):
+    """Bring the records of several domains into the state of a file.
+
+    The file maps root domains to their records, e.g.
+    {"example.com": [{"prefix": "_dmarc", "type": "TXT", "value": "v=DMARC1; p=none"}]}.
+    For every prefix and type in the file, the listed values become its only records.
+    Each domain with changes is pushed once.
+    """
+    api: StratoDnsApiRouter = ctx.obj['API']
+
+    try:
+        desired = StratoDnsApiSync.desired_from_dict(json.load(state_file))
+        synchronizer = StratoDnsApiSync(api, workers=jobs, prune=prune, log_level=ctx.obj['LOG_LEVEL'])
+        plan = synchronizer.plan(desired)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--file')
+
+    for root_domain, changes in plan.items():
+        if changes is None:
+            click.echo(f'{root_domain}: cannot read records, skipped')
+            continue
+        click.echo(f'{root_domain}:')
+        for record in changes['remove']:
+            click.echo(f'  - {record["type"]} {record["prefix"] or "@"} = {record["value"]}')
+        for record in changes['add']:
+            click.echo(f'  + {record["type"]} {record["prefix"] or "@"} = {record["value"]}')
+    if not plan:
+        click.echo('All domains are up to date.')
+    if dry_run:
+        sys.exit(0 if None not in plan.values() else 1)
+
+    results = synchronizer.apply(desired, plan)
+
+    sys.exit(0 if all(results.values()) else 1)
+
+@cli.command()
+@click.option('--socket', '-s', 'socket_path', type=click.Path(dir_okay=False), required=True, help='Path of the Unix domain socket to serve on')
+@click.option('--coalesce-delay', type=float, default=StratoDnsApiAgent.DEFAULT_COALESCE_DELAY, show_default=True,
+    help='Seconds to wait for further changes of a domain before pushing')
+@click.option('--keepalive-interval', type=float, default=StratoDnsApiAgent.DEFAULT_KEEPALIVE_INTERVAL, show_default=True,
+    help='Seconds between checks that the session is still valid')
+@click.pass_context
+def serve(ctx, socket_path, coalesce_delay, keepalive_interval):
+    """Stay logged in and serve record changes on a Unix domain socket."""
+    api: StratoDnsApiRouter = ctx.obj['API']
+
+    agent = StratoDnsApiAgent(api, socket_path, coalesce_delay=coalesce_delay,
+        keepalive_interval=keepalive_interval, log_level=ctx.obj['LOG_LEVEL'])
+
+    sys.exit(0 if agent.serve() else 1)
+
+@cli.command(context_settings={'ignore_unknown_options': True})
+@click.option('--domain', '-n', 'domains', multiple=True, help='Domain to issue a wildcard certificate for, can be repeated')
+@click.option('--domains-file', type=click.File('r'), help='File with one domain per line, "#" starts a comment')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=StratoDnsApiBulkIssuer.DEFAULT_WORKERS, show_default=True,
+    help='Number of acme.sh processes to run in parallel')
+@click.option('--acme-sh', default='acme.sh', show_default=True, help='Path of acme.sh')
+@click.option('--certs-dir', type=click.Path(file_okay=False), envvar='STRATO_ACME_CERTS_DIR',
+    help='Cert home of acme.sh, needed to deploy the certificates (see "deploy" in the config), default: $STRATO_ACME_CERTS_DIR')
+@click.argument('acme_sh_args', nargs=-1, type=click.UNPROCESSED)
+@click.pass_context
+def issue_certs(ctx, domains, domains_file, jobs, acme_sh, certs_dir, acme_sh_args):
+    """Issue wildcard certificates for many domains with one shared session.
+
+    Additional arguments are passed to every acme.sh call, separate them by "--",
+    e.g. "issue-certs -n example.com -n example.org -- --staging".
+    """
+    api: StratoDnsApiRouter = ctx.obj['API']
+    domains = _read_domains(domains, domains_file)
+    deployer = _deployer(ctx) if certs_dir else None
+
+    issuer = StratoDnsApiBulkIssuer(api, acme_sh=acme_sh,
+        acme_sh_args=(['--cert-home', certs_dir] if certs_dir else []) + list(acme_sh_args), workers=jobs,
+        env=_acme_sh_env(ctx, deployer), log_level=ctx.obj['LOG_LEVEL'])
+    results = issuer.issue(domains)
+
+    deployed = deployer.deploy_from(certs_dir, [d for d, success in results.items() if success]) if deployer else []
+
+    sys.exit(0 if all(results.values()) and deployed is not None else 1)
+
+@cli.command()
+@click.option('--domain', '-n', 'domains', multiple=True, help='Domain to issue a certificate for, can be repeated')
+@click.option('--domains-file', type=click.File('r'), help='File with one domain per line, "#" starts a comment')
+@click.option('--certs-dir', type=click.Path(file_okay=False), envvar='STRATO_ACME_CERTS_DIR', required=True,
+    help='Directory to write the certificates to, default: $STRATO_ACME_CERTS_DIR')
+@click.option('--account-key', type=click.Path(dir_okay=False), envvar='STRATO_ACME_ACCOUNT_KEY', required=True,
+    help='PEM file of the ACME account key, created if missing, default: $STRATO_ACME_ACCOUNT_KEY')
+@click.option('--email', help='Contact address of the ACME account')
+@click.option('--server', default='letsencrypt', show_default=True,
+    help='ACME directory URL, or "letsencrypt" / "letsencrypt_test" (staging)')
+@click.option('--ca-bundle', type=click.Path(exists=True, dir_okay=False), help='CA bundle to verify the ACME server with, e.g. the one of Pebble')
+@click.option('--key-type', type=click.Choice(StratoDnsApiAcmeIssuer.KEY_TYPES), default=StratoDnsApiAcmeIssuer.DEFAULT_KEY_TYPE,
+    show_default=True, help='Type of the certificate keys')
+@click.option('--no-wildcard', is_flag=True, help='Do not include "*.<domain>" in the certificates')
+@click.option('--renew-days', type=click.FloatRange(min=0), default=StratoDnsApiAcmeIssuer.DEFAULT_RENEW_DAYS, show_default=True,
+    help='Skip domains whose certificate is valid for more than this many days')
+@click.option('--force', is_flag=True, help='Issue certificates even if they are not due for renewal')
+@click.option('--propagation-timeout', type=click.FloatRange(min=0), default=StratoDnsApiAcmeIssuer.DEFAULT_PROPAGATION_TIMEOUT,
+    show_default=True, help='Maximum seconds to wait for the challenge records on the nameservers, 0 to not wait')
+@click.option('--nameserver', 'nameservers', multiple=True, metavar='HOST[:PORT]',
+    help='Nameserver to check the propagation with instead of the authoritative ones, can be repeated')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=StratoDnsApiAcmeIssuer.DEFAULT_WORKERS, show_default=True,
+    help='Number of concurrent requests to the ACME server and nameservers')
+@click.pass_context
+def issue(ctx, domains, domains_file, certs_dir, account_key, email, server, ca_bundle, key_type, no_wildcard, renew_days, force,
+        propagation_timeout, nameservers, jobs):
+    """Issue certificates with DNS-01 challenges without acme.sh.
+
+    The challenges of all certificates are published with one push per root domain
+    and removed with one push per root domain, using one Strato session.
+    """
+    api: StratoDnsApiRouter = ctx.obj['API']
+    domains = _read_domains(domains, domains_file)
+
+    try:
+        from strato_dns_api.strato_dns_api_acme_client import StratoDnsApiAcmeClient
+        from strato_dns_api.strato_dns_api_propagation import StratoDnsApiPropagation
+
+        key = StratoDnsApiAcmeClient.load_account_key(account_key)
+    except ImportError:
+        raise click.ClickException('issue needs the "acme" extra: pip install strato-dns-api[acme]')
+    except (OSError, ValueError) as e:
+        raise click.BadParameter(str(e), param_hint='--account-key')
+
+    client = StratoDnsApiAcmeClient(server, key, email=email, verify=ca_bundle or True, log_level=ctx.obj['LOG_LEVEL'])
+    issuer = StratoDnsApiAcmeIssuer(api, client, certs_dir, key_type=key_type, renew_days=renew_days,
+        propagation_timeout=propagation_timeout, workers=jobs, log_level=ctx.obj['LOG_LEVEL'],
+        nameservers=[StratoDnsApiPropagation.parse_nameserver(ns) for ns in nameservers] or None)
+    results = issuer.issue(domains, wildcard=not no_wildcard, force=force)
+
+    deployer = _deployer(ctx)
+    deployed = deployer.deploy_from(certs_dir, [d for d, success in results.items() if success]) if deployer else []
+
+    sys.exit(0 if all(results.values()) and deployed is not None else 1)
+
+@cli.command(context_settings={'ignore_unknown_options': True})
+@click.option('--certs-dir', type=click.Path(file_okay=False), envvar='STRATO_ACME_CERTS_DIR', required=True,
+    help='Cert home of acme.sh, default: $STRATO_ACME_CERTS_DIR')
+@click.option('--jitter', type=click.FloatRange(min=0), default=StratoDnsApiRenewalScheduler.DEFAULT_JITTER, show_default=True,
+    help='Maximum seconds to delay a renewal after the renewal time of acme.sh')
+@click.option('--group-window', type=click.FloatRange(min=0), default=StratoDnsApiRenewalScheduler.DEFAULT_GROUP_WINDOW, show_default=True,
+    help='Renew certificates of the same account scheduled up to this many seconds from now together')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=StratoDnsApiBulkIssuer.DEFAULT_WORKERS, show_default=True,
+    help='Number of acme.sh processes to run in parallel')
+@click.option('--acme-sh', default='acme.sh', show_default=True, help='Path of acme.sh')
+@click.option('--dry-run', is_flag=True, help='Only print the renewal schedule')
+@click.option('--loop', is_flag=True, help='Keep running and renew certificates whenever they are due')
+@click.option('--check-interval', type=click.FloatRange(min=1), default=StratoDnsApiRenewalScheduler.DEFAULT_CHECK_INTERVAL, show_default=True,
+    help='Maximum seconds between two scans of the cert home with --loop')
+@click.argument('acme_sh_args', nargs=-1, type=click.UNPROCESSED)
+@click.pass_context
+def renew(ctx, certs_dir, jitter, group_window, jobs, acme_sh, dry_run, loop, check_interval, acme_sh_args):
+    """Renew the certificates of the acme.sh cert home that are due, spread over time and grouped per account.
+
+    Additional arguments are passed to every acme.sh call, separate them by "--",
+    e.g. "renew --certs-dir ./certs -- --config-home ./config".
+    """
+    api: StratoDnsApiRouter = ctx.obj['API']
+
+    deployer = _deployer(ctx)
+
+    issuer = StratoDnsApiBulkIssuer(api, acme_sh=acme_sh, acme_sh_args=['--cert-home', certs_dir, *acme_sh_args], workers=jobs,
+        env=_acme_sh_env(ctx, deployer), log_level=ctx.obj['LOG_LEVEL'])
+    scheduler = StratoDnsApiRenewalScheduler(api, certs_dir, issuer, jitter=jitter, group_window=group_window,
+        deployer=deployer, log_level=ctx.obj['LOG_LEVEL'])
+
+    if dry_run:
+        scheduler.scan()
+        due = {c.domain for group in scheduler.due() for c in group}
+        for certificate in sorted(scheduler.certificates, key=scheduler.scheduled_time):
+            scheduled = datetime.datetime.fromtimestamp(scheduler.scheduled_time(certificate)).isoformat(' ', 'seconds')
+            click.echo(f'{"*" if certificate.domain in due else " "} {scheduled}  {certificate.domain}')
+        sys.exit(0)
+
+    if loop:
+        scheduler.run_forever(check_interval)
+        sys.exit(0)
+
+    results = scheduler.run()
+
+    sys.exit(0 if all(results.values()) else 1)
+
+@cli.command()
+@click.option('--domain', '-n', 'domains', multiple=True, help='Main domain of a certificate to deploy, can be repeated')
+@click.option('--domains-file', type=click.File('r'), help='File with one domain per line, "#" starts a comment')
+@click.option('--certs-dir', type=click.Path(exists=True, file_okay=False), envvar='STRATO_ACME_CERTS_DIR', required=True,
+    help='Cert home of acme.sh or the issue command, default: $STRATO_ACME_CERTS_DIR')
+@click.pass_context
+def deploy(ctx, domains, domains_file, certs_dir):
+    """Deploy certificates to the directory of the "deploy" section of the config and announce the changed ones.
+
+    Certificates whose files did not change since the last deployment are neither
+    written nor announced. The changed domains are printed.
+    """
+    domains = _read_domains(domains, domains_file)
+
+    deployer = _deployer(ctx)
+    if deployer is None:
+        click.echo(f'No "deploy" section in {ctx.obj["CONFIG"]}, nothing to deploy.', err=True)
+        sys.exit(0)
+
+    changed = deployer.deploy_from(certs_dir, domains)
+    for domain in changed or []:
+        click.echo(domain)
+
+    sys.exit(0 if changed is not None else 1)
+
+def _deployer(ctx) -> typing.Optional[StratoDnsApiDeployer]:
+    """Deployer of the "deploy" section of the config file, None if there is none."""
+    with open(ctx.obj['CONFIG'], 'r') as f:
+        config = json.load(f)
+    if 'deploy' not in config:
+        return None
+
+    try:
+        return StratoDnsApiDeployer.from_dict(config['deploy'], transport=StratoDnsApiTransport.from_dict(config.get('transport', {})),
+            log_level=ctx.obj['LOG_LEVEL'])
+    except ValueError as e:
+        raise click.ClickException(f'Invalid deploy section in {ctx.obj["CONFIG"]}: {e}')
+
+def _acme_sh_env(ctx, deployer: typing.Optional[StratoDnsApiDeployer]) -> dict[str, str]:
+    """Environment of the acme.sh processes of issue-certs and renew."""
+    env = {'STRATO_API_CONFIG_FILE': os.path.abspath(ctx.obj['CONFIG'])}
+    if deployer is not None:
+        # the command deploys all certificates at once afterwards, instead of the renew hook per certificate
+        env['STRATO_API_DEPLOY_DEFERRED'] = 'true'
+    return env
+
+def _check_operation(index: int, operation):
+    """Raise BadParameter naming the index of an operation of the apply command that is invalid."""
+    def invalid(reason: str):
+        raise click.BadParameter(f'Invalid operation {index}: {reason}', param_hint='--file')
+
+    if not isinstance(operation, dict):
+        invalid(f'expected an object, got {json.dumps(operation)}')
+    if operation.get('action') not in ('add', 'remove'):
+        invalid('"action" must be "add" or "remove"')
+    if operation.get('type') not in ('CNAME', 'TXT'):
+        invalid('"type" must be "CNAME" or "TXT"')
+    if not isinstance(operation.get('domain'), str) or not operation['domain']:
+        invalid('"domain" is missing')
+    if operation['action'] == 'add' and (not isinstance(operation.get('value'), str) or not operation['value']):
+        invalid('"value" is missing')
+    if operation.get('value') is not None and not isinstance(operation['value'], str):
+        invalid('"value" must be a string')
+    if not isinstance(operation.get('overwrite', False), bool):
+        invalid('"overwrite" must be true or false')
+
+def _read_domains(domains: tuple[str, ...], domains_file) -> list[str]:
+    """Domains of the --domain options and the --domains-file, in order and without duplicates."""
+    domains = list(domains)
+    if domains_file:
+        domains += [line.split('#')[0].strip() for line in domains_file if line.split('#')[0].strip()]
+    # keep the order, drop duplicates
+    domains = list(dict.fromkeys(domains))
+    if not domains:
+        raise click.UsageError('No domains given, use --domain or --domains-file.')
+    return domains
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
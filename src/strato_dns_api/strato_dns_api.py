@@ -1,255 +1,373 @@
 """Strato API for DNS manipulation."""
-import sys
-import re
-import logging
+import time
 import typing
-import json
+import contextlib
+import threading
 
-# Third party imports
-import urllib
-import pyotp
-import requests
-from bs4 import BeautifulSoup
-import tldextract
+# Third party imports are deferred to the code paths using them to keep the CLI startup fast
+if typing.TYPE_CHECKING:
+    import requests
 
-from strato_dns_api.strato_dns_api_credentials import StratoDnsApiCredentials
+from strato_dns_api.strato_dns_api_base import StratoDnsApiBase
+from strato_dns_api.strato_dns_api_login_page import StratoDnsApiLoginPage
+from strato_dns_api.strato_dns_api_batch import StratoDnsApiBatch
+from strato_dns_api.strato_dns_api_result import StratoDnsApiResult
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecordSet
 
-class StratoDnsApi:
+class StratoDnsApi(StratoDnsApiBase):
     """Class to manipulate DNS on domains hosted at Strato"""
 
-    API_URLS = {
-        "de": "https://www.strato.de/apps/CustomerService",
-        "nl": "https://www.strato.nl/apps/CustomerService#skl",
-    }
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
 
-    BASE_DOMAIN_REGEX = re.compile(r'([\w-]+\.[\w-]+)$')
-    RECORD_PREFIX_REGEX = re.compile(r'^([\w-]+)')
+        # session for cookie sharing, created on first use
+        self._session: typing.Optional['requests.Session'] = None
+        # guards session and package index when the instance is shared between threads
+        self._lock = threading.RLock()
 
-    @staticmethod
-    def from_config_file(
-            config_file: str,
-            log_level: int = logging.INFO,
-        ) -> 'StratoDnsApi':
-        """Initialize Strato DNS API from JSON config file.
+    @property
+    def _http_session(self) -> 'requests.Session':
+        if self._session is None:
+            headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:126.0) Gecko/20100101 Firefox/126.0'}
+            self._session = self._transport.create_session(headers)
+        return self._session
 
-        :param str config_file: Path to JSON config file
-        :param int log_level: Logging level
+    def login(self) -> bool:
+        """Login to Strato website. Requests session ID.
 
-        :returns: StratoDnsApiCredentials instance
-        :rtype: StratoDnsApiCredentials
+        If a session cache is configured, a previously stored session is reused
+        instead of doing the full login (and 2FA) handshake.
+
+        :returns: True if login was successful
+        :rtype: bool
 
         """
-        logging.basicConfig(level=log_level)
-        logger = logging.getLogger('strato_dns_api')
-        logger.info(f'Loading configuration from {config_file}...')
-        try:
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-                if not "location" in config:
-                    config["location"] = "de"
-                    logger.info('No location specified in config, defaulting to "de"')
-            
-                api = StratoDnsApi(location=config["location"], credentials=StratoDnsApiCredentials.from_dict(config['credentials']), log_level=log_level)
-                
-                logger.info('Configuration loaded successfully.')
-                return api
-                
-        except Exception as e:
-           logger.error(f'Error loading config file {config_file}: {e}')
-           sys.exit(1)
-
-    def __init__(self, location: str, credentials: StratoDnsApiCredentials, log_level=logging.INFO):
-
-        self._logger = logging.getLogger(self.__class__.__name__)
-        logfmt = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        loghdlr = logging.StreamHandler(stream=sys.stdout)
-        loghdlr.setFormatter(logfmt)
-        self._logger.addHandler(loghdlr)
-        self._logger.setLevel(log_level)
-
-        self._credentials = credentials
-        if not location in self.API_URLS:
-            self._logger.error(f'Unsupported location "{location}", available: {list(self.API_URLS.keys())}')
-            sys.exit(1)
-
-        self._api_url = self.API_URLS[location]
-
-        # setup session for cookie sharing
-        headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:126.0) Gecko/20100101 Firefox/126.0'}
-        self._http_session = requests.session()
-        self._http_session.headers.update(headers)
-        self._session_id = ''
+        with self._lock:
+            if self._credentials.logged_in:
+                self._logger.debug('Already logged in.')
+                return True
+
+            if self._restore_session():
+                return True
+
+            import requests
+
+            self._logger.info(f'Logging in to {self._api_url}...')
+            try:
+                with self._metrics.measure('login') as sample:
+                    # request session id
+                    sample.add_response(self._http_session.get(self._api_url, timeout=self._transport.timeout))
+                    data={'identifier': self._credentials.username, 'passwd': self._credentials.password, 'action_customer_login.x': 'Login'}
+
+                    request = sample.add_response(self._http_session.post(self._api_url, data=data, timeout=self._transport.timeout))
+
+                # Check 2FA Login (if required)
+                with self._metrics.measure('login_2fa') as sample:
+                    response = self._login_2fa(request, self._credentials.username,
+                        self._credentials.totp_secret, self._credentials.totp_devicename)
+                    if response is not request:
+                        sample.add_response(response)
+                    request = response
+            except requests.RequestException as e:
+                self._logger.error(f'Login failed: {e}')
+                self._credentials.logged_in = False
+                return False
+
+            # Check successful login
+            session_id = StratoDnsApiLoginPage.session_id(request.url)
+            if session_id is None:
+                self._logger.error('Login failed. No session ID found.')
+                self._credentials.logged_in = False
+                return False
+            else:
+                self._session_id = session_id
+                self._logger.debug(f'session_id: {self._session_id}')
+                self._logger.info('Login successful.')
+                self._credentials.logged_in = True
+                self._store_session()
+                return True
 
-    def login(self) -> bool:
-        """Login to Strato website. Requests session ID.
+    def keep_alive(self) -> bool:
+        """Confirm the current session with Strato and log in again if it expired.
 
-        :returns: True if login was successful
+        Intended to be called periodically by long running processes.
+
+        :returns: True if logged in afterwards
         :rtype: bool
 
         """
-        if self._credentials.logged_in:
-            self._logger.debug('Already logged in.')
-            return True
-
-        self._logger.info(f'Logging in to {self._api_url}...')
-        # request session id
-        self._http_session.get(self._api_url)
-        data={'identifier': self._credentials.username, 'passwd': self._credentials.password, 'action_customer_login.x': 'Login'}
-
-        request = self._http_session.post(self._api_url, data=data)
-
-        # Check 2FA Login (if required)
-        request = self._login_2fa(request, self._credentials.username,
-            self._credentials.totp_secret, self._credentials.totp_devicename)
-
-        # Check successful login
-        parsed_url = urllib.parse.urlparse(request.url)
-        query_parameters = urllib.parse.parse_qs(parsed_url.query)
-        if 'sessionID' not in query_parameters:
-            self._logger.error('Login failed. No session ID found.')
-            self._credentials.logged_in = False
-            return False
-        else:
-            self._session_id = query_parameters['sessionID'][0]
-            self._logger.debug(f'session_id: {self._session_id}')
-            self._logger.info('Login successful.')
-            self._credentials.logged_in = True
-            return True
+        with self._lock:
+            if not self._credentials.logged_in:
+                return self.login()
 
-    def get_txt_records(self, full_domain:str, package_id: typing.Optional[int] = None) -> list[dict]:
-        """Requests all txt and cname records related to domain."""
+            self._get({}, 'keep_alive')
+            return self._credentials.logged_in
 
-        self._logger.info(f'Getting TXT/CNAME records for domain: {full_domain}')
+    def get_txt_records(self, full_domain: str, package_id: typing.Optional[int] = None,
+            max_age: typing.Optional[float] = None) -> StratoDnsApiRecordSet:
+        """Requests all txt and cname records related to domain.
 
-        root_domain, _ = self._get_root_domain(full_domain)
+        With a cache, record sets read or pushed by this or another process are
+        returned without asking Strato if they are not older than max_age.
 
-        if not self.login():
-            self._logger.error('Cannot get TXT records, not logged in.')
-            return []
-
-        request = self._http_session.get(self._api_url, params={
-            'sessionID': self._session_id,
-            'cID': self._load_package_id(root_domain) if not package_id else package_id,
-            'node': 'ManageDomains',
-            'action_show_txt_records': '',
-            'vhost': root_domain
-        })
-
-        records = []
-        # No idea what this regex does
-        # TODO: rewrite with beautifulsoup
-        for record in re.finditer(
-                r'<select [^>]*name="type"[^>]*>.*?'
-                r'<option[^>]*value="(?P<type>[^"]*)"[^>]*selected[^>]*>'
-                r'.*?</select>.*?'
-                r'<input [^>]*value="(?P<prefix>[^"]*)"[^>]*name="prefix"[^>]*>'
-                r'.*?<textarea [^>]*name="value"[^>]*>(?P<value>.*?)</textarea>',
-                request.text):
-            records.append({
-                'prefix': record.group('prefix'),
-                'type': record.group('type'),
-                'value': record.group('value')
-            })
-
-        self._logger.debug(f"Current cname/txt records for '{root_domain}':")
-        list(self._logger.debug(f'  {item["type"]}: {item["prefix"]}.{root_domain} = {item["value"]}')
-            for item in records)
-        
+        :param str full_domain: Root domain or any FQDN below it
+        :param int package_id: Package of the domain, looked up if None
+        :param float max_age: Maximum age of cached records in seconds, records_max_age of the cache if None, 0 to read them from Strato
+
+        :returns: Records, empty if they could not be loaded
+        :rtype: StratoDnsApiRecordSet
+
+        """
+        records = self.fetch_txt_records(full_domain, package_id, max_age)
+        return records if records is not None else StratoDnsApiRecordSet()
+
+    def fetch_txt_records(self, full_domain: str, package_id: typing.Optional[int] = None,
+            max_age: typing.Optional[float] = None) -> typing.Optional[StratoDnsApiRecordSet]:
+        """Requests all txt and cname records related to domain, like get_txt_records() but telling a failure from no records.
+
+        :param str full_domain: Root domain or any FQDN below it
+        :param int package_id: Package of the domain, looked up if None
+        :param float max_age: Maximum age of cached records in seconds, records_max_age of the cache if None, 0 to read them from Strato
+
+        :returns: Records or None if they could not be loaded
+        :rtype: StratoDnsApiRecordSet
+
+        """
+        root_domain, _ = self._get_root_domain(full_domain)
+        records = self._cached_records(root_domain, max_age)
+        if records is None:
+            records = self._fetch_records(full_domain, package_id)
         return records
 
-    def add_txt_record(self, full_domain:str, record_type: str, value: str, overwrite: bool = False) -> bool:
+    def add_txt_record(self, full_domain:str, record_type: str, value: str, overwrite: bool = False) -> StratoDnsApiResult:
         """Add a txt/cname record.
 
         :param key str: Key of record as FQDN or prefix, eg 'subdomain' or 'subdomain.domain.tld'
         :param record_type str: Type of record ('TXT' or 'CNAME')
         :param value str: Value of record
-        :param records dict: Existing records to modify, if None fetches current records
         :param overwrite bool: Whether to overwrite existing records or add a new one
 
-        """
-        
-        root_domain, prefix = self._get_root_domain(full_domain)
-
-        if not self.login():
-            self._logger.error('Cannot add TXT record, not logged in.')
-            return False
-
-        package_id = self._load_package_id(root_domain)
-        records = self.get_txt_records(root_domain, package_id)
+        :returns: Result, truthy on success, not changed if the record already existed
+        :rtype: StratoDnsApiResult
 
-        if any(r['prefix'] == prefix and r['type'] == record_type for r in records):
-            if overwrite:
-                self._logger.info(f'Overwriting existing {record_type} record: {prefix} = {value}...')
-                for record in records:
-                    if record['prefix'] == prefix and record['type'] == record_type:
-                        record['value'] = value
-                        break
-            else:
-                self._logger.info(f'Creating additional {record_type} record: {prefix} = {value}')
-        else:
-            self._logger.info(f'Creating new {record_type} record: {prefix} = {value}...')
-        
-        records.append({
-            'prefix': prefix,
-            'type': record_type,
-            'value': value,
-        })
-
-        if self._push_txt_records(records, root_domain, package_id):
-            self._logger.info(f'Successfully added {record_type} record: {prefix}')
-            return True
-        else:
-            self._logger.error(f'Failed to add {record_type} record: {prefix}')
-            return False
+        """
+        with self.batch(full_domain) as batch:
+            batch.add(full_domain, record_type, value, overwrite)
 
+        return StratoDnsApiResult(batch.success, batch.changed)
 
-    def remove_txt_record(self, full_domain:str, record_type: str, value: typing.Optional[str] = None) -> bool:
+    def remove_txt_record(self, full_domain:str, record_type: str, value: typing.Optional[str] = None) -> StratoDnsApiResult:
         """Remove a txt/cname record.
 
         :param full_domain str: Key of record as FQDN or prefix, eg 'subdomain' or 'subdomain.domain.tld'
         :param record_type str: Type of record ('TXT' or 'CNAME')
-        :param value str: Value to remove from record, if None removes all records with matching prefix
+        :param value str: Value of the record to remove, if None removes all records with matching prefix
+
+        :returns: Result, truthy on success, not changed if there was nothing to remove
+        :rtype: StratoDnsApiResult
+
+        """
+        with self.batch(full_domain) as batch:
+            batch.remove(full_domain, record_type, value)
+
+        return StratoDnsApiResult(batch.success, batch.changed)
+
+    def wait_for_propagation(
+            self,
+            full_domain: str,
+            value: str,
+            timeout: typing.Optional[float] = None,
+            nameservers: typing.Optional[list[tuple[str, int]]] = None,
+        ) -> bool:
+        """Wait until all authoritative nameservers of the domain serve a TXT value.
+
+        :param str full_domain: FQDN of the TXT record
+        :param str value: Expected TXT value
+        :param float timeout: Maximum time to wait in seconds, defaults to 300
+        :param list nameservers: Nameservers (address, port) to query instead of the authoritative ones
+
+        :returns: True if the value is served by all nameservers within the timeout
+        :rtype: bool
+
+        """
+        from strato_dns_api.strato_dns_api_propagation import StratoDnsApiPropagation
+
+        root_domain, _ = self._get_root_domain(full_domain)
+        propagation = StratoDnsApiPropagation(nameservers=nameservers, log_level=self._logger.level)
+        return propagation.wait(full_domain, value, root_domain,
+            timeout=timeout if timeout is not None else StratoDnsApiPropagation.DEFAULT_TIMEOUT)
+
+    @contextlib.contextmanager
+    def batch(self, root_domain: str) -> typing.Iterator[StratoDnsApiBatch]:
+        """Collect several record changes of a domain and apply them with one read and one push.
+
+        The changes are applied when the context is left without exception,
+        the result is available as success of the batch afterwards::
+
+            with api.batch('example.com') as batch:
+                batch.add('_acme-challenge.example.com', 'TXT', 'value1')
+                batch.add('_acme-challenge.example.com', 'TXT', 'value2')
+            if not batch.success:
+                ...
+
+        :param str root_domain: Root domain (or any FQDN below it) of all changes
+
+        :returns: Batch to collect changes in
+        :rtype: StratoDnsApiBatch
+
+        """
+        batch = self.new_batch(root_domain)
+        yield batch
+        self.apply_batch(batch)
+
+    def apply_batch(self, batch: StratoDnsApiBatch) -> StratoDnsApiResult:
+        """Apply all changes of a batch to the current record set and push it once.
+
+        The lock of the domain is held from reading to pushing the record set, so
+        concurrent changes of other processes are not overwritten.
+
+        :param StratoDnsApiBatch batch: Changes to apply
+
+        :returns: Result, truthy if all changes were applied, changed if the record set was pushed
+        :rtype: StratoDnsApiResult
 
         """
-        # sanitize the prefix
-        root_domain, prefix = self._get_root_domain(full_domain)
+        root_domain = batch.root_domain
+        operations = self._batch_operations(batch)
+        if operations is None:
+            return self._batch_result(batch, StratoDnsApiResult(False))
+
+        if not operations:
+            return self._batch_result(batch, StratoDnsApiResult(True))
 
         if not self.login():
-            self._logger.error('Cannot remove record, not logged in.')
-            return False
+            self._logger.error('Cannot change records, not logged in.')
+            return self._batch_result(batch, StratoDnsApiResult(False))
 
-        package_id = self._load_package_id(root_domain)
-        records = self.get_txt_records(root_domain, package_id)
-
-        self._logger.info(f'Removing {record_type} record: {prefix}')
-
-        for i in reversed(range(len(records))):
-            if (records[i]['prefix'] == prefix
-                and records[i]['type'] == record_type):
-                if value and value in records[i]['value']:
-                    self._logger.info(f"Removing value from {record_type} record: {prefix} -= {value}")
-                    records[i]['value'] = records[i]['value'].replace(value, '').strip()
-                else:
-                    records.pop(i)
-                if self._push_txt_records(records, root_domain, package_id):
-                    self._logger.info(f'Removed {record_type} record: {prefix}')
-                    return True
-                else:
-                    self._logger.error(f'Failed to remove {record_type} record: {prefix}')
-                    return False
-
-        self._logger.warning(f'No {record_type} record found for removal: {prefix}')
-        return True
+        with self._record_lock.hold(root_domain) as locked:
+            if not locked:
+                self._logger.error(f'Cannot change records of {root_domain}, lock not acquired.')
+                return self._batch_result(batch, StratoDnsApiResult(False))
+            result = self._apply_operations(root_domain, operations)
+
+        return self._batch_result(batch, result)
+
+    def find_package_id(self, root_domain: str, download: bool = True, exact: bool = False) -> typing.Optional[str]:
+        """Find the package of the account that contains a domain.
+
+        :param str root_domain: Root domain to search for
+        :param bool download: Download the package index (logging in if needed) if the
+            domain is not in the index in memory or in the cache
+        :param bool exact: Only match a package listing the domain itself, see StratoDnsApiPackageIndex.lookup()
+
+        :returns: Package ID (cID) or None if no package of this account contains the domain
+        :rtype: str
+
+        """
+        with self._lock:
+            package_id = self._lookup_package_id(root_domain, exact)
+
+            if package_id is None and download and not self._package_index_fresh:
+                if not self.login():
+                    return None
+                self._refresh_package_index()
+                package_id = self._package_index.lookup(root_domain, exact)
+
+            return package_id
 
 #######################################################################################################################
 # private methods
+    def _apply_operations(self, root_domain: str, operations: list[tuple[str, dict]]) -> StratoDnsApiResult:
+        """Read the record set of a domain, apply the operations and push it if modified.
+
+        Runs StratoDnsApiBase._apply_steps(), calling the I/O methods it yields.
+
+        :returns: Result, changed if the record set was pushed
+        :rtype: StratoDnsApiResult
+
+        """
+        steps = self._apply_steps(root_domain, operations)
+        result = None
+        while True:
+            try:
+                method, *args = steps.send(result)
+            except StopIteration as e:
+                return e.value
+            result = getattr(self, method)(*args)
+
+    @staticmethod
+    def _sleep(delay: float):
+        time.sleep(delay)
+
+    def _get(self, params: dict, operation: str) -> 'requests.Response':
+        """GET a page of the customer service with the current session ID.
+
+        If Strato answers with the login page, the session (e.g. one restored from cache)
+        expired and a full login is done before repeating the request once.
+
+        :param dict params: Query parameters without session ID
+        :param str operation: Name of the operation in the metrics
+
+        :returns: Response of Strato
+        :rtype: requests.Response
+
+        """
+        session_id = self._session_id
+        with self._metrics.measure(operation) as sample:
+            response = sample.add_response(self._http_session.get(self._api_url,
+                params={'sessionID': session_id, **params}, timeout=self._transport.timeout))
+
+        if StratoDnsApiLoginPage.is_login_page(response.text):
+            with self._lock:
+                # another thread might have logged in again already
+                if self._session_id == session_id:
+                    self._logger.info('Session expired, logging in again...')
+                    self._invalidate_session()
+                if self.login():
+                    with self._metrics.measure(operation) as sample:
+                        response = sample.add_response(self._http_session.get(self._api_url,
+                            params={'sessionID': self._session_id, **params}, timeout=self._transport.timeout))
+
+        return response
+
+    def _restore_session(self) -> bool:
+        """Restore session ID and cookies from the session cache.
+
+        :returns: True if a stored session was restored
+        :rtype: bool
+
+        """
+        session = self._cached_session()
+        if session is None:
+            return False
+
+        for cookie in session.get('cookies', []):
+            self._http_session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain'), path=cookie.get('path', '/'),
+                secure=cookie.get('secure', False), expires=cookie.get('expires'))
+
+        self._session_id = session['session_id']
+        self._credentials.logged_in = True
+        self._logger.info('Reusing cached session.')
+        return True
+
+    def _store_session(self):
+        """Store session ID and cookies in the session cache."""
+        self._cache_session(self._http_session.cookies)
+
+    def _invalidate_session(self):
+        """Forget the current session, locally and in the session cache."""
+        self._forget_session()
+        self._http_session.cookies.clear()
+
     def _login_2fa(
             self,
-            response: requests.Response,
+            response: 'requests.Response',
             username: str,
             totp_secret: typing.Optional[str],
             totp_devicename: typing.Optional[str],
-            ) -> requests.Response:
+            ) -> 'requests.Response':
         """Login with Two-factor authentication by TOTP on Strato website.
 
         :param str totp_secret: 2FA TOTP secret hash
@@ -260,115 +378,133 @@ class StratoDnsApi:
 
         """
         # Is 2FA used
-        soup = BeautifulSoup(response.text, 'html.parser')
-        if soup.find('h1', string=re.compile('Zwei\\-Faktor\\-Authentifizierung')) is None:
+        if not StratoDnsApiLoginPage.is_two_factor_page(response.text):
             self._logger.info('2FA is not used.')
             return response
         if (not totp_secret) or (not totp_devicename):
             self._logger.error('2FA parameter is not completely set.')
             return response
 
-        param = {'identifier': username}
-
-        # Set parameter 'totp_token'
-        totp_input = soup.find('input', attrs={'type': 'hidden', 'name': 'totp_token'})
-        if totp_input is not None:
-            param['totp_token'] = totp_input['value']
-        else:
-            self._logger.error('Parsing error on 2FA site by totp_token.')
-            return response
-
-        # Set parameter 'action_customer_login.x'
-        param['action_customer_login.x'] = 1
-
-        # No idea what this regex does
-        # TODO: rewrite with beautifulsoup
-        # Set parameter pw_id
-        for device in re.finditer(
-            rf'<option value="(?P<value>(S\.{username}\.\w*))"'
-            r'( selected(="selected")?)?\s*>(?P<name>(.+?))</option>',
-            response.text):
-            if totp_devicename.strip() == device.group('name').strip():
-                param['pw_id'] = device.group('value')
-                break
-        if param.get('pw_id') is None:
-            self._logger.error('Parsing error on 2FA site by device name.')
+        try:
+            param = StratoDnsApiLoginPage.two_factor_params(response.text, username, totp_secret, totp_devicename)
+        except ValueError as e:
+            self._logger.error(str(e))
             return response
-
-        # Set parameter 'totp'
-        param['totp'] = pyotp.TOTP(totp_secret).now()
         self._logger.debug(f'totp: {param.get("totp")}')
 
-        request = self._http_session.post(self._api_url, param)
+        request = self._http_session.post(self._api_url, param, timeout=self._transport.timeout)
         return request
 
-    def _push_txt_records(self, records: list[dict], root_domain: str, package_id: int) -> bool:
-        """Push modified txt records to Strato."""
-        self._logger.debug('Pushing domain TXT/CNAME records:')
-        list(self._logger.debug(f'  {item["type"]}: {item["prefix"]}.{root_domain} = {item["value"]}')
-            for item in records)
-
-        result = self._http_session.post(self._api_url, {
-            'sessionID': self._session_id,
-            'cID': package_id,
-            'node': 'ManageDomains',
-            'vhost': root_domain,
-            'spf_type': 'NONE',
-            'prefix': [r['prefix'] for r in records],
-            'type': [r['type'] for r in records],
-            'value': [r['value'] for r in records],
-            'action_change_txt_records': 'Einstellung+übernehmen',
-        })
-
-        return True if result.status_code == 200 else False
-
-    def _load_package_id(self, root_domain:str) -> int:
-        """Requests package ID for the selected domain.
+    def _fetch_records(self, full_domain: str, package_id: typing.Optional[int] = None) -> typing.Optional[StratoDnsApiRecordSet]:
+        """Requests all txt and cname records related to domain.
+
+        :returns: Records or None if they could not be loaded
+        :rtype: StratoDnsApiRecordSet
+
+        """
+        self._logger.info(f'Getting TXT/CNAME records for domain: {full_domain}')
+
+        root_domain, _ = self._get_root_domain(full_domain)
+
+        if not self.login():
+            self._logger.error('Cannot get TXT records, not logged in.')
+            return None
+
+        import requests
+
+        try:
+            if package_id:
+                request = self._get_records_page(root_domain, package_id)
+            else:
+                request = self._get_records_page(root_domain, self._load_package_id(root_domain))
+                if not self._is_records_page(request.text) and not self._package_index_fresh:
+                    self._logger.warning(f'Strato rejected package of domain {root_domain}, refreshing package index...')
+                    request = self._get_records_page(root_domain, self._load_package_id(root_domain, refresh=True))
+        except requests.RequestException as e:
+            self._logger.error(f'Cannot get TXT records of {root_domain}: {e}')
+            return None
+
+        if not self._is_records_page(request.text):
+            self._logger.error(f'Cannot get TXT records, Strato did not show the records of {root_domain}.')
+            return None
+
+        records = self._parse_records(request.text, root_domain)
+        self._cache_records(root_domain, records)
+        return records
+
+    def _push_txt_records(self, records: StratoDnsApiRecordSet, root_domain: str, package_id: int) -> bool:
+        """Push modified txt records to Strato.
+
+        The push only counts as successful if Strato answers with the record form. If it
+        answers with the login page, the session (e.g. one restored from cache) expired and
+        a full login is done before pushing once more. Any other page, e.g. the package
+        overview for a package not containing the domain, means the push was not applied.
+
+        :returns: True if Strato accepted the record set
+        :rtype: bool
+
+        """
+        import requests
+
+        session_id = self._session_id
+        try:
+            response = self._post_records(records, root_domain, package_id)
+            if StratoDnsApiLoginPage.is_login_page(response.text):
+                with self._lock:
+                    # another thread might have logged in again already
+                    if self._session_id == session_id:
+                        self._logger.info('Session expired, logging in again...')
+                        self._invalidate_session()
+                    if not self.login():
+                        self._logger.error(f'Pushing records of {root_domain} failed, not logged in.')
+                        return False
+                response = self._post_records(records, root_domain, package_id)
+        except requests.RequestException as e:
+            self._logger.error(f'Pushing records of {root_domain} failed: {e}')
+            return False
+
+        if response.status_code != 200:
+            self._logger.error(f'Pushing records of {root_domain} failed with status {response.status_code}')
+            return False
+        if not self._is_records_page(response.text):
+            self._logger.error(f'Pushing records of {root_domain} failed, Strato did not show the records afterwards.')
+            return False
+        return True
+
+    def _post_records(self, records: StratoDnsApiRecordSet, root_domain: str, package_id: int) -> 'requests.Response':
+        import requests
+
+        with self._metrics.measure('push_records') as sample:
+            try:
+                return sample.add_response(self._http_session.post(self._api_url,
+                    self._push_params(records, root_domain, package_id), timeout=self._transport.timeout))
+            except requests.RequestException:
+                sample.success = False
+                raise
+
+    def _load_package_id(self, root_domain:str, refresh: bool = False) -> int:
+        """Looks up the package ID for the selected domain in the package index.
+
+        The index is loaded from cache if possible and only downloaded again
+        if it is expired, does not contain the domain or refresh is requested.
 
         :param str root_domain: Root domain to search for
-        :param str session_id: Session ID from login
-        :param int package_id: Predefined package ID
+        :param bool refresh: Download the package index even if a valid one is available
 
         :returns: Package ID on success, 1 as default otherwise
         :rtype: int
         """
-        # request strato packages
-        request = self._http_session.get(self._api_url, params={
-            'sessionID': self._session_id,
-            'cID': 0,
-            'node': 'kds_CustomerEntryPage',
-        })
-        soup = BeautifulSoup(request.text, 'html.parser')
-        package_anchor = soup.select_one(
-            '#package_list > tbody >'
-            f' tr:has(.package-information:-soup-contains("{root_domain}"))'
-            ' .jss_with_own_packagename a'
-        )
-        if package_anchor:
-            if package_anchor.has_attr('href'):
-                link_target = urllib.parse.urlparse(package_anchor["href"])
-                package_id = urllib.parse.parse_qs(link_target.query)["cID"][0]
-                self._logger.debug(f'strato package id (cID): {package_id}')
-                return package_id
-        
-        self._logger.error(f'Domain {root_domain} not '
-            'found in strato packages. Using fallback cID=1')
-        return 1
-    
-    def _get_root_domain(self, full_domain:str) -> tuple[str, str]:
-        """
-        Returns (root_domain, subdomain) for any ACME DNS-01 FQDN such as:
-        _acme-challenge.example.com
-        _acme-challenge.www.example.co.uk
-        sub1.sub2.example.co.uk
-        """
-
-        ext = tldextract.extract(full_domain)
+        with self._lock:
+            if refresh and not self._package_index_fresh:
+                self._refresh_package_index()
 
-        # Build the root domain (registrable domain)
-        root = f"{ext.domain}.{ext.suffix}" if ext.suffix else ext.domain
+            return self._package_id_or_fallback(root_domain, self.find_package_id(root_domain))
 
-        # Subdomain may be empty
-        sub = ext.subdomain or ""
+    def _refresh_package_index(self):
+        """Download the customer entry page and rebuild the package index from it."""
+        self._logger.info('Loading strato package index...')
+        request = self._get(self.PACKAGE_INDEX_PARAMS, 'package_index')
+        self._update_package_index(request.text)
 
-        return root, sub
\ No newline at end of file
+    def _get_records_page(self, root_domain: str, package_id: int) -> 'requests.Response':
+        return self._get(self._records_page_params(root_domain, package_id), 'fetch_records')
@@ -0,0 +1,339 @@
+"""Client of the ACME protocol (RFC 8555) for DNS-01 challenges."""
+import os
+import json
+import time
+import base64
+import typing
+import hashlib
+import logging
+import threading
+
+from strato_dns_api.strato_dns_api_transport import StratoDnsApiTransport
+
+# Third party imports are deferred to the code paths using them to keep the CLI startup fast
+if typing.TYPE_CHECKING:
+    import requests
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+
+class StratoDnsApiAcmeClient:
+    """Class to order certificates from an ACME server, e.g. Let's Encrypt or Pebble.
+
+    It implements the requests needed for DNS-01 orders: account registration, new
+    order, authorizations, challenge responses, finalization and the certificate
+    download. Requests are signed (JWS, ES256) with the account key, an EC P-256 key.
+    Nonces returned by the server are kept for the next requests, so concurrent
+    requests of several orders do not need an extra round trip each.
+
+    Methods return None (or False) if the server rejected a request, the error is logged.
+    """
+
+    DIRECTORIES = {
+        'letsencrypt': 'https://acme-v02.api.letsencrypt.org/directory',
+        'letsencrypt_test': 'https://acme-staging-v02.api.letsencrypt.org/directory',
+    }
+
+    DEFAULT_POLL_INTERVAL = 2.0
+    DEFAULT_POLL_TIMEOUT = 300.0
+    BAD_NONCE_ERROR = 'urn:ietf:params:acme:error:badNonce'
+    # attempts of a request the server rejected because of its nonce
+    MAX_NONCE_ATTEMPTS = 3
+
+    @staticmethod
+    def load_account_key(key_file: str) -> 'ec.EllipticCurvePrivateKey':
+        """Load the account key from a PEM file, creating a new key if the file does not exist.
+
+        :param str key_file: Path of the PEM file, created with mode 0600
+
+        :returns: EC P-256 private key
+        :rtype: ec.EllipticCurvePrivateKey
+
+        """
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        if os.path.exists(key_file):
+            with open(key_file, 'rb') as f:
+                key = serialization.load_pem_private_key(f.read(), password=None)
+            if not isinstance(key, ec.EllipticCurvePrivateKey) or key.curve.name != 'secp256r1':
+                raise ValueError(f'Account key {key_file} is not an EC P-256 key')
+            return key
+
+        key = ec.generate_private_key(ec.SECP256R1())
+        os.makedirs(os.path.dirname(os.path.abspath(key_file)), exist_ok=True)
+        with open(os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'wb') as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption()))
+        return key
+
+    @property
+    def account_url(self) -> typing.Optional[str]:
+        return self._account_url
+
+    def __init__(
+            self,
+            directory_url: str,
+            account_key: 'ec.EllipticCurvePrivateKey',
+            email: typing.Optional[str] = None,
+            transport: typing.Optional[StratoDnsApiTransport] = None,
+            verify: typing.Union[bool, str] = True,
+            poll_interval: float = DEFAULT_POLL_INTERVAL,
+            poll_timeout: float = DEFAULT_POLL_TIMEOUT,
+            log_level=logging.INFO,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+
+        self._directory_url = self.DIRECTORIES.get(directory_url, directory_url)
+        self._account_key = account_key
+        self._email = email
+        self._transport = transport or StratoDnsApiTransport()
+        # False or a CA bundle, e.g. for the self-signed certificate of Pebble
+        self._verify = verify
+        self._poll_interval = poll_interval
+        self._poll_timeout = poll_timeout
+
+        self._session: typing.Optional['requests.Session'] = None
+        self._directory: typing.Optional[dict] = None
+        self._account_url: typing.Optional[str] = None
+        self._nonces: list[str] = []
+        self._lock = threading.Lock()
+
+    def register(self) -> bool:
+        """Register the account key with the server or look up its existing account.
+
+        :returns: True if the account is usable
+        :rtype: bool
+
+        """
+        if self._account_url is not None:
+            return True
+
+        import requests
+
+        try:
+            url = self._url('newAccount')
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self._logger.error(f'Cannot read ACME directory {self._directory_url}: {e}')
+            return False
+
+        payload = {'termsOfServiceAgreed': True}
+        if self._email:
+            payload['contact'] = [f'mailto:{self._email}']
+        response = self._post(url, payload, use_kid=False)
+        if response is None:
+            return False
+
+        self._account_url = response.headers['Location']
+        self._logger.info(f'Using ACME account {self._account_url}')
+        return True
+
+    def new_order(self, identifiers: typing.Sequence[str]) -> typing.Optional[tuple[str, dict]]:
+        """Create an order for a certificate.
+
+        :param list identifiers: DNS names of the certificate, e.g. ['example.com', '*.example.com']
+
+        :returns: URL and content of the order
+        :rtype: tuple[str, dict]
+
+        """
+        response = self._post(self._url('newOrder'), {
+            'identifiers': [{'type': 'dns', 'value': identifier} for identifier in identifiers],
+        })
+        if response is None:
+            return None
+        return response.headers['Location'], response.json()
+
+    def get(self, url: str) -> typing.Optional[dict]:
+        """Read an object of the account, e.g. an order or authorization (POST-as-GET).
+
+        :param str url: URL of the object
+
+        :returns: Content of the object
+        :rtype: dict
+
+        """
+        response = self._post(url, None)
+        return response.json() if response is not None else None
+
+    def dns_value(self, token: str) -> str:
+        """TXT value of the DNS-01 challenge with a token.
+
+        :param str token: Token of the challenge
+
+        :returns: Base64url encoded SHA-256 digest of the key authorization
+        :rtype: str
+
+        """
+        key_authorization = f'{token}.{self._thumbprint()}'
+        return _b64(hashlib.sha256(key_authorization.encode('ascii')).digest())
+
+    def respond(self, challenge_url: str) -> bool:
+        """Tell the server that a challenge is ready to be validated.
+
+        :param str challenge_url: URL of the challenge
+
+        :returns: True if the server accepted the response
+        :rtype: bool
+
+        """
+        return self._post(challenge_url, {}) is not None
+
+    def poll(self, url: str, pending: typing.Sequence[str] = ('pending', 'processing')) -> typing.Optional[dict]:
+        """Read an object until its status is no longer pending.
+
+        :param str url: URL of the order or authorization
+        :param list pending: Statuses to keep waiting in
+
+        :returns: Content of the object, None if it could not be read or is still pending after the poll timeout
+        :rtype: dict
+
+        """
+        deadline = time.monotonic() + self._poll_timeout
+        while True:
+            response = self._post(url, None)
+            if response is None:
+                return None
+            body = response.json()
+            if body.get('status') not in pending:
+                return body
+            if time.monotonic() >= deadline:
+                self._logger.error(f'{url} still {body.get("status")} after {self._poll_timeout:.0f}s')
+                return None
+
+            retry_after = response.headers.get('Retry-After', '')
+            time.sleep(min(float(retry_after) if retry_after.isdigit() else self._poll_interval,
+                max(deadline - time.monotonic(), 0)))
+
+    def finalize(self, order: dict, csr: bytes) -> typing.Optional[dict]:
+        """Submit the certificate signing request of a ready order.
+
+        :param dict order: Content of the order
+        :param bytes csr: DER encoded certificate signing request
+
+        :returns: Content of the order afterwards
+        :rtype: dict
+
+        """
+        response = self._post(order['finalize'], {'csr': _b64(csr)})
+        return response.json() if response is not None else None
+
+    def certificate(self, order: dict) -> typing.Optional[str]:
+        """Download the certificate of a valid order.
+
+        :param dict order: Content of the order
+
+        :returns: PEM certificate chain, the certificate first
+        :rtype: str
+
+        """
+        response = self._post(order['certificate'], None, accept='application/pem-certificate-chain')
+        return response.text if response is not None else None
+
+#######################################################################################################################
+# private methods
+    @property
+    def _http_session(self) -> 'requests.Session':
+        if self._session is None:
+            self._session = self._transport.create_session({'User-Agent': 'strato-dns-api'})
+            self._session.verify = self._verify
+        return self._session
+
+    def _url(self, resource: str) -> str:
+        if self._directory is None:
+            response = self._http_session.get(self._directory_url, timeout=self._transport.timeout)
+            response.raise_for_status()
+            self._directory = response.json()
+        return self._directory[resource]
+
+    def _nonce(self) -> str:
+        with self._lock:
+            if self._nonces:
+                return self._nonces.pop()
+        response = self._http_session.head(self._url('newNonce'), timeout=self._transport.timeout)
+        return response.headers['Replay-Nonce']
+
+    def _post(self, url: str, payload: typing.Optional[dict], use_kid: bool = True,
+            accept: typing.Optional[str] = None) -> typing.Optional['requests.Response']:
+        """Send a signed request, payload None for POST-as-GET.
+
+        :returns: Response or None if the request failed
+        :rtype: requests.Response
+
+        """
+        import requests
+
+        for attempt in range(1, self.MAX_NONCE_ATTEMPTS + 1):
+            try:
+                response = self._http_session.post(url, data=self._jws(url, payload, use_kid),
+                    headers={'Content-Type': 'application/jose+json', **({'Accept': accept} if accept else {})},
+                    timeout=self._transport.timeout)
+            except requests.RequestException as e:
+                self._logger.error(f'ACME request to {url} failed: {e}')
+                return None
+
+            if 'Replay-Nonce' in response.headers:
+                with self._lock:
+                    self._nonces.append(response.headers['Replay-Nonce'])
+            if response.status_code < 400:
+                return response
+
+            problem = self._problem(response)
+            if problem.get('type') == self.BAD_NONCE_ERROR and attempt < self.MAX_NONCE_ATTEMPTS:
+                self._logger.debug(f'Nonce rejected by {url}, retrying...')
+                continue
+            self._logger.error(f'ACME request to {url} failed with status {response.status_code}: '
+                f'{problem.get("detail") or response.text}')
+            return None
+
+        return None
+
+    def _jws(self, url: str, payload: typing.Optional[dict], use_kid: bool) -> bytes:
+        """Flattened JWS of a request, signed with the account key."""
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
+        protected = {'alg': 'ES256', 'nonce': self._nonce(), 'url': url}
+        if use_kid:
+            protected['kid'] = self._account_url
+        else:
+            protected['jwk'] = self._jwk()
+
+        encoded_protected = _b64(json.dumps(protected).encode('utf-8'))
+        encoded_payload = '' if payload is None else _b64(json.dumps(payload).encode('utf-8'))
+        r, s = decode_dss_signature(self._account_key.sign(
+            f'{encoded_protected}.{encoded_payload}'.encode('ascii'), ec.ECDSA(hashes.SHA256())))
+
+        return json.dumps({
+            'protected': encoded_protected,
+            'payload': encoded_payload,
+            'signature': _b64(r.to_bytes(32, 'big') + s.to_bytes(32, 'big')),
+        }).encode('utf-8')
+
+    def _jwk(self) -> dict:
+        numbers = self._account_key.public_key().public_numbers()
+        return {
+            'crv': 'P-256',
+            'kty': 'EC',
+            'x': _b64(numbers.x.to_bytes(32, 'big')),
+            'y': _b64(numbers.y.to_bytes(32, 'big')),
+        }
+
+    def _thumbprint(self) -> str:
+        """JWK thumbprint (RFC 7638) of the account key."""
+        return _b64(hashlib.sha256(json.dumps(self._jwk(), sort_keys=True, separators=(',', ':')).encode('utf-8')).digest())
+
+    @staticmethod
+    def _problem(response: 'requests.Response') -> dict:
+        try:
+            problem = response.json()
+        except ValueError:
+            return {}
+        return problem if isinstance(problem, dict) else {}
+
+
+def _b64(data: bytes) -> str:
+    """Base64url encoding without padding, as used by JWS."""
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
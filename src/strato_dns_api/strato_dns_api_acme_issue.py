@@ -0,0 +1,334 @@
+"""Issue certificates with DNS-01 challenges published through the Strato DNS API, without acme.sh."""
+import os
+import typing
+import logging
+import datetime
+import concurrent.futures
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_acme_client import StratoDnsApiAcmeClient
+from strato_dns_api.strato_dns_api_deploy import StratoDnsApiDeployer
+
+if typing.TYPE_CHECKING:
+    from strato_dns_api.strato_dns_api_router import StratoDnsApiRouter
+
+
+class StratoDnsApiAcmeIssuer:
+    """Class to issue certificates for many domains in one process with one Strato session.
+
+    All orders are created first. The DNS-01 challenges of all of them are published
+    with one batch (one read and one push) per root domain, and after waiting for the
+    propagation of all values at once the challenges are answered. The challenge records
+    are removed again with one batch per root domain, also if an order failed.
+
+    The certificates are written to <certs_dir>/<domain>/ with the file names of acme.sh:
+    <domain>.key, <domain>.cer (certificate), ca.cer (intermediates) and fullchain.cer.
+    Like in the deploy directory, that is a symlink switched to a new bundle directory
+    at once. An error of one order fails only that order.
+    A domain whose certificate is valid for more than renew_days is skipped, so it can be
+    run regularly like "acme.sh --cron".
+    """
+
+    DEFAULT_WORKERS = 4
+    DEFAULT_RENEW_DAYS = 30
+    DEFAULT_PROPAGATION_TIMEOUT = 300.0
+    DEFAULT_KEY_TYPE = 'ec256'
+    KEY_TYPES = ('ec256', 'ec384', 'rsa2048', 'rsa4096')
+    CHALLENGE_PREFIX = '_acme-challenge'
+
+    def __init__(
+            self,
+            api: typing.Union[StratoDnsApi, 'StratoDnsApiRouter'],
+            client: StratoDnsApiAcmeClient,
+            certs_dir: str,
+            key_type: str = DEFAULT_KEY_TYPE,
+            renew_days: float = DEFAULT_RENEW_DAYS,
+            propagation_timeout: float = DEFAULT_PROPAGATION_TIMEOUT,
+            nameservers: typing.Optional[list[tuple[str, int]]] = None,
+            workers: int = DEFAULT_WORKERS,
+            log_level=logging.INFO,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+
+        if key_type not in self.KEY_TYPES:
+            raise ValueError(f'Unsupported key type "{key_type}", available: {list(self.KEY_TYPES)}')
+
+        self._api = api
+        self._client = client
+        self._certs_dir = certs_dir
+        self._key_type = key_type
+        self._renew_days = renew_days
+        # 0 to answer the challenges right after publishing them
+        self._propagation_timeout = propagation_timeout
+        # nameservers to check the propagation with instead of the authoritative ones
+        self._nameservers = nameservers
+        self._workers = workers
+
+    def issue(self, domains: typing.Sequence[str], wildcard: bool = True, force: bool = False) -> dict[str, bool]:
+        """Issue a certificate for every domain.
+
+        :param list domains: Domains to issue certificates for, one certificate per domain
+        :param bool wildcard: Include the wildcard domain '*.<domain>' in each certificate
+        :param bool force: Issue certificates even if the existing ones are not due for renewal
+
+        :returns: Success per domain, a certificate not due for renewal counts as success
+        :rtype: dict[str, bool]
+
+        """
+        results = {domain: True for domain in domains}
+        due = [domain for domain in domains if force or self._due(domain)]
+        if not due:
+            return results
+        if not self._client.register():
+            return {**results, **{domain: False for domain in due}}
+
+        orders = [_Order(domain, [domain, f'*.{domain}'] if wildcard else [domain]) for domain in due]
+        self._map(self._create_order, orders)
+        challenges = [c for order in orders if order.ok for c in order.challenges]
+
+        try:
+            if challenges:
+                self._publish(orders, challenges)
+                self._map(self._validate, [order for order in orders if order.ok])
+        finally:
+            self._cleanup(challenges)
+
+        self._map(self._finalize, [order for order in orders if order.ok])
+
+        results.update({order.domain: order.ok for order in orders})
+        failed = [domain for domain, success in results.items() if not success]
+        self._logger.info(f'{len(results) - len(failed)} of {len(results)} domain(s) succeeded.')
+        if failed:
+            self._logger.error(f'Failed domains: {", ".join(failed)}')
+        return results
+
+#######################################################################################################################
+# private methods
+    def _fail(self, order: '_Order', error: str):
+        """Mark an order as failed, keeping the first error."""
+        if order.error is None:
+            order.error = error
+            self._logger.error(f'{order.domain}: {error}')
+
+    def _map(self, function: typing.Callable[[typing.Any], typing.Any], items: list) -> list:
+        """Call function with all items in parallel, returning the results in the order of the items.
+
+        An exception results in None and fails only the order of its item (the item itself
+        or the order of a challenge), the calls for the other items are not affected.
+
+        """
+        if not items:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(self._workers, len(items)))) as executor:
+            futures = [executor.submit(function, item) for item in items]
+
+        results = []
+        for item, future in zip(items, futures):
+            error = future.exception()
+            if error is None:
+                results.append(future.result())
+                continue
+            self._logger.debug(f'{function.__name__} failed', exc_info=error)
+            order = item if isinstance(item, _Order) else getattr(item, 'order', None)
+            if order is not None:
+                self._fail(order, f'unexpected error: {error!r}')
+            else:
+                self._logger.error(f'{function.__name__} failed: {error!r}')
+            results.append(None)
+        return results
+
+    def _due(self, domain: str) -> bool:
+        """Check if a domain has no certificate or one expiring within renew_days."""
+        from cryptography import x509
+
+        try:
+            with open(self._files(domain)['cer'], 'rb') as f:
+                expires = x509.load_pem_x509_certificate(f.read()).not_valid_after_utc
+        except (OSError, ValueError):
+            return True
+
+        remaining = expires - datetime.datetime.now(datetime.timezone.utc)
+        if remaining > datetime.timedelta(days=self._renew_days):
+            self._logger.info(f'{domain}: skipped, certificate valid for {remaining.days} more days.')
+            return False
+        return True
+
+    def _create_order(self, order: '_Order'):
+        """Create the order and collect the DNS-01 challenges of its pending authorizations."""
+        created = self._client.new_order(order.identifiers)
+        if created is None:
+            self._fail(order, 'cannot create order')
+            return
+        order.url, order.body = created
+
+        for url in order.body['authorizations']:
+            authorization = self._client.get(url)
+            if authorization is None:
+                self._fail(order, f'cannot read authorization {url}')
+                return
+            if authorization['status'] == 'valid':
+                # validated recently, e.g. by another order
+                continue
+
+            identifier = authorization['identifier']['value']
+            challenge = next((c for c in authorization.get('challenges', []) if c['type'] == 'dns-01'), None)
+            if authorization['status'] != 'pending':
+                self._fail(order, f'authorization of {identifier} is {authorization["status"]}')
+                return
+            if challenge is None:
+                self._fail(order, f'authorization of {identifier} offers no DNS-01 challenge')
+                return
+            name = f'{self.CHALLENGE_PREFIX}.{identifier}'
+            order.challenges.append(_Challenge(
+                order=order,
+                authorization_url=url,
+                url=challenge['url'],
+                name=name,
+                root_domain=self._api.new_batch(name).root_domain,
+                value=self._client.dns_value(challenge['token']),
+            ))
+
+    def _publish(self, orders: list['_Order'], challenges: list['_Challenge']):
+        """Add the TXT records of all challenges with one batch per root domain and wait for them."""
+        batches = {}
+        for challenge in challenges:
+            batch = batches.setdefault(challenge.root_domain, self._api.new_batch(challenge.root_domain))
+            batch.add(challenge.name, 'TXT', challenge.value)
+
+        self._logger.info(f'Publishing {len(challenges)} challenge(s) of {len(orders)} order(s) '
+            f'in {len(batches)} push(es)...')
+        for root_domain, result in zip(batches, self._map(self._api.apply_batch, list(batches.values()))):
+            if not result:
+                for challenge in challenges:
+                    if challenge.root_domain == root_domain:
+                        self._fail(challenge.order, f'cannot publish challenge {challenge.name}')
+
+        if self._propagation_timeout <= 0:
+            return
+        pending = [c for c in challenges if c.order.ok]
+        for challenge, propagated in zip(pending, self._map(self._wait_for_propagation, pending)):
+            if not propagated:
+                self._fail(challenge.order, f'challenge {challenge.name} not propagated within {self._propagation_timeout:.0f}s')
+
+    def _wait_for_propagation(self, challenge: '_Challenge') -> bool:
+        return self._api.wait_for_propagation(challenge.name, challenge.value,
+            timeout=self._propagation_timeout, nameservers=self._nameservers)
+
+    def _validate(self, order: '_Order'):
+        """Answer the challenges of the order and wait until the server validated them."""
+        for challenge in order.challenges:
+            if not self._client.respond(challenge.url):
+                self._fail(order, f'challenge {challenge.name} not accepted')
+                return
+
+        for challenge in order.challenges:
+            authorization = self._client.poll(challenge.authorization_url)
+            if authorization is None or authorization['status'] != 'valid':
+                errors = [c.get('error', {}).get('detail') for c in (authorization or {}).get('challenges', []) if c.get('error')]
+                self._fail(order, f'validation of {challenge.name} failed: {", ".join(errors) or "unknown error"}')
+                return
+
+    def _cleanup(self, challenges: list['_Challenge']):
+        """Remove the TXT records of all challenges with one batch per root domain."""
+        batches = {}
+        for challenge in challenges:
+            batch = batches.setdefault(challenge.root_domain, self._api.new_batch(challenge.root_domain))
+            batch.remove(challenge.name, 'TXT', challenge.value)
+
+        for root_domain, result in zip(batches, self._map(self._api.apply_batch, list(batches.values()))):
+            if not result:
+                self._logger.warning(f'Cannot remove challenge records of {root_domain}')
+
+    def _finalize(self, order: '_Order'):
+        """Submit the CSR with a new key once the order is ready, download and store the certificate."""
+        body = self._client.poll(order.url, pending=('pending', 'processing'))
+        if body is None or body['status'] != 'ready':
+            self._fail(order, f'order is {body["status"] if body else "unknown"} instead of ready')
+            return
+
+        key, csr = self._new_key_and_csr(order.identifiers)
+        body = self._client.finalize(body, csr)
+        if body is not None and body['status'] != 'valid':
+            body = self._client.poll(order.url)
+        if body is None or body['status'] != 'valid':
+            self._fail(order, 'finalization failed')
+            return
+
+        chain = self._client.certificate(body)
+        if chain is None:
+            self._fail(order, 'cannot download certificate')
+            return
+
+        self._store(order.domain, key, chain)
+        self._logger.info(f'{order.domain}: certificate issued.')
+
+    def _new_key_and_csr(self, identifiers: list[str]) -> tuple[bytes, bytes]:
+        """New private key (PEM) and certificate signing request (DER) for the identifiers."""
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+        if self._key_type.startswith('ec'):
+            key = ec.generate_private_key(ec.SECP256R1() if self._key_type == 'ec256' else ec.SECP384R1())
+        else:
+            key = rsa.generate_private_key(public_exponent=65537, key_size=int(self._key_type[3:]))
+
+        csr = (x509.CertificateSigningRequestBuilder()
+            .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, identifiers[0])]))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(i) for i in identifiers]), critical=False)
+            .sign(key, hashes.SHA256()))
+
+        return (key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption()),
+            csr.public_bytes(serialization.Encoding.DER))
+
+    def _files(self, domain: str) -> dict[str, str]:
+        directory = os.path.join(self._certs_dir, domain)
+        return {
+            'key': os.path.join(directory, f'{domain}.key'),
+            'cer': os.path.join(directory, f'{domain}.cer'),
+            'ca': os.path.join(directory, 'ca.cer'),
+            'fullchain': os.path.join(directory, 'fullchain.cer'),
+        }
+
+    def _store(self, domain: str, key: bytes, chain: str):
+        """Write key and certificates in the layout of acme.sh.
+
+        They are written as one bundle and switched together, so readers of the cert home
+        never see the key of one certificate next to another certificate.
+
+        """
+        certificates = [f'-----BEGIN CERTIFICATE-----{c}' for c in chain.split('-----BEGIN CERTIFICATE-----')[1:]]
+        pems = [''.join(c if c.endswith('\n') else f'{c}\n' for c in content).encode('ascii')
+            for content in (certificates[:1], certificates[1:], certificates)]
+        StratoDnsApiDeployer.write_bundle(self._certs_dir, domain,
+            dict(zip(StratoDnsApiDeployer.bundle_files(domain), [key, *pems])))
+
+class _Order:
+    """An order of one certificate and its state during StratoDnsApiAcmeIssuer.issue()."""
+
+    def __init__(self, domain: str, identifiers: list[str]):
+        self.domain = domain
+        self.identifiers = identifiers
+        self.url: typing.Optional[str] = None
+        self.body: typing.Optional[dict] = None
+        self.challenges: list[_Challenge] = []
+        self.error: typing.Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _Challenge(typing.NamedTuple):
+    """A DNS-01 challenge of an order with its TXT record."""
+
+    order: _Order
+    authorization_url: str
+    url: str
+    name: str
+    root_domain: str
+    value: str
@@ -0,0 +1,278 @@
+"""Local agent serving Strato DNS API requests over a Unix domain socket."""
+import os
+import json
+import time
+import signal
+import socket
+import typing
+import logging
+import threading
+import socketserver
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_batch import StratoDnsApiBatch
+from strato_dns_api.strato_dns_api_result import StratoDnsApiResult
+
+if typing.TYPE_CHECKING:
+    from strato_dns_api.strato_dns_api_router import StratoDnsApiRouter
+
+
+class StratoDnsApiAgent:
+    """Class to keep a logged in StratoDnsApi alive and serve record changes to local clients.
+
+    With a StratoDnsApiRouter, all of its accounts are logged in and kept alive.
+
+    Clients connect to the Unix domain socket and send one JSON request per line, e.g.
+    {"action": "add", "domain": "_acme-challenge.example.com", "type": "TXT", "value": "..."}.
+    Supported actions are "add", "remove" and "get". A "get" may set "max_age" to accept
+    cached records up to that age in seconds. An "add" of a TXT record may set
+    "wait" to a timeout in seconds to wait for the value being served by the authoritative
+    nameservers before answering. Each request is answered with one JSON line,
+    {"ok": true, ...} on success or {"ok": false, "error": "..."} otherwise. Answers to "add"
+    and "remove" contain "changed", false if the records already were as requested.
+
+    Changes for the same root domain that arrive while another change of that domain is
+    waiting or being pushed are coalesced into a single push.
+    """
+
+    DEFAULT_COALESCE_DELAY = 0.2
+    DEFAULT_KEEPALIVE_INTERVAL = 300
+
+    def __init__(
+            self,
+            api: typing.Union[StratoDnsApi, 'StratoDnsApiRouter'],
+            socket_path: str,
+            coalesce_delay: float = DEFAULT_COALESCE_DELAY,
+            keepalive_interval: float = DEFAULT_KEEPALIVE_INTERVAL,
+            log_level=logging.INFO,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+
+        self._api = api
+        self._socket_path = socket_path
+        self._coalesce_delay = coalesce_delay
+        self._keepalive_interval = keepalive_interval
+
+        self._server: typing.Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._started = threading.Event()
+        self._stopped = threading.Event()
+
+        # pending changes and push lock per root domain
+        self._domains_lock = threading.Lock()
+        self._domains: dict[str, _PendingChanges] = {}
+
+    @property
+    def socket_path(self) -> str:
+        return self._socket_path
+
+    def serve(self) -> bool:
+        """Log in and serve requests until stop() is called or SIGINT/SIGTERM is received.
+
+        :returns: False if the initial login failed or another agent is serving on the socket
+        :rtype: bool
+
+        """
+        try:
+            if not self._api.login():
+                self._logger.error('Cannot start agent, login failed.')
+                return False
+
+            if not self._remove_stale_socket():
+                return False
+
+            return self._serve()
+        finally:
+            self._stopped.set()
+            self._started.set()
+
+    def wait_until_serving(self, timeout: typing.Optional[float] = None) -> bool:
+        """Wait until the agent accepts requests, e.g. when serve() runs in another thread.
+
+        :param float timeout: Maximum time to wait in seconds
+
+        :returns: True if the agent is serving, False if it failed to start or stopped already
+        :rtype: bool
+
+        """
+        return self._started.wait(timeout) and not self._stopped.is_set()
+
+    def stop(self):
+        """Stop serving requests."""
+        if self._server is not None:
+            # shutdown() blocks until serve_forever() returned, which is the calling thread for signal handlers
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def handle_request(self, line: typing.Union[str, bytes]) -> dict:
+        """Handle a single JSON request.
+
+        :param str line: JSON encoded request
+
+        :returns: Response to be sent to the client
+        :rtype: dict
+
+        """
+        try:
+            request = json.loads(line)
+            action = request.get('action')
+            domain = request['domain']
+
+            if action == 'get':
+                max_age = float(request['max_age']) if request.get('max_age') is not None else None
+                return {'ok': True, 'records': self._api.get_txt_records(domain, max_age=max_age).to_list()}
+
+            if action not in (StratoDnsApiBatch.ACTION_ADD, StratoDnsApiBatch.ACTION_REMOVE):
+                return {'ok': False, 'error': f'Unsupported action: {action}'}
+            if request.get('type') not in ('CNAME', 'TXT'):
+                return {'ok': False, 'error': f'Unsupported record type: {request.get("type")}'}
+            if action == StratoDnsApiBatch.ACTION_ADD and not request.get('value'):
+                return {'ok': False, 'error': 'Missing value'}
+
+        except (ValueError, KeyError, AttributeError) as e:
+            return {'ok': False, 'error': f'Invalid request: {e}'}
+
+        try:
+            result = self._apply(request)
+            success = result.success
+            if success and action == StratoDnsApiBatch.ACTION_ADD and request['type'] == 'TXT' and request.get('wait'):
+                success = self._api.wait_for_propagation(domain, request['value'], timeout=float(request['wait']))
+            return {'ok': success, 'changed': result.changed}
+        except Exception as e:
+            self._logger.exception(f'Failed to handle request {request}')
+            return {'ok': False, 'error': str(e)}
+
+#######################################################################################################################
+# private methods
+    def _serve(self) -> bool:
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = agent.handle_request(line)
+                    self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+                    self.wfile.flush()
+
+        old_umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self._socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: self.stop())
+
+        keepalive = threading.Thread(target=self._keep_alive, name='keepalive', daemon=True)
+        keepalive.start()
+
+        self._logger.info(f'Serving on {self._socket_path}...')
+        self._started.set()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._remove_socket()
+            self._logger.info('Agent stopped.')
+
+        return True
+
+    def _apply(self, request: dict) -> StratoDnsApiResult:
+        """Queue a change and push it, together with all other queued changes of the same root domain."""
+        root_domain = self._api.new_batch(request['domain']).root_domain
+        change = _Change(request)
+
+        with self._domains_lock:
+            domain = self._domains.setdefault(root_domain, _PendingChanges())
+            domain.changes.append(change)
+
+        with domain.push_lock:
+            if change.done.is_set():
+                # pushed by another request in the meantime
+                return change.result
+
+            # give concurrent requests for the same domain the chance to join this push
+            time.sleep(self._coalesce_delay)
+
+            with self._domains_lock:
+                changes, domain.changes = domain.changes, []
+
+            batch = self._api.new_batch(root_domain)
+            for queued in changes:
+                if queued.request['action'] == StratoDnsApiBatch.ACTION_ADD:
+                    batch.add(queued.request['domain'], queued.request['type'], queued.request['value'],
+                        queued.request.get('overwrite', False))
+                else:
+                    batch.remove(queued.request['domain'], queued.request['type'], queued.request.get('value'))
+
+            if len(changes) > 1:
+                self._logger.info(f'Coalesced {len(changes)} changes for {root_domain} into one push.')
+
+            try:
+                result = self._api.apply_batch(batch)
+            except Exception:
+                self._logger.exception(f'Failed to apply changes for {root_domain}')
+                result = StratoDnsApiResult(False)
+
+            for queued in changes:
+                queued.result = result
+                queued.done.set()
+
+        return change.result
+
+    def _keep_alive(self):
+        while not self._stopped.wait(self._keepalive_interval):
+            try:
+                if not self._api.keep_alive():
+                    self._logger.error('Keeping session alive failed.')
+            except Exception:
+                self._logger.exception('Keeping session alive failed.')
+
+    def _remove_stale_socket(self) -> bool:
+        """Remove a socket file left over by an agent that did not shut down cleanly.
+
+        :returns: False if the socket is still in use by another agent
+        :rtype: bool
+
+        """
+        if not os.path.exists(self._socket_path):
+            return True
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            try:
+                client.connect(self._socket_path)
+                self._logger.error(f'Another agent is already serving on {self._socket_path}')
+                return False
+            except OSError:
+                pass
+
+        self._logger.warning(f'Removing stale socket {self._socket_path}')
+        self._remove_socket()
+        return True
+
+    def _remove_socket(self):
+        try:
+            os.unlink(self._socket_path)
+        except FileNotFoundError:
+            pass
+
+
+class _Change:
+    """A requested change waiting to be pushed."""
+
+    def __init__(self, request: dict):
+        self.request = request
+        self.done = threading.Event()
+        self.result = StratoDnsApiResult(False)
+
+
+class _PendingChanges:
+    """Changes of a root domain waiting to be pushed."""
+
+    def __init__(self):
+        self.changes: list[_Change] = []
+        self.push_lock = threading.Lock()
@@ -0,0 +1,468 @@
+"""Asynchronous Strato API for DNS manipulation, requires the 'async' extra (httpx)."""
+import typing
+import asyncio
+import contextlib
+
+import httpx
+
+from strato_dns_api.strato_dns_api_base import StratoDnsApiBase
+from strato_dns_api.strato_dns_api_login_page import StratoDnsApiLoginPage
+from strato_dns_api.strato_dns_api_batch import StratoDnsApiBatch
+from strato_dns_api.strato_dns_api_result import StratoDnsApiResult
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecordSet
+
+class AsyncStratoDnsApi(StratoDnsApiBase):
+    """Class to manipulate DNS on domains hosted at Strato from an asyncio event loop.
+
+    It offers the same operations as StratoDnsApi as coroutines. All of them share one
+    client with a bounded connection pool, one session and one package index. Changes
+    of the same root domain are serialized by an asyncio lock per domain (and the file
+    lock between processes), changes of different domains run concurrently::
+
+        async with AsyncStratoDnsApi.from_config_file('strato-acme-config.json') as api:
+            await asyncio.gather(*(api.add_txt_record(f'_acme-challenge.{domain}', 'TXT', value)
+                for domain, value in challenges.items()))
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # client for cookie sharing, created on first use
+        self._client: typing.Optional[httpx.AsyncClient] = None
+        self._login_lock = asyncio.Lock()
+        self._package_index_lock = asyncio.Lock()
+        self._domain_locks: dict[str, asyncio.Lock] = {}
+
+    async def __aenter__(self) -> 'AsyncStratoDnsApi':
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the connections of the client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def _http_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:126.0) Gecko/20100101 Firefox/126.0'}
+            self._client = self._transport.create_async_client(headers)
+        return self._client
+
+    async def login(self) -> bool:
+        """Login to Strato website. Requests session ID.
+
+        Concurrent calls wait for the first one instead of logging in several times.
+
+        :returns: True if login was successful
+        :rtype: bool
+
+        """
+        async with self._login_lock:
+            if self._credentials.logged_in:
+                return True
+
+            session = self._cached_session()
+            if session is not None:
+                for cookie in session.get('cookies', []):
+                    self._http_client.cookies.set(cookie['name'], cookie['value'],
+                        domain=cookie.get('domain') or '', path=cookie.get('path', '/'))
+                self._session_id = session['session_id']
+                self._credentials.logged_in = True
+                self._logger.info('Reusing cached session.')
+                return True
+
+            self._logger.info(f'Logging in to {self._api_url}...')
+            try:
+                with self._metrics.measure('login') as sample:
+                    # request session id
+                    sample.add_response(await self._http_client.get(self._api_url))
+                    data = {'identifier': self._credentials.username, 'passwd': self._credentials.password, 'action_customer_login.x': 'Login'}
+
+                    response = sample.add_response(await self._http_client.post(self._api_url, data=data))
+
+                # Check 2FA Login (if required)
+                with self._metrics.measure('login_2fa') as sample:
+                    two_factor_response = await self._login_2fa(response)
+                    if two_factor_response is not response:
+                        sample.add_response(two_factor_response)
+                    response = two_factor_response
+            except httpx.HTTPError as e:
+                self._logger.error(f'Login failed: {e}')
+                self._credentials.logged_in = False
+                return False
+
+            session_id = StratoDnsApiLoginPage.session_id(str(response.url))
+            if session_id is None:
+                self._logger.error('Login failed. No session ID found.')
+                self._credentials.logged_in = False
+                return False
+
+            self._session_id = session_id
+            self._logger.info('Login successful.')
+            self._credentials.logged_in = True
+            self._cache_session(self._http_client.cookies.jar)
+            return True
+
+    async def keep_alive(self) -> bool:
+        """Confirm the current session with Strato and log in again if it expired.
+
+        :returns: True if logged in afterwards
+        :rtype: bool
+
+        """
+        if not self._credentials.logged_in:
+            return await self.login()
+
+        try:
+            await self._get({}, 'keep_alive')
+        except httpx.HTTPError as e:
+            self._logger.error(f'Keeping session alive failed: {e}')
+        return self._credentials.logged_in
+
+    async def get_txt_records(self, full_domain: str, package_id: typing.Optional[int] = None,
+            max_age: typing.Optional[float] = None) -> StratoDnsApiRecordSet:
+        """Requests all txt and cname records related to domain.
+
+        With a cache, record sets read or pushed by this or another process are
+        returned without asking Strato if they are not older than max_age.
+
+        :param str full_domain: Root domain or any FQDN below it
+        :param int package_id: Package of the domain, looked up if None
+        :param float max_age: Maximum age of cached records in seconds, records_max_age of the cache if None, 0 to read them from Strato
+
+        :returns: Records, empty if they could not be loaded
+        :rtype: StratoDnsApiRecordSet
+
+        """
+        records = await self.fetch_txt_records(full_domain, package_id, max_age)
+        return records if records is not None else StratoDnsApiRecordSet()
+
+    async def fetch_txt_records(self, full_domain: str, package_id: typing.Optional[int] = None,
+            max_age: typing.Optional[float] = None) -> typing.Optional[StratoDnsApiRecordSet]:
+        """Requests all txt and cname records related to domain, like get_txt_records() but telling a failure from no records.
+
+        :param str full_domain: Root domain or any FQDN below it
+        :param int package_id: Package of the domain, looked up if None
+        :param float max_age: Maximum age of cached records in seconds, records_max_age of the cache if None, 0 to read them from Strato
+
+        :returns: Records or None if they could not be loaded
+        :rtype: StratoDnsApiRecordSet
+
+        """
+        root_domain, _ = self._get_root_domain(full_domain)
+        records = self._cached_records(root_domain, max_age)
+        if records is None:
+            records = await self._fetch_records(full_domain, package_id)
+        return records
+
+    async def add_txt_record(self, full_domain: str, record_type: str, value: str, overwrite: bool = False) -> StratoDnsApiResult:
+        """Add a txt/cname record.
+
+        :param key str: Key of record as FQDN or prefix, eg 'subdomain' or 'subdomain.domain.tld'
+        :param record_type str: Type of record ('TXT' or 'CNAME')
+        :param value str: Value of record
+        :param overwrite bool: Whether to overwrite existing records or add a new one
+
+        :returns: Result, truthy on success, not changed if the record already existed
+        :rtype: StratoDnsApiResult
+
+        """
+        async with self.batch(full_domain) as batch:
+            batch.add(full_domain, record_type, value, overwrite)
+
+        return StratoDnsApiResult(batch.success, batch.changed)
+
+    async def remove_txt_record(self, full_domain: str, record_type: str, value: typing.Optional[str] = None) -> StratoDnsApiResult:
+        """Remove a txt/cname record.
+
+        :param full_domain str: Key of record as FQDN or prefix, eg 'subdomain' or 'subdomain.domain.tld'
+        :param record_type str: Type of record ('TXT' or 'CNAME')
+        :param value str: Value of the record to remove, if None removes all records with matching prefix
+
+        :returns: Result, truthy on success, not changed if there was nothing to remove
+        :rtype: StratoDnsApiResult
+
+        """
+        async with self.batch(full_domain) as batch:
+            batch.remove(full_domain, record_type, value)
+
+        return StratoDnsApiResult(batch.success, batch.changed)
+
+    async def wait_for_propagation(
+            self,
+            full_domain: str,
+            value: str,
+            timeout: typing.Optional[float] = None,
+            nameservers: typing.Optional[list[tuple[str, int]]] = None,
+        ) -> bool:
+        """Wait until all authoritative nameservers of the domain serve a TXT value.
+
+        The DNS queries run in a worker thread, see StratoDnsApi.wait_for_propagation().
+
+        :returns: True if the value is served by all nameservers within the timeout
+        :rtype: bool
+
+        """
+        from strato_dns_api.strato_dns_api_propagation import StratoDnsApiPropagation
+
+        root_domain, _ = self._get_root_domain(full_domain)
+        propagation = StratoDnsApiPropagation(nameservers=nameservers, log_level=self._logger.level)
+        return await asyncio.to_thread(propagation.wait, full_domain, value, root_domain,
+            timeout if timeout is not None else StratoDnsApiPropagation.DEFAULT_TIMEOUT)
+
+    @contextlib.asynccontextmanager
+    async def batch(self, root_domain: str) -> typing.AsyncIterator[StratoDnsApiBatch]:
+        """Collect several record changes of a domain and apply them with one read and one push.
+
+        See StratoDnsApi.batch(), the changes are applied when the context is left without exception.
+
+        :param str root_domain: Root domain (or any FQDN below it) of all changes
+
+        :returns: Batch to collect changes in
+        :rtype: StratoDnsApiBatch
+
+        """
+        batch = self.new_batch(root_domain)
+        yield batch
+        await self.apply_batch(batch)
+
+    async def apply_batch(self, batch: StratoDnsApiBatch) -> StratoDnsApiResult:
+        """Apply all changes of a batch to the current record set and push it once.
+
+        :param StratoDnsApiBatch batch: Changes to apply
+
+        :returns: Result, truthy if all changes were applied, changed if the record set was pushed
+        :rtype: StratoDnsApiResult
+
+        """
+        root_domain = batch.root_domain
+        operations = self._batch_operations(batch)
+        if operations is None:
+            return self._batch_result(batch, StratoDnsApiResult(False))
+
+        if not operations:
+            return self._batch_result(batch, StratoDnsApiResult(True))
+
+        if not await self.login():
+            self._logger.error('Cannot change records, not logged in.')
+            return self._batch_result(batch, StratoDnsApiResult(False))
+
+        async with self._domain_locks.setdefault(root_domain, asyncio.Lock()):
+            fd = await self._record_lock.acquire_async(root_domain)
+            if fd is None:
+                self._logger.error(f'Cannot change records of {root_domain}, lock not acquired.')
+                return self._batch_result(batch, StratoDnsApiResult(False))
+            try:
+                result = await self._apply_operations(root_domain, operations)
+            finally:
+                self._record_lock.release(fd)
+
+        return self._batch_result(batch, result)
+
+#######################################################################################################################
+# private methods
+    async def _apply_operations(self, root_domain: str, operations: list[tuple[str, dict]]) -> StratoDnsApiResult:
+        """Read the record set of a domain, apply the operations and push it if modified.
+
+        Runs StratoDnsApiBase._apply_steps(), awaiting the I/O methods it yields.
+
+        :returns: Result, changed if the record set was pushed
+        :rtype: StratoDnsApiResult
+
+        """
+        steps = self._apply_steps(root_domain, operations)
+        result = None
+        while True:
+            try:
+                method, *args = steps.send(result)
+            except StopIteration as e:
+                return e.value
+            result = await getattr(self, method)(*args)
+
+    @staticmethod
+    async def _sleep(delay: float):
+        await asyncio.sleep(delay)
+
+    async def _get(self, params: dict, operation: str) -> httpx.Response:
+        """GET a page of the customer service with the current session ID.
+
+        Transient errors are retried with backoff. If Strato answers with the login page,
+        the session expired and a full login is done before repeating the request once.
+
+        :param dict params: Query parameters without session ID
+        :param str operation: Name of the operation in the metrics
+
+        :returns: Response of Strato
+        :rtype: httpx.Response
+
+        """
+        session_id = self._session_id
+        response = await self._get_with_retries({'sessionID': session_id, **params}, operation)
+
+        if StratoDnsApiLoginPage.is_login_page(response.text):
+            async with self._login_lock:
+                # another task might have logged in again already
+                if self._session_id == session_id:
+                    self._logger.info('Session expired, logging in again...')
+                    self._forget_session()
+                    self._http_client.cookies.clear()
+            if await self.login():
+                response = await self._get_with_retries({'sessionID': self._session_id, **params}, operation)
+
+        return response
+
+    async def _get_with_retries(self, params: dict, operation: str) -> httpx.Response:
+        with self._metrics.measure(operation) as sample:
+            for attempt in range(1, self._transport.retries + 2):
+                try:
+                    response = await self._http_client.get(self._api_url, params=params)
+                    if (response.status_code not in self._transport.RETRY_STATUS_CODES
+                            or attempt > self._transport.retries):
+                        return sample.add_response(response)
+                    self._logger.debug(f'GET failed with status {response.status_code}, retrying...')
+                except httpx.TransportError as e:
+                    if attempt > self._transport.retries:
+                        raise
+                    self._logger.debug(f'GET failed: {e}, retrying...')
+
+                sample.retries += 1
+                await asyncio.sleep(self._transport.backoff(attempt))
+
+    async def _login_2fa(self, response: httpx.Response) -> httpx.Response:
+        """Login with Two-factor authentication by TOTP on Strato website.
+
+        :returns: Original response or 2FA response
+        :rtype: httpx.Response
+
+        """
+        totp_secret = self._credentials.totp_secret
+        totp_devicename = self._credentials.totp_devicename
+
+        if not StratoDnsApiLoginPage.is_two_factor_page(response.text):
+            self._logger.info('2FA is not used.')
+            return response
+        if (not totp_secret) or (not totp_devicename):
+            self._logger.error('2FA parameter is not completely set.')
+            return response
+
+        try:
+            param = StratoDnsApiLoginPage.two_factor_params(response.text, self._credentials.username,
+                totp_secret, totp_devicename)
+        except ValueError as e:
+            self._logger.error(str(e))
+            return response
+
+        return await self._http_client.post(self._api_url, data=param)
+
+    async def _fetch_records(self, full_domain: str, package_id: typing.Optional[int] = None) -> typing.Optional[StratoDnsApiRecordSet]:
+        """Requests all txt and cname records related to domain.
+
+        :returns: Records or None if they could not be loaded
+        :rtype: StratoDnsApiRecordSet
+
+        """
+        self._logger.info(f'Getting TXT/CNAME records for domain: {full_domain}')
+
+        root_domain, _ = self._get_root_domain(full_domain)
+
+        if not await self.login():
+            self._logger.error('Cannot get TXT records, not logged in.')
+            return None
+
+        try:
+            if package_id:
+                response = await self._get(self._records_page_params(root_domain, package_id), 'fetch_records')
+            else:
+                response = await self._get(self._records_page_params(root_domain,
+                    await self._load_package_id(root_domain)), 'fetch_records')
+                if not self._is_records_page(response.text) and not self._package_index_fresh:
+                    self._logger.warning(f'Strato rejected package of domain {root_domain}, refreshing package index...')
+                    response = await self._get(self._records_page_params(root_domain,
+                        await self._load_package_id(root_domain, refresh=True)), 'fetch_records')
+        except httpx.HTTPError as e:
+            self._logger.error(f'Cannot get TXT records of {root_domain}: {e}')
+            return None
+
+        if not self._is_records_page(response.text):
+            self._logger.error(f'Cannot get TXT records, Strato did not show the records of {root_domain}.')
+            return None
+
+        records = self._parse_records(response.text, root_domain)
+        self._cache_records(root_domain, records)
+        return records
+
+    async def _push_txt_records(self, records: StratoDnsApiRecordSet, root_domain: str, package_id: int) -> bool:
+        """Push modified txt records to Strato.
+
+        See StratoDnsApi._push_txt_records(), only an answer with the record form counts as
+        success and an expired session is renewed before pushing once more.
+
+        :returns: True if Strato accepted the record set
+        :rtype: bool
+
+        """
+        session_id = self._session_id
+        try:
+            response = await self._post_records(records, root_domain, package_id)
+            if StratoDnsApiLoginPage.is_login_page(response.text):
+                async with self._login_lock:
+                    # another task might have logged in again already
+                    if self._session_id == session_id:
+                        self._logger.info('Session expired, logging in again...')
+                        self._forget_session()
+                        self._http_client.cookies.clear()
+                if not await self.login():
+                    self._logger.error(f'Pushing records of {root_domain} failed, not logged in.')
+                    return False
+                response = await self._post_records(records, root_domain, package_id)
+        except httpx.HTTPError as e:
+            self._logger.error(f'Pushing records of {root_domain} failed: {e}')
+            return False
+
+        if response.status_code != 200:
+            self._logger.error(f'Pushing records of {root_domain} failed with status {response.status_code}')
+            return False
+        if not self._is_records_page(response.text):
+            self._logger.error(f'Pushing records of {root_domain} failed, Strato did not show the records afterwards.')
+            return False
+        return True
+
+    async def _post_records(self, records: StratoDnsApiRecordSet, root_domain: str, package_id: int) -> httpx.Response:
+        with self._metrics.measure('push_records') as sample:
+            try:
+                return sample.add_response(await self._http_client.post(self._api_url,
+                    data=self._push_params(records, root_domain, package_id)))
+            except httpx.HTTPError:
+                sample.success = False
+                raise
+
+    async def _load_package_id(self, root_domain: str, refresh: bool = False) -> int:
+        """Looks up the package ID for the selected domain in the package index.
+
+        See StratoDnsApi._load_package_id(), the index is downloaded at most once
+        even if many tasks need it at the same time.
+
+        :returns: Package ID on success, 1 as default otherwise
+        :rtype: int
+        """
+        async with self._package_index_lock:
+            if refresh and not self._package_index_fresh:
+                await self._refresh_package_index()
+
+            package_id = self._lookup_package_id(root_domain)
+
+            if package_id is None and not self._package_index_fresh:
+                await self._refresh_package_index()
+                package_id = self._package_index.lookup(root_domain)
+
+            return self._package_id_or_fallback(root_domain, package_id)
+
+    async def _refresh_package_index(self):
+        """Download the customer entry page and rebuild the package index from it."""
+        self._logger.info('Loading strato package index...')
+        response = await self._get(self.PACKAGE_INDEX_PARAMS, 'package_index')
+        self._update_package_index(response.text)
@@ -0,0 +1,532 @@
+"""State and logic shared by the synchronous and the asynchronous Strato DNS API."""
+import sys
+import re
+import json
+import typing
+import logging
+import pathlib
+import functools
+import http.cookiejar
+
+# Third party imports are deferred to the code paths using them to keep the CLI startup fast
+if typing.TYPE_CHECKING:
+    import tldextract
+
+from strato_dns_api.strato_dns_api_credentials import StratoDnsApiCredentials
+from strato_dns_api.strato_dns_api_cache import StratoDnsApiCache
+from strato_dns_api.strato_dns_api_lock import StratoDnsApiLock
+from strato_dns_api.strato_dns_api_transport import StratoDnsApiTransport
+from strato_dns_api.strato_dns_api_metrics import StratoDnsApiMetrics
+from strato_dns_api.strato_dns_api_package_index import StratoDnsApiPackageIndex
+from strato_dns_api.strato_dns_api_batch import StratoDnsApiBatch
+from strato_dns_api.strato_dns_api_result import StratoDnsApiResult
+from strato_dns_api.strato_dns_api_record_parser import StratoDnsApiRecordParser
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecord, StratoDnsApiRecordSet
+
+# public suffix list bundled with the package, to resolve root domains without network access
+PUBLIC_SUFFIX_LIST_SNAPSHOT = pathlib.Path(__file__).parent / 'data' / 'public_suffix_list.dat'
+
+class StratoDnsApiBase:
+    """Base class of the Strato DNS APIs with everything that does not depend on the HTTP client.
+
+    This covers the configuration, changing record sets in memory, parsing pages and the
+    cached session and package index. Subclasses implement the requests to Strato.
+    """
+
+    API_URLS = {
+        "de": "https://www.strato.de/apps/CustomerService",
+        "nl": "https://www.strato.nl/apps/CustomerService#skl",
+    }
+
+    BASE_DOMAIN_REGEX = re.compile(r'([\w-]+\.[\w-]+)$')
+    RECORD_PREFIX_REGEX = re.compile(r'^([\w-]+)')
+
+    # attempts to apply changes if the record set is modified concurrently, see StratoDnsApiLock.verify
+    MAX_APPLY_ATTEMPTS = 3
+
+    PACKAGE_INDEX_PARAMS = {
+        'cID': 0,
+        'node': 'kds_CustomerEntryPage',
+    }
+
+    @classmethod
+    def from_config_file(
+            cls,
+            config_file: str,
+            log_level: int = logging.INFO,
+        ) -> 'StratoDnsApiBase':
+        """Initialize Strato DNS API from JSON config file.
+
+        :param str config_file: Path to JSON config file
+        :param int log_level: Logging level
+
+        :returns: Instance of the class this is called on
+        :rtype: StratoDnsApiBase
+
+        """
+        logging.basicConfig(level=log_level)
+        logger = logging.getLogger('strato_dns_api')
+        logger.info(f'Loading configuration from {config_file}...')
+        try:
+            with open(config_file, 'r') as f:
+                api = cls.from_config(json.load(f), log_level=log_level)
+
+                logger.info('Configuration loaded successfully.')
+                return api
+
+        except Exception as e:
+           logger.error(f'Error loading config file {config_file}: {e}')
+           sys.exit(1)
+
+    @classmethod
+    def from_config(
+            cls,
+            config: dict,
+            log_level: int = logging.INFO,
+            metrics: typing.Optional[StratoDnsApiMetrics] = None,
+        ) -> 'StratoDnsApiBase':
+        """Initialize Strato DNS API from a configuration dictionary, i.e. the content of the config file.
+
+        :param dict config: Configuration with location, credentials and optional settings
+        :param int log_level: Logging level
+        :param StratoDnsApiMetrics metrics: Metrics to record to, e.g. shared with other instances
+
+        :returns: Instance of the class this is called on
+        :rtype: StratoDnsApiBase
+
+        """
+        if not "location" in config:
+            config = {**config, "location": "de"}
+            logging.getLogger('strato_dns_api').info('No location specified in config, defaulting to "de"')
+
+        cache = StratoDnsApiCache.from_dict(config['cache']) if config.get('cache') else None
+        lock = StratoDnsApiLock.from_dict(config['locking']) if config.get('locking') else None
+        transport = StratoDnsApiTransport.from_dict(config['transport']) if config.get('transport') else None
+
+        return cls(location=config["location"], credentials=StratoDnsApiCredentials.from_dict(config['credentials']), log_level=log_level, cache=cache, lock=lock,
+            transport=transport, metrics=metrics, api_url=config.get('api_url'))
+
+    def __init__(self, location: str, credentials: StratoDnsApiCredentials, log_level=logging.INFO,
+            cache: typing.Optional[StratoDnsApiCache] = None, lock: typing.Optional[StratoDnsApiLock] = None,
+            transport: typing.Optional[StratoDnsApiTransport] = None, metrics: typing.Optional[StratoDnsApiMetrics] = None,
+            api_url: typing.Optional[str] = None):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        logfmt = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        loghdlr = logging.StreamHandler(stream=sys.stdout)
+        loghdlr.setFormatter(logfmt)
+        self._logger.addHandler(loghdlr)
+        self._logger.setLevel(log_level)
+
+        self._credentials = credentials
+        if not location in self.API_URLS:
+            self._logger.error(f'Unsupported location "{location}", available: {list(self.API_URLS.keys())}')
+            sys.exit(1)
+
+        self._location = location
+        # another URL than the one of the location, e.g. of a local test server
+        self._api_url = api_url or self.API_URLS[location]
+        self._cache = cache
+        # serializes record changes of a domain between processes
+        self._record_lock = lock or StratoDnsApiLock()
+        self._transport = transport or StratoDnsApiTransport()
+        self._metrics = metrics or StratoDnsApiMetrics()
+
+        self._session_id = ''
+        self._package_index: typing.Optional[StratoDnsApiPackageIndex] = None
+        # set once the package index was downloaded by this instance, no need to download it again
+        self._package_index_fresh = False
+
+    @property
+    def metrics(self) -> StratoDnsApiMetrics:
+        return self._metrics
+
+    def new_batch(self, full_domain: str) -> StratoDnsApiBatch:
+        """Create an empty batch for the root domain of a FQDN, to be applied with apply_batch().
+
+        :param str full_domain: Root domain or any FQDN below it
+
+        :returns: Empty batch
+        :rtype: StratoDnsApiBatch
+
+        """
+        return StratoDnsApiBatch(self._get_root_domain(full_domain)[0])
+
+#######################################################################################################################
+# private methods
+    def _batch_operations(self, batch: StratoDnsApiBatch) -> typing.Optional[list[tuple[str, dict]]]:
+        """Resolve the record prefix of every operation of a batch.
+
+        :returns: Prefix and operation pairs, None if an operation does not belong to the domain of the batch
+        :rtype: list[tuple[str, dict]]
+
+        """
+        operations = []
+        for operation in batch.operations:
+            operation_root, prefix = self._get_root_domain(operation['full_domain'])
+            if operation_root != batch.root_domain:
+                self._logger.error(f'Record {operation["full_domain"]} does not belong to domain {batch.root_domain}')
+                return None
+            operations.append((prefix, operation))
+        return operations
+
+    @staticmethod
+    def _batch_result(batch: StratoDnsApiBatch, result: StratoDnsApiResult) -> StratoDnsApiResult:
+        """Store the result of applying a batch in the batch."""
+        batch.success = result.success
+        batch.changed = result.changed
+        return result
+
+    def _apply_steps(self, root_domain: str, operations: list[tuple[str, dict]]
+        ) -> typing.Generator[tuple, typing.Any, StratoDnsApiResult]:
+        """Read the record set of a domain, apply the operations and push it if modified.
+
+        With verification enabled, the record set is read again right before pushing. If it
+        was modified meanwhile, e.g. in the web interface or by a process not using the same
+        lock directory, the operations are applied to the new record set again.
+
+        A failed push is only retried (see StratoDnsApiTransport.retry_push) after reading
+        the record set back, since the push might have been applied anyway.
+
+        The first attempt starts from the cached record set if it is recent enough (see
+        StratoDnsApiCache.records_max_age). A pushed record set is written to the cache,
+        after a failed push the cached one is removed.
+
+        The steps do no I/O themselves: they yield the name and arguments of the method doing
+        it (_fetch_records, _load_package_id, _push_txt_records or _sleep) and are sent its
+        result, so the synchronous and the asynchronous API share them, see _apply_operations().
+
+        :returns: Result, changed if the record set was pushed
+        :rtype: StratoDnsApiResult
+
+        """
+        # record set read after the last attempt, to apply the operations to without reading it again
+        latest = None
+        for attempt in range(1, self.MAX_APPLY_ATTEMPTS + 1):
+            records = latest
+            if records is None and attempt == 1:
+                records = self._cached_records(root_domain)
+            if records is None:
+                records = yield ('_fetch_records', root_domain)
+            latest = None
+            if records is None:
+                return StratoDnsApiResult(False)
+            package_id = yield ('_load_package_id', root_domain)
+
+            current = records.copy() if self._record_lock.verify else None
+            if not self._apply_to_records(records, operations):
+                self._logger.info(f'Records of {root_domain} already up to date, skipping push.')
+                return StratoDnsApiResult(True)
+
+            if current is not None:
+                latest = yield ('_fetch_records', root_domain)
+                if latest is None:
+                    return StratoDnsApiResult(False)
+                if latest != current:
+                    self._logger.warning(f'Records of {root_domain} changed while applying changes '
+                        f'(attempt {attempt}/{self.MAX_APPLY_ATTEMPTS}), applying them again...')
+                    continue
+                latest = None
+
+            if (yield ('_push_txt_records', records, root_domain, package_id)):
+                self._logger.info(f'Successfully applied {len(operations)} change(s) to records of {root_domain}')
+                self._cache_records(root_domain, records)
+                return StratoDnsApiResult(True, changed=True)
+            # the record set at Strato is unknown now
+            self._forget_records(root_domain)
+            if not self._transport.retry_push or attempt == self.MAX_APPLY_ATTEMPTS:
+                break
+
+            yield ('_sleep', self._transport.backoff(attempt))
+            latest = yield ('_fetch_records', root_domain)
+            if latest == records:
+                self._logger.info(f'Push of records of {root_domain} failed but was applied, '
+                    f'{len(operations)} change(s) applied.')
+                return StratoDnsApiResult(True, changed=True)
+            self._logger.warning(f'Push of records of {root_domain} failed '
+                f'(attempt {attempt}/{self.MAX_APPLY_ATTEMPTS}), applying changes again...')
+
+        self._logger.error(f'Failed to apply {len(operations)} change(s) to records of {root_domain}')
+        return StratoDnsApiResult(False)
+
+    def _apply_to_records(self, records: StratoDnsApiRecordSet, operations: list[tuple[str, dict]]) -> bool:
+        """Apply operations to a record set in memory.
+
+        The record set counts as modified only if it differs from the one before, e.g.
+        adding a value and removing it again in the same batch leaves it unmodified.
+
+        :returns: True if the record set was modified
+        :rtype: bool
+
+        """
+        original = records.copy()
+        for prefix, operation in operations:
+            if operation['action'] == StratoDnsApiBatch.ACTION_ADD:
+                self._add_record(records, prefix, operation['record_type'], operation['value'], operation['overwrite'])
+            elif operation['action'] == StratoDnsApiBatch.ACTION_SET:
+                self._set_records(records, prefix, operation['record_type'], operation['values'])
+            else:
+                self._remove_record(records, prefix, operation['record_type'], operation['value'])
+        return records != original
+
+    def _add_record(self, records: StratoDnsApiRecordSet, prefix: str, record_type: str, value: str, overwrite: bool) -> bool:
+        """Add a txt/cname record to a record set in memory.
+
+        A record with the same prefix, type and value is not added again.
+
+        :returns: True if the record set was modified
+        :rtype: bool
+
+        """
+        record = StratoDnsApiRecord(prefix, record_type, value)
+        matching = records.get(prefix, record_type)
+        if matching:
+            if overwrite:
+                if matching[0] == record:
+                    self._logger.info(f'{record_type} record already up to date: {prefix} = {value}')
+                    return False
+                self._logger.info(f'Overwriting existing {record_type} record: {prefix} = {value}...')
+                records.remove(matching[0])
+                records.add(record)
+                return True
+            if record in records:
+                self._logger.info(f'{record_type} record already exists: {prefix} = {value}')
+                return False
+            self._logger.info(f'Creating additional {record_type} record: {prefix} = {value}')
+        else:
+            self._logger.info(f'Creating new {record_type} record: {prefix} = {value}...')
+
+        return records.add(record)
+
+    def _remove_record(self, records: StratoDnsApiRecordSet, prefix: str, record_type: str, value: typing.Optional[str]) -> bool:
+        """Remove a txt/cname record (or only the one with a value) from a record set in memory.
+
+        :returns: True if the record set was modified
+        :rtype: bool
+
+        """
+        if value is None:
+            modified = bool(records.remove_all(prefix, record_type))
+            if modified:
+                self._logger.info(f'Removing {record_type} record: {prefix}')
+        else:
+            modified = records.remove(StratoDnsApiRecord(prefix, record_type, value))
+            if modified:
+                self._logger.info(f'Removing {record_type} record: {prefix} = {value}')
+
+        if not modified:
+            self._logger.warning(f'No {record_type} record found for removal: {prefix}')
+
+        return modified
+
+    def _set_records(self, records: StratoDnsApiRecordSet, prefix: str, record_type: str, values: list[str]) -> bool:
+        """Make values the only txt/cname records of a prefix and type in a record set in memory.
+
+        :returns: True if the record set was modified
+        :rtype: bool
+
+        """
+        modified = False
+        wanted = set(values)
+        for record in records.get(prefix, record_type):
+            if record.value not in wanted:
+                self._logger.info(f'Removing {record_type} record: {prefix} = {record.value}')
+                records.remove(record)
+                modified = True
+
+        for value in values:
+            if records.add(StratoDnsApiRecord(prefix, record_type, value)):
+                self._logger.info(f'Creating new {record_type} record: {prefix} = {value}...')
+                modified = True
+
+        return modified
+
+    def _parse_records(self, page: str, root_domain: str) -> StratoDnsApiRecordSet:
+        """Parse the records of the record page of a domain."""
+        with self._metrics.measure('parse_records'):
+            records = StratoDnsApiRecordSet(StratoDnsApiRecordParser.iter_records(page))
+
+        self._logger.debug(f"Current cname/txt records for '{root_domain}':")
+        list(self._logger.debug(f'  {item.type}: {item.prefix}.{root_domain} = {item.value}')
+            for item in records)
+
+        return records
+
+    @staticmethod
+    def _is_records_page(page: str) -> bool:
+        """Check if Strato answered with the record form, i.e. accepted the package ID."""
+        return 'action_change_txt_records' in page
+
+    @staticmethod
+    def _records_page_params(root_domain: str, package_id: int) -> dict:
+        return {
+            'cID': package_id,
+            'node': 'ManageDomains',
+            'action_show_txt_records': '',
+            'vhost': root_domain
+        }
+
+    def _push_params(self, records: StratoDnsApiRecordSet, root_domain: str, package_id: int) -> dict:
+        """Form parameters replacing the record set of a domain."""
+        self._logger.debug('Pushing domain TXT/CNAME records:')
+        list(self._logger.debug(f'  {item.type}: {item.prefix}.{root_domain} = {item.value}')
+            for item in records)
+
+        return {
+            'sessionID': self._session_id,
+            'cID': package_id,
+            'node': 'ManageDomains',
+            'vhost': root_domain,
+            'spf_type': 'NONE',
+            **records.to_form_fields(),
+            'action_change_txt_records': 'Einstellung+übernehmen',
+        }
+
+    def _session_cache_name(self) -> str:
+        return f'session-{StratoDnsApiCache.key(self._api_url, self._credentials.username)}'
+
+    def _cached_session(self) -> typing.Optional[dict]:
+        """Load session ID and cookies from the session cache.
+
+        :returns: Stored session or None if there is no valid one
+        :rtype: dict
+
+        """
+        if self._cache is None:
+            return None
+
+        session = self._cache.load(self._session_cache_name(), max_age=self._cache.session_max_age)
+        if not session or not session.get('session_id'):
+            return None
+        return session
+
+    def _cache_session(self, cookies: typing.Iterable[http.cookiejar.Cookie]):
+        """Store session ID and cookies in the session cache."""
+        if self._cache is None:
+            return
+
+        self._cache.store(self._session_cache_name(), {
+            'session_id': self._session_id,
+            'cookies': [{
+                'name': c.name,
+                'value': c.value,
+                'domain': c.domain,
+                'path': c.path,
+                'secure': c.secure,
+                'expires': c.expires,
+            } for c in cookies],
+        })
+
+    def _forget_session(self):
+        """Forget the session ID, locally and in the session cache."""
+        self._session_id = ''
+        self._credentials.logged_in = False
+        if self._cache is not None:
+            self._cache.delete(self._session_cache_name())
+
+    def _records_cache_name(self, root_domain: str) -> str:
+        return f'records-{StratoDnsApiCache.key(self._api_url, self._credentials.username, root_domain)}'
+
+    def _cached_records(self, root_domain: str, max_age: typing.Optional[float] = None) -> typing.Optional[StratoDnsApiRecordSet]:
+        """Load the record set of a domain from the cache if it is recent enough.
+
+        :param str root_domain: Root domain
+        :param float max_age: Maximum age in seconds, records_max_age of the cache if None
+
+        :returns: Records or None if there are none recent enough or the record cache is disabled
+        :rtype: StratoDnsApiRecordSet
+
+        """
+        if self._cache is None:
+            return None
+        max_age = self._cache.records_max_age if max_age is None else max_age
+        if max_age <= 0:
+            return None
+
+        records = self._cache.load(self._records_cache_name(root_domain), max_age=max_age)
+        if records is None:
+            return None
+        self._logger.info(f'Using cached TXT/CNAME records of {root_domain}')
+        return StratoDnsApiRecordSet.from_list(records)
+
+    def _cache_records(self, root_domain: str, records: StratoDnsApiRecordSet):
+        """Store the record set of a domain as read from or pushed to Strato."""
+        if self._cache is not None:
+            self._cache.store(self._records_cache_name(root_domain), records.to_list())
+
+    def _forget_records(self, root_domain: str):
+        """Remove the record set of a domain from the cache, e.g. if it is not known anymore."""
+        if self._cache is not None:
+            self._cache.delete(self._records_cache_name(root_domain))
+
+    def _package_index_cache_name(self) -> str:
+        return f'packages-{StratoDnsApiCache.key(self._api_url, self._credentials.username)}'
+
+    def _lookup_package_id(self, root_domain: str, exact: bool = False) -> typing.Optional[str]:
+        """Look up the package of a domain in the package index in memory or, if not loaded yet, in the cache.
+
+        :param bool exact: Only match a package listing the domain itself, see StratoDnsApiPackageIndex.lookup()
+
+        :returns: Package ID or None if the domain is not in the index
+        :rtype: str
+
+        """
+        if self._package_index is None and self._cache is not None:
+            index = self._cache.load(self._package_index_cache_name(), max_age=self._cache.package_index_ttl)
+            if index:
+                self._package_index = StratoDnsApiPackageIndex.from_dict(index)
+
+        return self._package_index.lookup(root_domain, exact) if self._package_index else None
+
+    def _update_package_index(self, page: str):
+        """Rebuild the package index from the customer entry page and cache it."""
+        with self._metrics.measure('parse_package_index'):
+            self._package_index = StratoDnsApiPackageIndex.from_html(page)
+        self._package_index_fresh = True
+        self._logger.debug(f'strato packages: {self._package_index.packages}')
+
+        if self._cache is not None:
+            self._cache.store(self._package_index_cache_name(), self._package_index.to_dict())
+
+    def _package_id_or_fallback(self, root_domain: str, package_id: typing.Optional[str]) -> int:
+        if package_id is not None:
+            self._logger.debug(f'strato package id (cID): {package_id}')
+            return package_id
+
+        self._logger.error(f'Domain {root_domain} not '
+            'found in strato packages. Using fallback cID=1')
+        return 1
+
+    def _get_root_domain(self, full_domain:str) -> tuple[str, str]:
+        """
+        Returns (root_domain, subdomain) for any ACME DNS-01 FQDN such as:
+        _acme-challenge.example.com
+        _acme-challenge.www.example.co.uk
+        sub1.sub2.example.co.uk
+        """
+
+        ext = _tld_extractor()(full_domain)
+
+        # Build the root domain (registrable domain)
+        root = f"{ext.domain}.{ext.suffix}" if ext.suffix else ext.domain
+
+        # Subdomain may be empty
+        sub = ext.subdomain or ""
+
+        return root, sub
+
+
+@functools.lru_cache(maxsize=None)
+def _tld_extractor() -> 'tldextract.TLDExtract':
+    """Extractor using the public suffix list snapshot bundled with this package.
+
+    It never fetches the list over the network nor writes it to a cache directory,
+    so it works the same in offline and read-only containers.
+    """
+    import tldextract
+
+    return tldextract.TLDExtract(
+        cache_dir=None,
+        suffix_list_urls=(PUBLIC_SUFFIX_LIST_SNAPSHOT.as_uri(),),
+        fallback_to_snapshot=True,
+    )
@@ -0,0 +1,104 @@
+"""Batch of DNS record changes for a single domain."""
+import typing
+
+
+class StratoDnsApiBatch:
+    """Class to collect TXT/CNAME record changes of one root domain.
+
+    The changes are applied to the record set in memory and pushed to Strato
+    at once, see StratoDnsApi.batch().
+    """
+
+    ACTION_ADD = 'add'
+    ACTION_REMOVE = 'remove'
+    ACTION_SET = 'set'
+
+    @property
+    def root_domain(self) -> str:
+        return self._root_domain
+    @property
+    def operations(self) -> list[dict]:
+        return self._operations
+    @property
+    def success(self) -> typing.Optional[bool]:
+        """Result of the push, None as long as the batch was not applied."""
+        return self._success
+    @success.setter
+    def success(self, value: bool):
+        self._success = value
+    @property
+    def changed(self) -> typing.Optional[bool]:
+        """Whether the record set was modified, None as long as the batch was not applied."""
+        return self._changed
+    @changed.setter
+    def changed(self, value: bool):
+        self._changed = value
+
+    def __init__(self, root_domain: str):
+
+        self._root_domain = root_domain
+        self._operations = []
+        self._success = None
+        self._changed = None
+
+    def add(self, full_domain: str, record_type: str, value: str, overwrite: bool = False) -> 'StratoDnsApiBatch':
+        """Add a txt/cname record.
+
+        :param full_domain str: FQDN of the record, e.g. 'subdomain.domain.tld'
+        :param record_type str: Type of record ('TXT' or 'CNAME')
+        :param value str: Value of record
+        :param overwrite bool: Whether to overwrite existing records or add a new one
+
+        :returns: The batch itself for chaining
+        :rtype: StratoDnsApiBatch
+
+        """
+        self._operations.append({
+            'action': self.ACTION_ADD,
+            'full_domain': full_domain,
+            'record_type': record_type,
+            'value': value,
+            'overwrite': overwrite,
+        })
+        return self
+
+    def remove(self, full_domain: str, record_type: str, value: typing.Optional[str] = None) -> 'StratoDnsApiBatch':
+        """Remove a txt/cname record.
+
+        :param full_domain str: FQDN of the record, e.g. 'subdomain.domain.tld'
+        :param record_type str: Type of record ('TXT' or 'CNAME')
+        :param value str: Value of the record to remove, if None removes all records with matching prefix
+
+        :returns: The batch itself for chaining
+        :rtype: StratoDnsApiBatch
+
+        """
+        self._operations.append({
+            'action': self.ACTION_REMOVE,
+            'full_domain': full_domain,
+            'record_type': record_type,
+            'value': value,
+        })
+        return self
+
+    def set(self, full_domain: str, record_type: str, values: typing.Sequence[str]) -> 'StratoDnsApiBatch':
+        """Make the given values the only txt/cname records of a name and type.
+
+        Records with other values are removed, missing values are added, records that
+        already have one of the values are kept as they are.
+
+        :param full_domain str: FQDN of the records, e.g. 'subdomain.domain.tld'
+        :param record_type str: Type of records ('TXT' or 'CNAME')
+        :param values list: Values of the records
+
+        :returns: The batch itself for chaining
+        :rtype: StratoDnsApiBatch
+
+        """
+        self._operations.append({
+            'action': self.ACTION_SET,
+            'full_domain': full_domain,
+            'record_type': record_type,
+            'values': list(values),
+        })
+        return self
@@ -0,0 +1,134 @@
+"""Issue certificates for many domains through acme.sh with one shared Strato session."""
+import os
+import shutil
+import typing
+import logging
+import tempfile
+import threading
+import subprocess
+import concurrent.futures
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_agent import StratoDnsApiAgent
+
+if typing.TYPE_CHECKING:
+    from strato_dns_api.strato_dns_api_router import StratoDnsApiRouter
+
+
+class StratoDnsApiBulkIssuer:
+    """Class to run acme.sh for many domains in parallel.
+
+    An agent serving the given StratoDnsApi (or StratoDnsApiRouter) is started on a
+    temporary socket for the duration of the run, and the acme.sh hook of every worker
+    talks to it. So all workers share one logged in session and package index per
+    account, and changes of the same root domain are serialized (and coalesced) by the
+    agent, since every push replaces the whole record set of the domain.
+    """
+
+    DEFAULT_WORKERS = 4
+    # exit code of acme.sh if the certificate is not due for renewal yet
+    ACME_SH_SKIPPED = 2
+    AGENT_START_TIMEOUT = 120
+
+    def __init__(
+            self,
+            api: typing.Union[StratoDnsApi, 'StratoDnsApiRouter'],
+            acme_sh: str = 'acme.sh',
+            acme_sh_args: typing.Sequence[str] = (),
+            workers: int = DEFAULT_WORKERS,
+            env: typing.Optional[dict[str, str]] = None,
+            log_level=logging.INFO,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+        self._log_level = log_level
+
+        self._api = api
+        self._acme_sh = acme_sh
+        self._acme_sh_args = list(acme_sh_args)
+        self._workers = workers
+        # additional environment of the acme.sh processes, e.g. STRATO_API_CONFIG_FILE for the hook
+        self._env = env or {}
+
+    def issue(self, domains: typing.Sequence[str], wildcard: bool = True) -> dict[str, bool]:
+        """Issue a certificate for every domain.
+
+        :param list domains: Domains to issue certificates for, one certificate per domain
+        :param bool wildcard: Include the wildcard domain '*.<domain>' in each certificate
+
+        :returns: Success per domain, a certificate not due for renewal counts as success
+        :rtype: dict[str, bool]
+
+        """
+        return self._run(domains, lambda domain: ['--issue', '-d', domain]
+            + (['-d', f'*.{domain}'] if wildcard else []) + ['--dns', 'dns_strato'])
+
+    def renew(self, domains: typing.Sequence[str], options: typing.Optional[dict[str, typing.Sequence[str]]] = None) -> dict[str, bool]:
+        """Renew the existing certificate of every domain.
+
+        :param list domains: Main domains of the certificates to renew
+        :param dict options: Additional acme.sh options per domain, e.g. '--ecc' or '--force'
+
+        :returns: Success per domain, a certificate not due for renewal counts as success
+        :rtype: dict[str, bool]
+
+        """
+        options = options or {}
+        return self._run(domains, lambda domain: ['--renew', '-d', domain, *options.get(domain, ())])
+
+#######################################################################################################################
+# private methods
+    def _run(self, domains: typing.Sequence[str], command: typing.Callable[[str], list[str]]) -> dict[str, bool]:
+        if not domains:
+            return {}
+
+        if shutil.which('socat') is None:
+            self._logger.warning('socat is not installed, the acme.sh hook cannot use the shared session.')
+
+        with tempfile.TemporaryDirectory(prefix='strato-dns-api-') as run_dir:
+            agent = StratoDnsApiAgent(self._api, os.path.join(run_dir, 'agent.sock'), log_level=self._log_level)
+            agent_thread = threading.Thread(target=agent.serve, name='agent', daemon=True)
+            agent_thread.start()
+
+            try:
+                if not agent.wait_until_serving(self.AGENT_START_TIMEOUT):
+                    self._logger.error('Cannot start agent for the shared session.')
+                    return {domain: False for domain in domains}
+
+                env = dict(os.environ, **self._env, STRATO_API_SOCKET=agent.socket_path)
+                workers = max(1, min(self._workers, len(domains)))
+                self._logger.info(f'Running acme.sh for {len(domains)} domain(s) with {workers} worker(s)...')
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(lambda domain: self._run_acme_sh(domain, command(domain), env), domains))
+            finally:
+                agent.stop()
+                agent_thread.join()
+
+        results = dict(zip(domains, results))
+        failed = [domain for domain, success in results.items() if not success]
+        self._logger.info(f'{len(results) - len(failed)} of {len(results)} domain(s) succeeded.')
+        if failed:
+            self._logger.error(f'Failed domains: {", ".join(failed)}')
+        return results
+
+    def _run_acme_sh(self, domain: str, arguments: list[str], env: dict[str, str]) -> bool:
+        command = [self._acme_sh, *arguments, *self._acme_sh_args]
+        self._logger.info(f'{domain}: running {" ".join(command)}')
+
+        try:
+            result = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        except OSError as e:
+            self._logger.error(f'{domain}: cannot run acme.sh: {e}')
+            return False
+
+        if result.returncode == 0:
+            self._logger.info(f'{domain}: done.')
+            self._logger.debug(f'{domain}: acme.sh output:\n{result.stdout}')
+            return True
+        if result.returncode == self.ACME_SH_SKIPPED:
+            self._logger.info(f'{domain}: skipped, not due for renewal.')
+            return True
+
+        self._logger.error(f'{domain}: acme.sh failed with exit code {result.returncode}:\n{result.stdout}')
+        return False
@@ -0,0 +1,148 @@
+"""Local state cache for the Strato DNS API."""
+import os
+import json
+import time
+import typing
+import hashlib
+import logging
+import tempfile
+
+
+class StratoDnsApiCache:
+    """Class to persist Strato DNS API state between invocations.
+
+    Entries are stored as JSON files in a directory only accessible by the current user,
+    since they contain session cookies that grant access to the Strato customer account.
+    """
+
+    DEFAULT_SESSION_MAX_AGE = 900
+    DEFAULT_PACKAGE_INDEX_TTL = 86400
+    DEFAULT_RECORDS_MAX_AGE = 0
+
+    @staticmethod
+    def from_dict(
+            data: dict,
+        ) -> 'StratoDnsApiCache':
+        """Initialize Strato DNS API cache from dictionary.
+
+        :param dict data: Dictionary with cache settings
+
+        :returns: StratoDnsApiCache instance
+        :rtype: StratoDnsApiCache
+
+        """
+        return StratoDnsApiCache(
+            directory=data['dir'],
+            session_max_age=int(data.get('session_max_age', StratoDnsApiCache.DEFAULT_SESSION_MAX_AGE)),
+            package_index_ttl=int(data.get('package_index_ttl', StratoDnsApiCache.DEFAULT_PACKAGE_INDEX_TTL)),
+            records_max_age=float(data.get('records_max_age', StratoDnsApiCache.DEFAULT_RECORDS_MAX_AGE)),
+        )
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        """Build a file system safe cache key from arbitrary parts.
+
+        :param str parts: Parts identifying the cache entry, e.g. location and username
+
+        :returns: Short hex digest of the parts
+        :rtype: str
+
+        """
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+    @property
+    def session_max_age(self) -> int:
+        return self._session_max_age
+    @property
+    def package_index_ttl(self) -> int:
+        return self._package_index_ttl
+    @property
+    def records_max_age(self) -> float:
+        return self._records_max_age
+
+    def __init__(
+            self,
+            directory: str,
+            session_max_age: int = DEFAULT_SESSION_MAX_AGE,
+            package_index_ttl: int = DEFAULT_PACKAGE_INDEX_TTL,
+            records_max_age: float = DEFAULT_RECORDS_MAX_AGE,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._directory = os.path.abspath(os.path.expanduser(directory))
+        self._session_max_age = session_max_age
+        self._package_index_ttl = package_index_ttl
+        # age up to which record sets of domains are read from the cache instead of Strato, 0 to always read them from Strato
+        self._records_max_age = records_max_age
+
+    def load(self, name: str, max_age: typing.Optional[float] = None) -> typing.Optional[typing.Any]:
+        """Load a cache entry.
+
+        :param str name: Name of the cache entry
+        :param float max_age: Maximum age of the entry in seconds, None for no limit
+
+        :returns: Stored data or None if the entry is missing, expired or unreadable
+        :rtype: typing.Any
+
+        """
+        try:
+            with open(self._path(name), 'r') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self._logger.warning(f'Ignoring unreadable cache entry {name}: {e}')
+            return None
+
+        if max_age is not None and time.time() - entry.get('stored_at', 0) > max_age:
+            self._logger.debug(f'Cache entry {name} expired.')
+            return None
+
+        return entry.get('data')
+
+    def store(self, name: str, data: typing.Any) -> bool:
+        """Store a cache entry atomically, readable only by the current user.
+
+        :param str name: Name of the cache entry
+        :param typing.Any data: JSON serializable data
+
+        :returns: True if the entry was written
+        :rtype: bool
+
+        """
+        try:
+            os.makedirs(self._directory, mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory, prefix=f'.{name}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'stored_at': time.time(), 'data': data}, f)
+                os.replace(tmp_path, self._path(name))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            self._logger.warning(f'Could not write cache entry {name}: {e}')
+            return False
+
+        return True
+
+    def delete(self, name: str):
+        """Delete a cache entry if it exists.
+
+        :param str name: Name of the cache entry
+
+        """
+        try:
+            os.unlink(self._path(name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self._logger.warning(f'Could not delete cache entry {name}: {e}')
+
+#######################################################################################################################
+# private methods
+    def _path(self, name: str) -> str:
+        return os.path.join(self._directory, f'{name}.json')
@@ -0,0 +1,375 @@
+"""Deployment of issued certificates to consumers, e.g. a reverse proxy."""
+import os
+import json
+import base64
+import shutil
+import socket
+import typing
+import hashlib
+import logging
+import datetime
+import tempfile
+
+from strato_dns_api.strato_dns_api_lock import StratoDnsApiLock
+from strato_dns_api.strato_dns_api_transport import StratoDnsApiTransport
+
+
+class StratoDnsApiDeployer:
+    """Class to publish certificate bundles to a deploy directory and notify its subscribers.
+
+    The bundle of a domain is read from <deploy_dir>/<domain>/ with the file names of
+    acme.sh. That is a symlink to a directory in <deploy_dir>/.bundles/<domain>/: a new
+    bundle is written to a new directory there and the symlink is replaced with one rename,
+    so a reader sees either the complete old or the complete new bundle, never a mix. The
+    directory of the previous bundle is kept for readers still opening its files.
+
+    The manifest of the deploy directory keeps the SHA-256 digest of every file and the
+    fingerprint of every certificate. A bundle whose content did not change is not written
+    again, and only domains whose content changed are announced, so a renewal run that
+    changed nothing does not make the consumers reload.
+
+    The changed domains of one deploy() are announced with one event, a JSON object:
+    the marker file <deploy_dir>/.deployed is replaced with it (one IN_MOVED_TO for inotify
+    watchers), it is sent as one line to every Unix socket and POSTed to every webhook.
+    If a notification fails, the domains are announced again with the next deploy().
+    """
+
+    MANIFEST_FILE = 'manifest.json'
+    MARKER_FILE = '.deployed'
+    LOCK_DIR = '.locks'
+    BUNDLES_DIR = '.bundles'
+    # bundle directories of a domain kept, the current and the previous one
+    KEEP_BUNDLES = 2
+    LOCK_NAME = 'deploy'
+    NOTIFY_TIMEOUT = 10.0
+    ECC_SUFFIX = '_ecc'
+
+    @staticmethod
+    def from_dict(
+            data: dict,
+            transport: typing.Optional[StratoDnsApiTransport] = None,
+            log_level=logging.INFO,
+        ) -> 'StratoDnsApiDeployer':
+        """Initialize Strato DNS API deployer from dictionary, i.e. the "deploy" section of the config file.
+
+        :param dict data: Dictionary with "dir" and optionally "markers", "sockets" and "webhooks"
+        :param StratoDnsApiTransport transport: Transport settings of the webhook requests
+        :param int log_level: Logging level
+
+        :returns: StratoDnsApiDeployer instance
+        :rtype: StratoDnsApiDeployer
+
+        """
+        if not data.get('dir'):
+            raise ValueError('The deploy section needs a "dir"')
+
+        return StratoDnsApiDeployer(
+            deploy_dir=data['dir'],
+            markers=bool(data.get('markers', True)),
+            sockets=list(data.get('sockets', [])),
+            webhooks=list(data.get('webhooks', [])),
+            transport=transport,
+            log_level=log_level,
+        )
+
+    @staticmethod
+    def bundle_files(domain: str) -> tuple[str, ...]:
+        """Names of the files of a bundle in the layout of acme.sh.
+
+        :param str domain: Main domain of the certificate
+
+        :returns: Key, certificate, intermediates and full chain file names
+        :rtype: tuple[str, ...]
+
+        """
+        return (f'{domain}.key', f'{domain}.cer', 'ca.cer', 'fullchain.cer')
+
+    @staticmethod
+    def read_bundle(certs_dir: str, domain: str) -> dict[str, bytes]:
+        """Read the bundle of a domain from a cert home of acme.sh (or the issue command).
+
+        The ECC certificate directory (<domain>_ecc) is preferred, like acme.sh does.
+
+        :param str certs_dir: Cert home
+        :param str domain: Main domain of the certificate
+
+        :returns: Content by file name
+        :rtype: dict[str, bytes]
+
+        """
+        directory = os.path.join(certs_dir, f'{domain}{StratoDnsApiDeployer.ECC_SUFFIX}')
+        if not os.path.isdir(directory):
+            directory = os.path.join(certs_dir, domain)
+
+        bundle = {}
+        for name in StratoDnsApiDeployer.bundle_files(domain):
+            with open(os.path.join(directory, name), 'rb') as f:
+                bundle[name] = f.read()
+        return bundle
+
+    @staticmethod
+    def write_atomic(path: str, content: bytes, mode: int = 0o644):
+        """Replace a file by writing a temporary file in the same directory and renaming it.
+
+        :param str path: Path of the file
+        :param bytes content: Content to write
+        :param int mode: Permissions of the file
+
+        """
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f'.{os.path.basename(path)}.')
+        try:
+            os.fchmod(fd, mode)
+            with open(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    @staticmethod
+    def write_bundle(directory: str, domain: str, bundle: dict[str, bytes]):
+        """Write all files of a bundle to a new directory and switch the symlink <directory>/<domain> to it.
+
+        The bundle is written to <directory>/.bundles/<domain>/, where the current and the
+        previous bundle are kept. The key is readable by the owner only.
+
+        :param str directory: Deploy directory or cert home
+        :param str domain: Main domain of the certificate
+        :param dict bundle: Content by file name, see bundle_files()
+
+        """
+        bundles_dir = os.path.join(directory, StratoDnsApiDeployer.BUNDLES_DIR, domain)
+        os.makedirs(bundles_dir, exist_ok=True)
+        bundle_dir = tempfile.mkdtemp(dir=bundles_dir, prefix=datetime.datetime.now().strftime('%Y%m%d%H%M%S.'))
+        try:
+            os.chmod(bundle_dir, 0o755)
+            key_file = StratoDnsApiDeployer.bundle_files(domain)[0]
+            for name, content in bundle.items():
+                StratoDnsApiDeployer._write_new(os.path.join(bundle_dir, name), content, 0o600 if name == key_file else 0o644)
+
+            link = os.path.join(directory, domain)
+            if os.path.isdir(link) and not os.path.islink(link):
+                # written in place by an earlier version, the only time the domain is missing for a moment
+                os.rename(link, tempfile.mkdtemp(dir=bundles_dir, prefix='previous.'))
+            temp_link = os.path.join(directory, f'.{domain}.{os.getpid()}.link')
+            os.symlink(os.path.relpath(bundle_dir, directory), temp_link)
+            os.replace(temp_link, link)
+        except BaseException:
+            shutil.rmtree(bundle_dir, ignore_errors=True)
+            raise
+
+        StratoDnsApiDeployer._remove_old_bundles(bundles_dir)
+
+    @property
+    def deploy_dir(self) -> str:
+        return self._deploy_dir
+
+    def __init__(
+            self,
+            deploy_dir: str,
+            markers: bool = True,
+            sockets: typing.Sequence[str] = (),
+            webhooks: typing.Sequence[str] = (),
+            transport: typing.Optional[StratoDnsApiTransport] = None,
+            log_level=logging.INFO,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+
+        self._deploy_dir = os.path.abspath(os.path.expanduser(deploy_dir))
+        self._markers = markers
+        # Unix stream sockets of subscribers, e.g. a reload helper next to the proxy
+        self._sockets = list(sockets)
+        self._webhooks = list(webhooks)
+        self._transport = transport or StratoDnsApiTransport()
+        # the manifest is a read-modify-write, also of concurrent acme.sh renew hooks
+        self._lock = StratoDnsApiLock(os.path.join(self._deploy_dir, self.LOCK_DIR))
+
+    def deploy(self, bundles: dict[str, dict[str, bytes]]) -> typing.Optional[list[str]]:
+        """Write the changed bundles and announce them with one event.
+
+        :param dict bundles: Content by file name per domain, see bundle_files()
+
+        :returns: Domains whose bundle changed, None if a bundle or the manifest could not be written
+        :rtype: list[str]
+
+        """
+        with self._lock.hold(self.LOCK_NAME) as locked:
+            if not locked:
+                return None
+
+            try:
+                os.makedirs(self._deploy_dir, exist_ok=True)
+                manifest = self._read_manifest()
+            except (OSError, ValueError) as e:
+                self._logger.error(f'Cannot read manifest of {self._deploy_dir}: {e}')
+                return None
+
+            success = True
+            changed = []
+            for domain, bundle in bundles.items():
+                digests = {name: hashlib.sha256(content).hexdigest() for name, content in bundle.items()}
+                entry = manifest['domains'].get(domain)
+                if entry is not None and entry['files'] == digests and self._bundle_exists(domain, bundle):
+                    self._logger.debug(f'{domain}: unchanged, not deployed.')
+                    continue
+
+                try:
+                    self.write_bundle(self._deploy_dir, domain, bundle)
+                except OSError as e:
+                    self._logger.error(f'{domain}: cannot deploy to {self._deploy_dir}: {e}')
+                    success = False
+                    continue
+
+                manifest['domains'][domain] = {
+                    'files': digests,
+                    'fingerprint': self._fingerprint(bundle.get(self.bundle_files(domain)[1], b'')),
+                    'deployed': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                }
+                changed.append(domain)
+                self._logger.info(f'{domain}: deployed.')
+
+            # announced domains are removed from pending only after all notifications succeeded
+            pending = [d for d in dict.fromkeys(manifest['pending'] + changed) if d in manifest['domains']]
+            manifest['pending'] = pending
+            try:
+                if changed:
+                    self._write_manifest(manifest)
+                if pending and self._notify(pending, manifest):
+                    manifest['pending'] = []
+                    self._write_manifest(manifest)
+            except OSError as e:
+                self._logger.error(f'Cannot write manifest of {self._deploy_dir}: {e}')
+                return None
+
+        if not changed:
+            self._logger.info('No certificates changed.')
+        return changed if success else None
+
+    def deploy_from(self, certs_dir: str, domains: typing.Sequence[str]) -> typing.Optional[list[str]]:
+        """Deploy the bundles of domains from a cert home of acme.sh (or the issue command).
+
+        :param str certs_dir: Cert home
+        :param list domains: Main domains of the certificates
+
+        :returns: Domains whose bundle changed, None if a bundle could not be read or written
+        :rtype: list[str]
+
+        """
+        bundles = {}
+        for domain in domains:
+            try:
+                bundles[domain] = self.read_bundle(certs_dir, domain)
+            except OSError as e:
+                self._logger.error(f'{domain}: cannot read certificate from {certs_dir}: {e}')
+
+        changed = self.deploy(bundles)
+        return changed if len(bundles) == len(domains) else None
+
+#######################################################################################################################
+# private methods
+    def _read_manifest(self) -> dict:
+        path = os.path.join(self._deploy_dir, self.MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {'domains': {}, 'pending': []}
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        return {'domains': manifest.get('domains', {}), 'pending': manifest.get('pending', [])}
+
+    def _write_manifest(self, manifest: dict):
+        self.write_atomic(os.path.join(self._deploy_dir, self.MANIFEST_FILE),
+            json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    def _bundle_exists(self, domain: str, bundle: dict[str, bytes]) -> bool:
+        return all(os.path.isfile(os.path.join(self._deploy_dir, domain, name)) for name in bundle)
+
+    @staticmethod
+    def _remove_old_bundles(bundles_dir: str):
+        with os.scandir(bundles_dir) as entries:
+            directories = sorted((entry.stat().st_mtime, entry.path) for entry in entries if entry.is_dir(follow_symlinks=False))
+        for _, path in directories[:-StratoDnsApiDeployer.KEEP_BUNDLES]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _write_new(path: str, content: bytes, mode: int):
+        """Write a file that does not exist yet, e.g. in a directory nobody reads yet."""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+        with open(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _fingerprint(pem: bytes) -> typing.Optional[str]:
+        """SHA-256 fingerprint of the first certificate of a PEM file."""
+        text = pem.decode('ascii', errors='replace')
+        begin = text.find('-----BEGIN CERTIFICATE-----')
+        end = text.find('-----END CERTIFICATE-----', begin)
+        if begin < 0 or end < 0:
+            return None
+        try:
+            der = base64.b64decode(''.join(text[begin + len('-----BEGIN CERTIFICATE-----'):end].split()))
+        except ValueError:
+            return None
+        return hashlib.sha256(der).hexdigest()
+
+    def _notify(self, domains: list[str], manifest: dict) -> bool:
+        """Announce changed domains to all subscribers.
+
+        :returns: True if every subscriber was notified
+        :rtype: bool
+
+        """
+        event = json.dumps({
+            'event': 'deployed',
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'certificates': [{
+                'domain': domain,
+                'dir': os.path.join(self._deploy_dir, domain),
+                'fingerprint': manifest['domains'][domain]['fingerprint'],
+            } for domain in domains],
+        }).encode('utf-8')
+
+        self._logger.info(f'Announcing {len(domains)} changed certificate(s): {", ".join(domains)}')
+        success = True
+        if self._markers:
+            try:
+                self.write_atomic(os.path.join(self._deploy_dir, self.MARKER_FILE), event + b'\n')
+            except OSError as e:
+                self._logger.error(f'Cannot write marker {self.MARKER_FILE}: {e}')
+                success = False
+        for path in self._sockets:
+            success = self._notify_socket(path, event) and success
+        for url in self._webhooks:
+            success = self._notify_webhook(url, event) and success
+        return success
+
+    def _notify_socket(self, path: str, event: bytes) -> bool:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(self.NOTIFY_TIMEOUT)
+                s.connect(path)
+                s.sendall(event + b'\n')
+        except OSError as e:
+            self._logger.error(f'Cannot notify socket {path}: {e}')
+            return False
+        return True
+
+    def _notify_webhook(self, url: str, event: bytes) -> bool:
+        import requests
+
+        try:
+            with self._transport.create_session({'User-Agent': 'strato-dns-api'}) as session:
+                response = session.post(url, data=event, headers={'Content-Type': 'application/json'},
+                    timeout=self._transport.timeout)
+        except requests.RequestException as e:
+            self._logger.error(f'Cannot notify webhook {url}: {e}')
+            return False
+        if response.status_code >= 400:
+            self._logger.error(f'Webhook {url} failed with status {response.status_code}')
+            return False
+        return True
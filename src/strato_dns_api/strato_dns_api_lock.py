@@ -0,0 +1,204 @@
+"""Advisory file locks for record changes of the Strato DNS API."""
+import os
+import time
+import fcntl
+import typing
+import logging
+import tempfile
+import contextlib
+
+
+class StratoDnsApiLock:
+    """Class to serialize the record changes of a domain between processes.
+
+    Strato only accepts the complete record set of a domain, so every change is a
+    read-modify-write of that set. Holding the lock of the domain from reading to
+    pushing prevents two processes from overwriting each other's changes. The locks
+    are advisory (flock), they only protect against processes using this class with
+    the same directory.
+    """
+
+    DEFAULT_TIMEOUT = 300
+    POLL_INTERVAL = 0.1
+
+    @staticmethod
+    def default_directory() -> str:
+        """Directory for lock files if none is configured, shared by all processes of the current user.
+
+        :returns: Path of the directory
+        :rtype: str
+
+        """
+        return os.path.join(tempfile.gettempdir(), f'strato-dns-api-{os.getuid()}', 'locks')
+
+    @staticmethod
+    def from_dict(
+            data: dict,
+        ) -> 'StratoDnsApiLock':
+        """Initialize Strato DNS API lock from dictionary.
+
+        :param dict data: Dictionary with locking settings
+
+        :returns: StratoDnsApiLock instance
+        :rtype: StratoDnsApiLock
+
+        """
+        return StratoDnsApiLock(
+            directory=data.get('dir') or StratoDnsApiLock.default_directory(),
+            timeout=float(data.get('timeout', StratoDnsApiLock.DEFAULT_TIMEOUT)),
+            verify=bool(data.get('verify', False)),
+        )
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+    @property
+    def verify(self) -> bool:
+        return self._verify
+
+    def __init__(
+            self,
+            directory: typing.Optional[str] = None,
+            timeout: float = DEFAULT_TIMEOUT,
+            verify: bool = False,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._directory = os.path.abspath(os.path.expanduser(directory or self.default_directory()))
+        self._timeout = timeout
+        # re-read the record set before pushing and re-apply the changes if it was modified meanwhile
+        self._verify = verify
+
+    @contextlib.contextmanager
+    def hold(self, name: str) -> typing.Iterator[bool]:
+        """Hold the lock of a name, e.g. a root domain, while in the context.
+
+        The lock is also exclusive between threads of the same process, since every
+        call opens the lock file on its own.
+
+        :param str name: Name of the lock
+
+        :returns: Context yielding True if the lock is held, False if it could not be acquired within the timeout
+        :rtype: typing.Iterator[bool]
+
+        """
+        fd = self.acquire(name)
+        try:
+            yield fd is not None
+        finally:
+            if fd is not None:
+                self.release(fd)
+
+    def acquire(self, name: str) -> typing.Optional[int]:
+        """Acquire the lock of a name, blocking up to the timeout.
+
+        :param str name: Name of the lock
+
+        :returns: File descriptor to pass to release(), None if the lock could not be acquired
+        :rtype: int
+
+        """
+        fd = self._open(name)
+        if fd is None:
+            return None
+
+        attempts = self._attempts(fd, name)
+        while True:
+            try:
+                time.sleep(next(attempts))
+            except StopIteration as e:
+                locked = e.value
+                break
+
+        if not locked:
+            os.close(fd)
+            return None
+        return fd
+
+    async def acquire_async(self, name: str) -> typing.Optional[int]:
+        """Acquire the lock of a name like acquire(), waiting without blocking the event loop.
+
+        If the waiting task is cancelled, the lock file is closed without acquiring the lock.
+
+        :param str name: Name of the lock
+
+        :returns: File descriptor to pass to release(), None if the lock could not be acquired
+        :rtype: int
+
+        """
+        import asyncio
+
+        fd = self._open(name)
+        if fd is None:
+            return None
+
+        attempts = self._attempts(fd, name)
+        try:
+            while True:
+                try:
+                    delay = next(attempts)
+                except StopIteration as e:
+                    locked = e.value
+                    break
+                await asyncio.sleep(delay)
+        except BaseException:
+            os.close(fd)
+            raise
+
+        if not locked:
+            os.close(fd)
+            return None
+        return fd
+
+    def release(self, fd: int):
+        """Release a lock acquired with acquire().
+
+        :param int fd: File descriptor returned by acquire()
+
+        """
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+#######################################################################################################################
+# private methods
+    def _open(self, name: str) -> typing.Optional[int]:
+        try:
+            os.makedirs(self._directory, mode=0o700, exist_ok=True)
+            return os.open(self._path(name), os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            self._logger.error(f'Cannot open lock file of {name}: {e}')
+            return None
+
+    def _attempts(self, fd: int, name: str) -> typing.Generator[float, None, bool]:
+        """Try to lock without blocking until the timeout, yielding the delay before every next attempt.
+
+        :returns: True if locked, False on timeout
+        :rtype: bool
+
+        """
+        deadline = time.monotonic() + self._timeout
+        waiting = False
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if waiting:
+                    self._logger.debug(f'Acquired lock of {name}.')
+                return True
+            except BlockingIOError:
+                pass
+
+            if not waiting:
+                self._logger.info(f'Waiting for other process changing records of {name}...')
+                waiting = True
+            if time.monotonic() >= deadline:
+                self._logger.error(f'Timed out after {self._timeout}s waiting for lock of {name}.')
+                return False
+            yield self.POLL_INTERVAL
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._directory, f'{name}.lock')
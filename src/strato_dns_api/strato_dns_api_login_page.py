@@ -0,0 +1,95 @@
+"""Parser for the login and 2FA pages of the Strato customer service."""
+import re
+import typing
+import urllib.parse
+
+
+class StratoDnsApiLoginPage:
+    """Class to interpret the pages of the Strato login, independent of the HTTP client."""
+
+    TWO_FACTOR_HEADING_REGEX = re.compile('Zwei\\-Faktor\\-Authentifizierung')
+
+    @staticmethod
+    def is_login_page(page: str) -> bool:
+        """Check if Strato answered with the login form instead of the requested page.
+
+        :param str page: HTML of the page
+
+        :returns: True if the page is the login form
+        :rtype: bool
+
+        """
+        return 'name="passwd"' in page and 'name="identifier"' in page
+
+    @staticmethod
+    def session_id(url: str) -> typing.Optional[str]:
+        """Extract the session ID from the URL Strato redirected to after the login.
+
+        :param str url: URL of the last response of the login
+
+        :returns: Session ID or None if the login failed
+        :rtype: str
+
+        """
+        query_parameters = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        return query_parameters['sessionID'][0] if 'sessionID' in query_parameters else None
+
+    @staticmethod
+    def is_two_factor_page(page: str) -> bool:
+        """Check if Strato asks for the second factor.
+
+        :param str page: HTML of the page answering the login form
+
+        :returns: True if the page is the 2FA form
+        :rtype: bool
+
+        """
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(page, 'html.parser')
+        return soup.find('h1', string=StratoDnsApiLoginPage.TWO_FACTOR_HEADING_REGEX) is not None
+
+    @staticmethod
+    def two_factor_params(page: str, username: str, totp_secret: str, totp_devicename: str) -> dict:
+        """Build the form parameters answering the 2FA page with the current TOTP.
+
+        :param str page: HTML of the 2FA page
+        :param str username: Username of the login
+        :param str totp_secret: 2FA TOTP secret hash
+        :param str totp_devicename: 2FA TOTP device name
+
+        :returns: Form parameters to post
+        :rtype: dict
+
+        :raises ValueError: If the page does not contain the expected form fields
+
+        """
+        from bs4 import BeautifulSoup
+        import pyotp
+
+        soup = BeautifulSoup(page, 'html.parser')
+        param = {'identifier': username}
+
+        # Set parameter 'totp_token'
+        totp_input = soup.find('input', attrs={'type': 'hidden', 'name': 'totp_token'})
+        if totp_input is None:
+            raise ValueError('Parsing error on 2FA site by totp_token.')
+        param['totp_token'] = totp_input['value']
+
+        # Set parameter 'action_customer_login.x'
+        param['action_customer_login.x'] = 1
+
+        # Set parameter pw_id, the option of the device with the configured name
+        for device in re.finditer(
+            rf'<option value="(?P<value>(S\.{re.escape(username)}\.\w*))"'
+            r'( selected(="selected")?)?\s*>(?P<name>(.+?))</option>',
+            page):
+            if totp_devicename.strip() == device.group('name').strip():
+                param['pw_id'] = device.group('value')
+                break
+        if param.get('pw_id') is None:
+            raise ValueError('Parsing error on 2FA site by device name.')
+
+        # Set parameter 'totp'
+        param['totp'] = pyotp.TOTP(totp_secret).now()
+        return param
@@ -0,0 +1,209 @@
+"""Metrics of the round trips to Strato."""
+import os
+import json
+import time
+import typing
+import logging
+import tempfile
+import threading
+import contextlib
+
+# Third party imports are deferred to the code paths using them to keep the CLI startup fast
+if typing.TYPE_CHECKING:
+    import httpx
+    import requests
+
+
+class StratoDnsApiMetrics:
+    """Class to collect latency, status, size and retries of Strato round trips per logical operation.
+
+    Operations are e.g. "login", "login_2fa", "package_index", "fetch_records",
+    "parse_records" or "push_records". An operation may consist of several HTTP
+    requests (including retries of the transport), its latency covers all of them.
+    """
+
+    FORMAT_JSON = 'json'
+    FORMAT_PROMETHEUS = 'prometheus'
+    FORMATS = (FORMAT_JSON, FORMAT_PROMETHEUS)
+    PROMETHEUS_PREFIX = 'strato_dns_api'
+
+    @staticmethod
+    def format_of(path: str) -> str:
+        """Guess the output format from a file name, '.prom' files are written for Prometheus.
+
+        :param str path: Path of the metrics file
+
+        :returns: Output format
+        :rtype: str
+
+        """
+        return StratoDnsApiMetrics.FORMAT_PROMETHEUS if path.endswith('.prom') else StratoDnsApiMetrics.FORMAT_JSON
+
+    def __init__(self):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._operations: dict[str, dict] = {}
+
+    @contextlib.contextmanager
+    def measure(self, operation: str) -> typing.Iterator['_Sample']:
+        """Measure an operation while in the context.
+
+        HTTP responses of the operation are added to the yielded sample. The operation
+        counts as failed if the context raises or the sample is marked as failed.
+
+        :param str operation: Name of the operation
+
+        :returns: Context yielding the sample of this execution
+        :rtype: typing.Iterator[_Sample]
+
+        """
+        sample = _Sample()
+        start = time.perf_counter()
+        try:
+            yield sample
+        except BaseException:
+            sample.success = False
+            raise
+        finally:
+            self.record(operation, time.perf_counter() - start, sample)
+
+    def record(self, operation: str, seconds: float, sample: '_Sample'):
+        """Add one execution of an operation.
+
+        :param str operation: Name of the operation
+        :param float seconds: Duration of the execution
+        :param _Sample sample: Responses and result of the execution
+
+        """
+        with self._lock:
+            metrics = self._operations.setdefault(operation, {
+                'count': 0,
+                'failures': 0,
+                'seconds_total': 0.0,
+                'seconds_max': 0.0,
+                'requests': 0,
+                'retries': 0,
+                'response_bytes': 0,
+                'status': {},
+            })
+            metrics['count'] += 1
+            metrics['failures'] += 0 if sample.success else 1
+            metrics['seconds_total'] += seconds
+            metrics['seconds_max'] = max(metrics['seconds_max'], seconds)
+            metrics['requests'] += sample.requests
+            metrics['retries'] += sample.retries
+            metrics['response_bytes'] += sample.response_bytes
+            for status in sample.status:
+                metrics['status'][str(status)] = metrics['status'].get(str(status), 0) + 1
+
+        self._logger.debug(f'{operation}: {seconds * 1000:.1f} ms, {sample.requests} request(s), '
+            f'{sample.retries} retries, {sample.response_bytes} bytes, status {sample.status}')
+
+    def to_dict(self) -> dict:
+        """Metrics of all operations.
+
+        :returns: Metrics per operation
+        :rtype: dict
+
+        """
+        with self._lock:
+            return {
+                'generated_at': time.time(),
+                'operations': {name: dict(metrics, status=dict(metrics['status']))
+                    for name, metrics in self._operations.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """Metrics of all operations in the Prometheus text exposition format.
+
+        :returns: Metrics as text
+        :rtype: str
+
+        """
+        operations = self.to_dict()['operations']
+        prefix = self.PROMETHEUS_PREFIX
+        lines = []
+
+        def metric(name: str, metric_type: str, description: str, key: str):
+            lines.append(f'# HELP {prefix}_{name} {description}')
+            lines.append(f'# TYPE {prefix}_{name} {metric_type}')
+            for operation, metrics in operations.items():
+                lines.append(f'{prefix}_{name}{{operation="{operation}"}} {metrics[key]}')
+
+        metric('operation_duration_seconds_sum', 'counter', 'Total duration of the operation.', 'seconds_total')
+        metric('operation_duration_seconds_count', 'counter', 'Number of executions of the operation.', 'count')
+        metric('operation_duration_seconds_max', 'gauge', 'Longest execution of the operation.', 'seconds_max')
+        metric('operation_failures_total', 'counter', 'Failed executions of the operation.', 'failures')
+        metric('http_requests_total', 'counter', 'HTTP requests of the operation.', 'requests')
+        metric('http_retries_total', 'counter', 'HTTP requests of the operation retried by the transport.', 'retries')
+        metric('http_response_bytes_total', 'counter', 'Size of the HTTP responses of the operation.', 'response_bytes')
+
+        lines.append(f'# HELP {prefix}_http_responses_total HTTP responses of the operation by status code.')
+        lines.append(f'# TYPE {prefix}_http_responses_total counter')
+        for operation, metrics in operations.items():
+            for status, count in metrics['status'].items():
+                lines.append(f'{prefix}_http_responses_total{{operation="{operation}",status="{status}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, output_format: typing.Optional[str] = None) -> bool:
+        """Write the metrics to a file atomically, as required e.g. by the textfile collector of the node exporter.
+
+        :param str path: Path of the metrics file
+        :param str output_format: 'json' or 'prometheus', guessed from the file name if None
+
+        :returns: True if the file was written
+        :rtype: bool
+
+        """
+        output_format = output_format or self.format_of(path)
+        if output_format == self.FORMAT_PROMETHEUS:
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), indent=2) + '\n'
+
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(content)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            self._logger.error(f'Could not write metrics file {path}: {e}')
+            return False
+
+        return True
+
+
+class _Sample:
+    """HTTP responses and result of one execution of an operation."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.response_bytes = 0
+        self.status: list[int] = []
+        self.success = True
+
+    def add_response(self, response: typing.Union['requests.Response', 'httpx.Response']):
+        """Add an HTTP response, including the redirects leading to it.
+
+        :returns: The response, to allow wrapping the request
+        :rtype: requests.Response or httpx.Response
+
+        """
+        for r in [*response.history, response]:
+            self.requests += 1
+            self.status.append(r.status_code)
+            self.response_bytes += len(r.content)
+            # retries of the urllib3 transport of requests
+            retries = getattr(getattr(r, 'raw', None), 'retries', None)
+            self.retries += len(retries.history) if retries is not None else 0
+        if response.status_code >= 400:
+            self.success = False
+        return response
@@ -0,0 +1,102 @@
+"""Index of Strato packages and the domains they contain."""
+import re
+import typing
+import urllib.parse
+
+
+class StratoDnsApiPackageIndex:
+    """Class to map root domains to the Strato package ID (cID) they belong to."""
+
+    DOMAIN_REGEX = re.compile(r'(?:[\w-]+\.)+[\w-]+')
+
+    @staticmethod
+    def from_html(
+            html: str,
+        ) -> 'StratoDnsApiPackageIndex':
+        """Build the index from the customer entry page in a single pass over the package list.
+
+        :param str html: HTML of the 'kds_CustomerEntryPage'
+
+        :returns: StratoDnsApiPackageIndex instance
+        :rtype: StratoDnsApiPackageIndex
+
+        """
+        from bs4 import BeautifulSoup
+
+        packages = {}
+        soup = BeautifulSoup(html, 'html.parser')
+        for row in soup.select('#package_list > tbody > tr'):
+            information = row.select_one('.package-information')
+            anchor = row.select_one('.jss_with_own_packagename a')
+            if information is None or anchor is None or not anchor.has_attr('href'):
+                continue
+
+            link_target = urllib.parse.urlparse(anchor['href'])
+            package_id = urllib.parse.parse_qs(link_target.query).get('cID', [None])[0]
+            if package_id is None:
+                continue
+
+            packages[package_id] = information.get_text(' ', strip=True)
+
+        return StratoDnsApiPackageIndex(packages)
+
+    @staticmethod
+    def from_dict(
+            data: dict,
+        ) -> 'StratoDnsApiPackageIndex':
+        """Initialize package index from dictionary, e.g. loaded from cache.
+
+        :param dict data: Dictionary as returned by to_dict()
+
+        :returns: StratoDnsApiPackageIndex instance
+        :rtype: StratoDnsApiPackageIndex
+
+        """
+        return StratoDnsApiPackageIndex(data['packages'])
+
+    @property
+    def packages(self) -> dict[str, str]:
+        return self._packages
+
+    def __init__(
+            self,
+            packages: dict[str, str],
+        ):
+        # package information text by package ID (cID)
+        self._packages = packages
+
+        self._domains = {}
+        for package_id, information in packages.items():
+            for domain in self.DOMAIN_REGEX.findall(information):
+                self._domains.setdefault(domain.lower(), package_id)
+
+    def lookup(self, root_domain: str, exact: bool = False) -> typing.Optional[str]:
+        """Find the package ID for a root domain.
+
+        Without an exact match, a package listing a subdomain of the domain (whole labels,
+        e.g. 'www.example.com' for 'example.com', but not 'myexample.com') is returned.
+
+        :param str root_domain: Root domain to search for
+        :param bool exact: Only return a package listing the domain itself
+
+        :returns: Package ID (cID) or None if the domain is not part of any package
+        :rtype: str
+
+        """
+        root_domain = root_domain.lower()
+        if root_domain in self._domains:
+            return self._domains[root_domain]
+        if exact:
+            return None
+
+        return next((package_id for domain, package_id in self._domains.items()
+            if domain.endswith(f'.{root_domain}')), None)
+
+    def to_dict(self) -> dict:
+        """Serialize the index, e.g. for caching.
+
+        :returns: Dictionary to restore the index with from_dict()
+        :rtype: dict
+
+        """
+        return {'packages': self._packages}
@@ -0,0 +1,215 @@
+"""Check propagation of TXT records to the authoritative nameservers of a zone."""
+import time
+import socket
+import typing
+import logging
+import threading
+import concurrent.futures
+
+import dns.flags
+import dns.query
+import dns.message
+import dns.resolver
+import dns.rdatatype
+import dns.exception
+
+
+class StratoDnsApiPropagation:
+    """Class to wait until all authoritative nameservers of a zone serve a TXT value.
+
+    A nameserver host counts as propagated once any of its addresses serves the value,
+    so an address that is not reachable from here (e.g. IPv6 in a container without
+    IPv6) does not make the wait fail. IPv6 addresses are not even resolved if this
+    host has no route to the IPv6 internet.
+    """
+
+    DEFAULT_TIMEOUT = 300
+    DEFAULT_QUERY_TIMEOUT = 3.0
+    INITIAL_BACKOFF = 1.0
+    MAX_BACKOFF = 15.0
+    # a root nameserver, only used to look up the route for IPv6
+    IPV6_PROBE_ADDRESS = '2001:503:ba3e::2:30'
+
+    @staticmethod
+    def parse_nameserver(nameserver: str) -> tuple[str, int]:
+        """Parse a nameserver given as 'host', 'host:port' or '[ipv6]:port'.
+
+        :param str nameserver: Nameserver address
+
+        :returns: Address and port
+        :rtype: tuple[str, int]
+
+        """
+        if nameserver.startswith('['):
+            address, _, port = nameserver[1:].partition(']')
+            return address, int(port.lstrip(':') or 53)
+        if nameserver.count(':') == 1:
+            address, port = nameserver.split(':')
+            return address, int(port)
+        return nameserver, 53
+
+    def __init__(
+            self,
+            nameservers: typing.Optional[list[tuple[str, int]]] = None,
+            query_timeout: float = DEFAULT_QUERY_TIMEOUT,
+            log_level=logging.INFO,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+
+        # nameservers (address, port) to check instead of the authoritative ones, e.g. a local test server
+        self._nameservers = nameservers
+        self._query_timeout = query_timeout
+
+    def authoritative_nameservers(self, zone: str) -> dict[str, list[tuple[str, int]]]:
+        """Find the addresses of the authoritative nameservers of a zone.
+
+        :param str zone: Zone, i.e. the root domain
+
+        :returns: Address and port of every nameserver by its host name, configured nameservers are a host each
+        :rtype: dict[str, list[tuple[str, int]]]
+
+        """
+        if self._nameservers:
+            return {f'{address}:{port}': [(address, port)] for address, port in self._nameservers}
+
+        resolver = dns.resolver.Resolver()
+        rdtypes = ('A', 'AAAA') if self._ipv6_routable() else ('A',)
+        nameservers = {}
+        for ns in resolver.resolve(zone, 'NS'):
+            addresses = []
+            for rdtype in rdtypes:
+                try:
+                    addresses.extend((address.to_text(), 53) for address in resolver.resolve(ns.target, rdtype))
+                except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+                    continue
+                except (dns.resolver.NoNameservers, dns.resolver.LifetimeTimeout) as e:
+                    # the other addresses and nameservers are still checked
+                    self._logger.warning(f'Cannot resolve {rdtype} of nameserver {ns.target}: {e}')
+                    continue
+            if addresses:
+                nameservers[ns.target.to_text()] = addresses
+
+        self._logger.debug(f'Authoritative nameservers of {zone}: {nameservers}')
+        return nameservers
+
+    def wait(self, full_domain: str, value: str, zone: str, timeout: float = DEFAULT_TIMEOUT) -> bool:
+        """Wait until all authoritative nameservers serve a TXT value.
+
+        All addresses of all nameservers are queried concurrently, each one is polled
+        with exponential backoff until it (or another address of the same nameserver)
+        serves the value or the timeout expires.
+
+        :param str full_domain: FQDN of the TXT record
+        :param str value: Expected TXT value
+        :param str zone: Zone of the record, i.e. the root domain
+        :param float timeout: Maximum time to wait in seconds
+
+        :returns: True if all nameservers serve the value
+        :rtype: bool
+
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            nameservers = self.authoritative_nameservers(zone)
+        except dns.exception.DNSException as e:
+            self._logger.error(f'Cannot find nameservers of {zone}: {e}')
+            return False
+
+        if not nameservers:
+            self._logger.error(f'No nameservers found for {zone}')
+            return False
+
+        self._logger.info(f'Waiting for TXT record {full_domain} on {len(nameservers)} nameserver(s)...')
+        # set once a host is done, i.e. served the value, or for all hosts once one of them failed
+        done = {host: threading.Event() for host in nameservers}
+        served = set()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=sum(len(a) for a in nameservers.values()))
+        try:
+            futures = {executor.submit(self._wait_for_nameserver, address, full_domain, value, deadline, done[host]): host
+                for host, addresses in nameservers.items() for address in addresses}
+            for future in concurrent.futures.as_completed(futures):
+                host = futures[future]
+                if future.result():
+                    served.add(host)
+                    done[host].set()
+                elif host not in served and all(f.done() for f, h in futures.items() if h == host):
+                    # no need to keep polling the others
+                    for event in done.values():
+                        event.set()
+                if all(event.is_set() for event in done.values()):
+                    break
+        finally:
+            # a query to an address not answering ends after the query timeout, no need to wait for it
+            executor.shutdown(wait=False)
+
+        success = len(served) == len(nameservers)
+        if success:
+            self._logger.info(f'TXT record {full_domain} is served by all nameservers.')
+        else:
+            self._logger.error(f'TXT record {full_domain} was not served by all nameservers within {timeout}s: '
+                f'{", ".join(host for host in nameservers if host not in served)}')
+        return success
+
+    def has_value(self, nameserver: tuple[str, int], full_domain: str, value: str) -> bool:
+        """Query a nameserver once for a TXT value.
+
+        :param tuple nameserver: Address and port of the nameserver
+        :param str full_domain: FQDN of the TXT record
+        :param str value: Expected TXT value
+
+        :returns: True if the nameserver serves the value
+        :rtype: bool
+
+        """
+        address, port = nameserver
+        query = dns.message.make_query(full_domain, dns.rdatatype.TXT)
+        response = dns.query.udp(query, address, port=port, timeout=self._query_timeout)
+        if response.flags & dns.flags.TC:
+            response = dns.query.tcp(query, address, port=port, timeout=self._query_timeout)
+
+        for rrset in response.answer:
+            if rrset.rdtype != dns.rdatatype.TXT:
+                continue
+            for rdata in rrset:
+                if b''.join(rdata.strings).decode('utf-8', errors='replace') == value:
+                    return True
+        return False
+
+#######################################################################################################################
+# private methods
+    def _wait_for_nameserver(
+            self,
+            nameserver: tuple[str, int],
+            full_domain: str,
+            value: str,
+            deadline: float,
+            done: threading.Event,
+        ) -> bool:
+        backoff = self.INITIAL_BACKOFF
+        while not done.is_set():
+            try:
+                if self.has_value(nameserver, full_domain, value):
+                    self._logger.debug(f'{nameserver[0]} serves {full_domain}')
+                    return True
+            except (dns.exception.DNSException, OSError) as e:
+                self._logger.debug(f'Query of {full_domain} at {nameserver[0]} failed: {e}')
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            done.wait(min(backoff, remaining))
+            backoff = min(backoff * 2, self.MAX_BACKOFF)
+
+        return False
+
+    @staticmethod
+    def _ipv6_routable() -> bool:
+        """Check if this host has a route to the IPv6 internet, connecting a UDP socket sends no packets."""
+        try:
+            with socket.socket(socket.AF_INET6, socket.SOCK_DGRAM) as s:
+                s.connect((StratoDnsApiPropagation.IPV6_PROBE_ADDRESS, 53))
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,72 @@
+"""Parser for the TXT/CNAME record form of the Strato customer service."""
+import re
+import html
+import typing
+
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecord
+
+
+def _attribute(name: str, value: str | None = None) -> str:
+    # steps over the other attributes one at a time, separated by any whitespace
+    return r'(?:\s+[^\s>]+)*?\s+' + name + (r'\s*=\s*"' + value + '"' if value else r'\b')
+
+
+def _tag(name: str, *attributes: str) -> str:
+    return '<' + name + r'\b' + ''.join(attributes) + r'[^>]*>'
+
+
+class StratoDnsApiRecordParser:
+    """Class to extract the records of the 'action_show_txt_records' page in a single pass.
+
+    Each record of the form consists of a 'type' select, a 'prefix' input and a 'value'
+    textarea, in this order. A record is matched from its type select to the end of its
+    value; in between the page is skipped a whole tag at a time, never across another
+    select, so shifted markup never pairs a value with the prefix of another record.
+    Tags and attributes are matched case-insensitively, attributes may be in any order and
+    separated by any whitespace, records may span several lines and HTML entities in
+    attributes and values are decoded.
+    """
+
+    # skips text and tags up to the next part of the record, but not into the next record
+    SKIP = r'[^<]*(?:<(?!select\b)[^<]*)*?'
+    RECORD_REGEX = re.compile(
+        _tag('select', _attribute('name', 'type')) + SKIP
+        + '(?:' + _tag('option', _attribute('value', '(?P<type>[^"]*)'), _attribute('selected'))
+        + '|' + _tag('option', _attribute('selected'), _attribute('value', '(?P<type_after>[^"]*)')) + ')'
+        + SKIP + r'</select\s*>' + SKIP
+        + '(?:' + _tag('input', _attribute('value', '(?P<prefix>[^"]*)'), _attribute('name', 'prefix'))
+        + '|' + _tag('input', _attribute('name', 'prefix'), _attribute('value', '(?P<prefix_after>[^"]*)')) + ')'
+        + SKIP + _tag('textarea', _attribute('name', 'value'))
+        + r'(?P<value>[^<]*(?:<(?!/textarea\b)[^<]*)*)</textarea\s*>', re.IGNORECASE)
+
+    @staticmethod
+    def parse(page: str) -> list[StratoDnsApiRecord]:
+        """Parse all records of a page.
+
+        :param str page: HTML of the record page
+
+        :returns: Records in document order
+        :rtype: list[StratoDnsApiRecord]
+
+        """
+        return list(StratoDnsApiRecordParser.iter_records(page))
+
+    @staticmethod
+    def iter_records(page: str) -> typing.Iterator[StratoDnsApiRecord]:
+        """Iterate over the records of a page in document order.
+
+        :param str page: HTML of the record page
+
+        :returns: Iterator of records
+        :rtype: typing.Iterator[StratoDnsApiRecord]
+
+        """
+        unescape = StratoDnsApiRecordParser._unescape
+        for record_type, type_after, prefix, prefix_after, value in StratoDnsApiRecordParser.RECORD_REGEX.findall(page):
+            yield StratoDnsApiRecord(unescape(prefix or prefix_after), unescape(record_type or type_after), unescape(value))
+
+#######################################################################################################################
+# private methods
+    @staticmethod
+    def _unescape(text: str) -> str:
+        return html.unescape(text) if '&' in text else text
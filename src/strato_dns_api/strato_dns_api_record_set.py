@@ -0,0 +1,160 @@
+"""TXT/CNAME records of a domain."""
+import typing
+
+
+class StratoDnsApiRecord(typing.NamedTuple):
+    """A TXT/CNAME record as shown in the record form, immutable and without instance dict."""
+
+    prefix: str
+    type: str
+    value: str
+
+
+class StratoDnsApiRecordSet:
+    """Class to hold the TXT/CNAME records of a root domain.
+
+    Records keep the order they were added in, which is the order they are pushed to
+    Strato in. Each record (prefix, type and value) is contained once. The records are
+    indexed by prefix and type, so looking up, adding and removing a record does not
+    scan the whole set. Two record sets are equal if they contain the same records,
+    regardless of the order.
+    """
+
+    @staticmethod
+    def from_list(
+            data: typing.Iterable[dict],
+        ) -> 'StratoDnsApiRecordSet':
+        """Initialize record set from a list of dictionaries, e.g. as stored in the cache.
+
+        :param list data: Records with prefix, type and value
+
+        :returns: StratoDnsApiRecordSet instance
+        :rtype: StratoDnsApiRecordSet
+
+        """
+        return StratoDnsApiRecordSet(StratoDnsApiRecord(r['prefix'], r['type'], r['value']) for r in data)
+
+    def __init__(self, records: typing.Iterable[StratoDnsApiRecord] = ()):
+
+        # records in order, a dict is used as ordered set
+        self._records: dict[StratoDnsApiRecord, None] = {}
+        # records in order by prefix and type
+        self._index: dict[tuple[str, str], dict[StratoDnsApiRecord, None]] = {}
+        for record in records:
+            self.add(record)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> typing.Iterator[StratoDnsApiRecord]:
+        return iter(self._records)
+
+    def __contains__(self, record: StratoDnsApiRecord) -> bool:
+        return record in self._records
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, StratoDnsApiRecordSet):
+            return NotImplemented
+        return self._records.keys() == other._records.keys()
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({list(self._records)})'
+
+    def get(self, prefix: str, record_type: str) -> list[StratoDnsApiRecord]:
+        """Records of a prefix and type.
+
+        :param str prefix: Prefix of the records, '' for the root domain
+        :param str record_type: Type of the records ('TXT' or 'CNAME')
+
+        :returns: Records in order
+        :rtype: list[StratoDnsApiRecord]
+
+        """
+        return list(self._index.get((prefix, record_type), ()))
+
+    def names(self) -> list[tuple[str, str]]:
+        """Prefix and type of all records, each once.
+
+        :returns: Prefix and type pairs in order of their first record
+        :rtype: list[tuple[str, str]]
+
+        """
+        return list(self._index)
+
+    def add(self, record: StratoDnsApiRecord) -> bool:
+        """Add a record at the end.
+
+        :param StratoDnsApiRecord record: Record to add
+
+        :returns: True if it was added, False if the record set already contains it
+        :rtype: bool
+
+        """
+        if record in self._records:
+            return False
+        self._records[record] = None
+        self._index.setdefault((record.prefix, record.type), {})[record] = None
+        return True
+
+    def remove(self, record: StratoDnsApiRecord) -> bool:
+        """Remove a record with exactly this prefix, type and value.
+
+        :param StratoDnsApiRecord record: Record to remove
+
+        :returns: True if it was removed, False if the record set does not contain it
+        :rtype: bool
+
+        """
+        if record not in self._records:
+            return False
+        del self._records[record]
+        name = (record.prefix, record.type)
+        del self._index[name][record]
+        if not self._index[name]:
+            del self._index[name]
+        return True
+
+    def remove_all(self, prefix: str, record_type: str) -> list[StratoDnsApiRecord]:
+        """Remove all records of a prefix and type.
+
+        :param str prefix: Prefix of the records, '' for the root domain
+        :param str record_type: Type of the records ('TXT' or 'CNAME')
+
+        :returns: Removed records
+        :rtype: list[StratoDnsApiRecord]
+
+        """
+        removed = list(self._index.pop((prefix, record_type), ()))
+        for record in removed:
+            del self._records[record]
+        return removed
+
+    def copy(self) -> 'StratoDnsApiRecordSet':
+        """Independent record set with the same records in the same order."""
+        return StratoDnsApiRecordSet(self._records)
+
+    def diff(self, other: 'StratoDnsApiRecordSet') -> tuple[list[StratoDnsApiRecord], list[StratoDnsApiRecord]]:
+        """Changes turning this record set into another one.
+
+        :param StratoDnsApiRecordSet other: Record set to compare with
+
+        :returns: Records only in the other record set (to add) and records only in this one (to remove)
+        :rtype: tuple[list[StratoDnsApiRecord], list[StratoDnsApiRecord]]
+
+        """
+        return (
+            [r for r in other._records if r not in self._records],
+            [r for r in self._records if r not in other._records],
+        )
+
+    def to_list(self) -> list[dict]:
+        """Records as dictionaries with prefix, type and value, e.g. to store them as JSON."""
+        return [record._asdict() for record in self._records]
+
+    def to_form_fields(self) -> dict[str, list[str]]:
+        """Parallel 'prefix', 'type' and 'value' lists as posted by the record form."""
+        return {
+            'prefix': [r.prefix for r in self._records],
+            'type': [r.type for r in self._records],
+            'value': [r.value for r in self._records],
+        }
@@ -0,0 +1,262 @@
+"""Scheduling of certificate renewals with acme.sh."""
+import os
+import re
+import time
+import typing
+import hashlib
+import logging
+import threading
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_bulk_issue import StratoDnsApiBulkIssuer
+from strato_dns_api.strato_dns_api_router import StratoDnsApiRouter
+from strato_dns_api.strato_dns_api_deploy import StratoDnsApiDeployer
+
+
+class StratoDnsApiCertificate(typing.NamedTuple):
+    """A certificate managed by acme.sh, as described by its .conf file."""
+
+    domain: str
+    root_domain: str
+    next_renew_time: int
+    ecc: bool
+    conf_file: str
+
+
+class StratoDnsApiRenewalScheduler:
+    """Class to renew the certificates of an acme.sh cert home spread over time and in groups.
+
+    The expiry index is built from the .conf files acme.sh keeps next to every
+    certificate, which contain the time the certificate is due for renewal. Each
+    certificate is scheduled a random but stable delay (jitter) after that time, so
+    certificates issued together do not all renew in the same minute.
+
+    Once a certificate is due, all certificates of the same group (the Strato account
+    owning the domain, or the root domain if the account is not known without logging
+    in) that are scheduled within the group window from now are renewed with it. They are
+    renewed in one run of StratoDnsApiBulkIssuer, i.e. with one shared session, and the
+    challenges of the same root domain are published concurrently, so the agent pushes
+    them together. With a deployer, the renewed certificates of a run are deployed and
+    announced together afterwards.
+    """
+
+    DEFAULT_JITTER = 43200
+    DEFAULT_GROUP_WINDOW = 86400
+    DEFAULT_CHECK_INTERVAL = 3600
+
+    CONF_LINE_REGEX = re.compile(r"^(\w+)='(.*)'$")
+    ECC_SUFFIX = '_ecc'
+
+    @staticmethod
+    def read_certificate(conf_file: str, api: typing.Union[StratoDnsApi, StratoDnsApiRouter]) -> typing.Optional[StratoDnsApiCertificate]:
+        """Read a certificate .conf file of acme.sh.
+
+        :param str conf_file: Path of the .conf file
+        :param api: API to resolve the root domain of the certificate with
+
+        :returns: Certificate or None if the file does not describe an issued certificate
+        :rtype: StratoDnsApiCertificate
+
+        """
+        settings = {}
+        with open(conf_file, 'r') as f:
+            for line in f:
+                match = StratoDnsApiRenewalScheduler.CONF_LINE_REGEX.match(line.strip())
+                if match:
+                    settings[match.group(1)] = match.group(2)
+
+        if not settings.get('Le_Domain') or not settings.get('Le_NextRenewTime', '').isdigit():
+            return None
+
+        domain = settings['Le_Domain']
+        return StratoDnsApiCertificate(
+            domain=domain,
+            root_domain=api.new_batch(domain.removeprefix('*.')).root_domain,
+            next_renew_time=int(settings['Le_NextRenewTime']),
+            ecc=os.path.basename(os.path.dirname(conf_file)).endswith(StratoDnsApiRenewalScheduler.ECC_SUFFIX),
+            conf_file=conf_file,
+        )
+
+    @property
+    def certificates(self) -> list[StratoDnsApiCertificate]:
+        return list(self._index.values())
+
+    def __init__(
+            self,
+            api: typing.Union[StratoDnsApi, StratoDnsApiRouter],
+            certs_dir: str,
+            issuer: StratoDnsApiBulkIssuer,
+            jitter: float = DEFAULT_JITTER,
+            group_window: float = DEFAULT_GROUP_WINDOW,
+            deployer: typing.Optional[StratoDnsApiDeployer] = None,
+            log_level=logging.INFO,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+
+        self._api = api
+        self._certs_dir = certs_dir
+        self._issuer = issuer
+        # maximum delay after the renewal time of acme.sh
+        self._jitter = jitter
+        # certificates of a group scheduled up to this much later than now are renewed together
+        self._group_window = group_window
+        self._deployer = deployer
+
+        # certificates by domain
+        self._index: dict[str, StratoDnsApiCertificate] = {}
+        self._stopped = threading.Event()
+
+    def scan(self) -> list[StratoDnsApiCertificate]:
+        """Rebuild the expiry index from the cert home of acme.sh.
+
+        :returns: Certificates found, ordered by scheduled renewal
+        :rtype: list[StratoDnsApiCertificate]
+
+        """
+        index = {}
+        try:
+            entries = sorted(os.scandir(self._certs_dir), key=lambda entry: entry.name)
+        except OSError as e:
+            self._logger.error(f'Cannot read certificates from {self._certs_dir}: {e}')
+            entries = []
+
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            domain = entry.name[:-len(self.ECC_SUFFIX)] if entry.name.endswith(self.ECC_SUFFIX) else entry.name
+            conf_file = os.path.join(entry.path, f'{domain}.conf')
+            if not os.path.isfile(conf_file):
+                continue
+
+            try:
+                certificate = self.read_certificate(conf_file, self._api)
+            except (OSError, UnicodeDecodeError) as e:
+                self._logger.warning(f'Ignoring unreadable {conf_file}: {e}')
+                continue
+            if certificate is None:
+                self._logger.debug(f'Ignoring {conf_file}, no renewal time.')
+                continue
+            if certificate.domain in index and not certificate.ecc:
+                # ECC and RSA certificate of the same domain, acme.sh renews the ECC one by default
+                continue
+            index[certificate.domain] = certificate
+
+        self._index = index
+        self._logger.debug(f'{len(index)} certificate(s) in {self._certs_dir}')
+        return sorted(index.values(), key=self.scheduled_time)
+
+    def scheduled_time(self, certificate: StratoDnsApiCertificate) -> float:
+        """Time to renew a certificate at, its renewal time plus a jitter that is stable for this renewal.
+
+        :param StratoDnsApiCertificate certificate: Certificate to schedule
+
+        :returns: Unix time
+        :rtype: float
+
+        """
+        digest = hashlib.sha256(f'{certificate.domain}\0{certificate.next_renew_time}'.encode('utf-8')).digest()
+        return certificate.next_renew_time + self._jitter * int.from_bytes(digest[:8], 'big') / 2**64
+
+    def due(self, now: typing.Optional[float] = None) -> list[list[StratoDnsApiCertificate]]:
+        """Groups of certificates to renew now.
+
+        :param float now: Current Unix time
+
+        :returns: Certificates to renew, grouped by account or root domain
+        :rtype: list[list[StratoDnsApiCertificate]]
+
+        """
+        now = time.time() if now is None else now
+        groups = []
+        for certificates in self._groups().values():
+            if self.scheduled_time(certificates[0]) <= now:
+                groups.append([c for c in certificates if self.scheduled_time(c) <= now + self._group_window])
+        return groups
+
+    def next_run(self, after: typing.Optional[float] = None) -> typing.Optional[float]:
+        """Time the next certificate of the index is scheduled at.
+
+        :param float after: Only consider certificates scheduled later than this Unix time
+
+        :returns: Unix time or None if there are no such certificates
+        :rtype: float
+
+        """
+        return min((self.scheduled_time(c) for c in self._index.values()
+            if after is None or self.scheduled_time(c) > after), default=None)
+
+    def run(self, now: typing.Optional[float] = None) -> dict[str, bool]:
+        """Scan the cert home and renew all certificates that are due.
+
+        Certificates renewed before acme.sh considers them due, because another
+        certificate of their group is due, are renewed with --force.
+
+        :param float now: Current Unix time
+
+        :returns: Success per domain of the renewed certificates
+        :rtype: dict[str, bool]
+
+        """
+        now = time.time() if now is None else now
+        self.scan()
+        groups = self.due(now)
+        if not groups:
+            self._logger.info('No certificates due for renewal.')
+            return {}
+
+        # certificates of a group next to each other, so they run at the same time
+        certificates = [c for group in groups for c in group]
+        self._logger.info(f'Renewing {len(certificates)} certificate(s) in {len(groups)} group(s)...')
+        options = {c.domain: (['--ecc'] if c.ecc else []) + (['--force'] if c.next_renew_time > now else [])
+            for c in certificates}
+        results = self._issuer.renew([c.domain for c in certificates], options)
+
+        if self._deployer is not None:
+            self._deployer.deploy_from(self._certs_dir, [domain for domain, success in results.items() if success])
+        return results
+
+    def run_forever(self, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        """Renew certificates whenever they are due, until stop() is called.
+
+        The cert home is scanned again at least every check_interval seconds, to pick up
+        new certificates and renewals done by other means.
+
+        :param float check_interval: Maximum time between two scans in seconds
+
+        """
+        while not self._stopped.is_set():
+            now = time.time()
+            try:
+                self.run(now)
+            except Exception:
+                # keep renewing, the certificates of this run are retried after check_interval
+                self._logger.exception('Renewal run failed.')
+
+            # certificates that failed to renew are retried after check_interval
+            next_run = self.next_run(after=now)
+            delay = check_interval if next_run is None else min(max(next_run - time.time(), 1), check_interval)
+            self._logger.info(f'Next check in {delay:.0f}s.')
+            self._stopped.wait(delay)
+
+    def stop(self):
+        """Stop run_forever()."""
+        self._stopped.set()
+
+#######################################################################################################################
+# private methods
+    def _groups(self) -> dict[str, list[StratoDnsApiCertificate]]:
+        """Certificates of the index by group, each ordered by scheduled renewal."""
+        groups = {}
+        for certificate in sorted(self._index.values(), key=self.scheduled_time):
+            groups.setdefault(self._group_key(certificate), []).append(certificate)
+        return groups
+
+    def _group_key(self, certificate: StratoDnsApiCertificate) -> str:
+        if isinstance(self._api, StratoDnsApiRouter):
+            account = self._api.known_account(certificate.root_domain)
+            if account is not None:
+                return f'account:{account}'
+            return f'domain:{certificate.root_domain}'
+        return 'account'
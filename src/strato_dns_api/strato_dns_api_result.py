@@ -0,0 +1,28 @@
+"""Result of DNS record changes."""
+
+
+class StratoDnsApiResult:
+    """Class to report the outcome of applying record changes.
+
+    It is truthy if the changes were applied successfully, so it can be used like the
+    bool returned before. changed tells whether the record set was modified, it is
+    False if the desired records already existed and no push was necessary.
+    """
+
+    @property
+    def success(self) -> bool:
+        return self._success
+    @property
+    def changed(self) -> bool:
+        return self._changed
+
+    def __init__(self, success: bool, changed: bool = False):
+
+        self._success = success
+        self._changed = changed
+
+    def __bool__(self) -> bool:
+        return self._success
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(success={self._success}, changed={self._changed})'
@@ -0,0 +1,297 @@
+"""Routing of DNS record changes to several Strato accounts."""
+import sys
+import json
+import typing
+import logging
+import threading
+import contextlib
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_cache import StratoDnsApiCache
+from strato_dns_api.strato_dns_api_metrics import StratoDnsApiMetrics
+from strato_dns_api.strato_dns_api_batch import StratoDnsApiBatch
+from strato_dns_api.strato_dns_api_result import StratoDnsApiResult
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecordSet
+
+
+class StratoDnsApiRouter:
+    """Class to manage the domains of several Strato accounts in one process.
+
+    It offers the record operations of StratoDnsApi and forwards them to the account
+    owning the root domain. The StratoDnsApi of an account is created on first use and
+    logs in only when a request to Strato is needed, so accounts whose domains are not
+    touched cost nothing. Which account owns a domain is taken from the "domains" of the
+    account configuration or looked up in the package indexes of the accounts, and kept
+    in the cache (if configured) for the time of the package index.
+
+    A configuration without "accounts" is a single account, which gets all domains
+    without any lookup.
+    """
+
+    DEFAULT_ACCOUNT = 'default'
+    # settings of the config file shared by all accounts, unless set by the account itself
+    SHARED_SETTINGS = ('location', 'cache', 'locking', 'transport', 'api_url')
+
+    @staticmethod
+    def from_config_file(
+            config_file: str,
+            log_level: int = logging.INFO,
+        ) -> 'StratoDnsApiRouter':
+        """Initialize Strato DNS API router from JSON config file.
+
+        :param str config_file: Path to JSON config file
+        :param int log_level: Logging level
+
+        :returns: StratoDnsApiRouter instance
+        :rtype: StratoDnsApiRouter
+
+        """
+        logging.basicConfig(level=log_level)
+        logger = logging.getLogger('strato_dns_api')
+        logger.info(f'Loading configuration from {config_file}...')
+        try:
+            with open(config_file, 'r') as f:
+                router = StratoDnsApiRouter.from_dict(json.load(f), log_level=log_level)
+
+                logger.info(f'Configuration of {len(router.accounts)} account(s) loaded successfully.')
+                return router
+
+        except Exception as e:
+           logger.error(f'Error loading config file {config_file}: {e}')
+           sys.exit(1)
+
+    @staticmethod
+    def from_dict(
+            data: dict,
+            log_level: int = logging.INFO,
+        ) -> 'StratoDnsApiRouter':
+        """Initialize Strato DNS API router from dictionary, i.e. the content of the config file.
+
+        :param dict data: Configuration with "accounts" or "credentials" of a single account
+        :param int log_level: Logging level
+
+        :returns: StratoDnsApiRouter instance
+        :rtype: StratoDnsApiRouter
+
+        """
+        shared = {key: data[key] for key in StratoDnsApiRouter.SHARED_SETTINGS if data.get(key)}
+        accounts = {}
+        for account in data.get('accounts') or [{'name': StratoDnsApiRouter.DEFAULT_ACCOUNT, 'credentials': data['credentials']}]:
+            name = account.get('name') or account['credentials']['username']
+            if name in accounts:
+                raise ValueError(f'Duplicate account "{name}"')
+            accounts[name] = {**shared, **account}
+
+        return StratoDnsApiRouter(
+            accounts,
+            cache=StratoDnsApiCache.from_dict(data['cache']) if data.get('cache') else None,
+            log_level=log_level,
+        )
+
+    @property
+    def accounts(self) -> list[str]:
+        return list(self._accounts)
+    @property
+    def metrics(self) -> StratoDnsApiMetrics:
+        return self._metrics
+
+    def __init__(
+            self,
+            accounts: dict[str, dict],
+            cache: typing.Optional[StratoDnsApiCache] = None,
+            log_level=logging.INFO,
+            metrics: typing.Optional[StratoDnsApiMetrics] = None,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+        self._log_level = log_level
+
+        if not accounts:
+            raise ValueError('No accounts configured')
+        # configuration of each account as accepted by StratoDnsApi.from_config()
+        self._accounts = accounts
+        self._cache = cache
+        # one metrics instance for all accounts
+        self._metrics = metrics or StratoDnsApiMetrics()
+
+        self._apis: dict[str, StratoDnsApi] = {}
+        # account name by root domain
+        self._routes: typing.Optional[dict[str, str]] = None
+        self._lock = threading.RLock()
+
+    def api(self, account: str) -> StratoDnsApi:
+        """StratoDnsApi of an account, created on first use.
+
+        :param str account: Name of the account
+
+        :returns: API of the account
+        :rtype: StratoDnsApi
+
+        """
+        with self._lock:
+            if account not in self._apis:
+                config = {key: value for key, value in self._accounts[account].items() if key not in ('name', 'domains')}
+                self._apis[account] = StratoDnsApi.from_config(config, log_level=self._log_level, metrics=self._metrics)
+            return self._apis[account]
+
+    def route(self, full_domain: str) -> typing.Optional[StratoDnsApi]:
+        """Find the API of the account owning a domain.
+
+        :param str full_domain: Root domain or any FQDN below it
+
+        :returns: API of the owning account or None if no account contains the domain
+        :rtype: StratoDnsApi
+
+        """
+        if len(self._accounts) == 1:
+            return self.api(next(iter(self._accounts)))
+
+        root_domain = self.new_batch(full_domain).root_domain
+        with self._lock:
+            routes = self._load_routes()
+            account = routes.get(root_domain)
+            if account is None:
+                account = self._find_account(root_domain)
+                if account is None:
+                    self._logger.error(f'Domain {root_domain} not found in any of the accounts {self.accounts}')
+                    return None
+                routes[root_domain] = account
+                self._store_routes()
+
+            return self.api(account)
+
+    def known_account(self, full_domain: str) -> typing.Optional[str]:
+        """Account owning a domain if known without asking Strato, i.e. configured or found before.
+
+        :param str full_domain: Root domain or any FQDN below it
+
+        :returns: Name of the account or None if it is not known yet
+        :rtype: str
+
+        """
+        if len(self._accounts) == 1:
+            return next(iter(self._accounts))
+
+        root_domain = self.new_batch(full_domain).root_domain
+        with self._lock:
+            account = self._load_routes().get(root_domain)
+        if account is None:
+            account = next((name for name, config in self._accounts.items()
+                if root_domain in [domain.lower() for domain in config.get('domains', [])]), None)
+        return account
+
+    def login(self) -> bool:
+        """Login to all accounts.
+
+        :returns: True if all logins were successful
+        :rtype: bool
+
+        """
+        return all([self.api(account).login() for account in self._accounts])
+
+    def keep_alive(self) -> bool:
+        """Keep the sessions of all accounts used so far alive.
+
+        :returns: True if all of them are logged in afterwards
+        :rtype: bool
+
+        """
+        with self._lock:
+            apis = list(self._apis.values())
+        return all([api.keep_alive() for api in apis])
+
+    def get_txt_records(self, full_domain: str, package_id: typing.Optional[int] = None,
+            max_age: typing.Optional[float] = None) -> StratoDnsApiRecordSet:
+        """Requests all txt and cname records related to domain, see StratoDnsApi.get_txt_records()."""
+        api = self.route(full_domain)
+        return api.get_txt_records(full_domain, package_id, max_age) if api is not None else StratoDnsApiRecordSet()
+
+    def fetch_txt_records(self, full_domain: str, package_id: typing.Optional[int] = None,
+            max_age: typing.Optional[float] = None) -> typing.Optional[StratoDnsApiRecordSet]:
+        """Requests all txt and cname records related to domain, None on failure, see StratoDnsApi.fetch_txt_records()."""
+        api = self.route(full_domain)
+        return api.fetch_txt_records(full_domain, package_id, max_age) if api is not None else None
+
+    def add_txt_record(self, full_domain: str, record_type: str, value: str, overwrite: bool = False) -> StratoDnsApiResult:
+        """Add a txt/cname record, see StratoDnsApi.add_txt_record()."""
+        api = self.route(full_domain)
+        return api.add_txt_record(full_domain, record_type, value, overwrite) if api is not None else StratoDnsApiResult(False)
+
+    def remove_txt_record(self, full_domain: str, record_type: str, value: typing.Optional[str] = None) -> StratoDnsApiResult:
+        """Remove a txt/cname record, see StratoDnsApi.remove_txt_record()."""
+        api = self.route(full_domain)
+        return api.remove_txt_record(full_domain, record_type, value) if api is not None else StratoDnsApiResult(False)
+
+    def wait_for_propagation(
+            self,
+            full_domain: str,
+            value: str,
+            timeout: typing.Optional[float] = None,
+            nameservers: typing.Optional[list[tuple[str, int]]] = None,
+        ) -> bool:
+        """Wait until all authoritative nameservers of the domain serve a TXT value, see StratoDnsApi.wait_for_propagation()."""
+        # only queries DNS, any account will do
+        return self.api(next(iter(self._accounts))).wait_for_propagation(full_domain, value, timeout, nameservers)
+
+    def new_batch(self, full_domain: str) -> StratoDnsApiBatch:
+        """Create an empty batch for the root domain of a FQDN, to be applied with apply_batch().
+
+        :param str full_domain: Root domain or any FQDN below it
+
+        :returns: Empty batch
+        :rtype: StratoDnsApiBatch
+
+        """
+        # resolving the root domain does not need the account, so it must not trigger the routing
+        return self.api(next(iter(self._accounts))).new_batch(full_domain)
+
+    @contextlib.contextmanager
+    def batch(self, root_domain: str) -> typing.Iterator[StratoDnsApiBatch]:
+        """Collect several record changes of a domain and apply them with one read and one push, see StratoDnsApi.batch()."""
+        batch = self.new_batch(root_domain)
+        yield batch
+        self.apply_batch(batch)
+
+    def apply_batch(self, batch: StratoDnsApiBatch) -> StratoDnsApiResult:
+        """Apply all changes of a batch with the account owning its domain, see StratoDnsApi.apply_batch()."""
+        api = self.route(batch.root_domain)
+        if api is None:
+            batch.success = False
+            batch.changed = False
+            return StratoDnsApiResult(False)
+        return api.apply_batch(batch)
+
+#######################################################################################################################
+# private methods
+    def _find_account(self, root_domain: str) -> typing.Optional[str]:
+        """Find the account owning a domain, preferring lookups that do not need a login."""
+        for account, config in self._accounts.items():
+            if root_domain in [domain.lower() for domain in config.get('domains', [])]:
+                return account
+
+        # a package listing the domain itself in any account first, so an account listing only
+        # a subdomain of it does not win; package indexes in memory or in the cache before downloading them
+        for exact, download in ((True, False), (True, True), (False, False)):
+            for account in self._accounts:
+                if self.api(account).find_package_id(root_domain, download=download, exact=exact) is not None:
+                    self._logger.info(f'Domain {root_domain} belongs to account {account}')
+                    return account
+
+        return None
+
+    def _routes_cache_name(self) -> str:
+        return f'routes-{StratoDnsApiCache.key(*sorted(self._accounts))}'
+
+    def _load_routes(self) -> dict[str, str]:
+        if self._routes is None:
+            routes = None
+            if self._cache is not None:
+                routes = self._cache.load(self._routes_cache_name(), max_age=self._cache.package_index_ttl)
+            # drop routes to accounts that are no longer configured
+            self._routes = {domain: account for domain, account in (routes or {}).items() if account in self._accounts}
+        return self._routes
+
+    def _store_routes(self):
+        if self._cache is not None:
+            self._cache.store(self._routes_cache_name(), self._routes)
@@ -0,0 +1,174 @@
+"""Synchronize the TXT/CNAME records of many domains with a desired state."""
+import typing
+import logging
+import concurrent.futures
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_batch import StratoDnsApiBatch
+from strato_dns_api.strato_dns_api_result import StratoDnsApiResult
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecord, StratoDnsApiRecordSet
+
+if typing.TYPE_CHECKING:
+    from strato_dns_api.strato_dns_api_router import StratoDnsApiRouter
+
+
+class StratoDnsApiSync:
+    """Class to bring the records of several domains into a desired state with one push per domain.
+
+    The desired state lists the records of each root domain. For every listed prefix
+    and type, the listed values are the only records afterwards. Records of prefixes
+    and types that are not listed are kept, unless prune is set. ACME challenges
+    ('_acme-challenge' prefixes) are never pruned, they are managed by the acme.sh hook.
+
+    The current records of all domains are read concurrently to compute the changes.
+    The changes are applied as a batch per domain, i.e. to the records read again under
+    the lock of the domain, so changes made in between are not overwritten.
+    """
+
+    DEFAULT_WORKERS = 4
+    RECORD_TYPES = ('TXT', 'CNAME')
+    PROTECTED_PREFIX = '_acme-challenge'
+
+    @staticmethod
+    def desired_from_dict(
+            data: dict,
+        ) -> dict[str, list[dict]]:
+        """Validate and normalize a desired state, e.g. loaded from a JSON file.
+
+        The state maps root domains to lists of records like
+        {"prefix": "_dmarc", "type": "TXT", "value": "v=DMARC1; p=none"}, an empty or
+        missing prefix (or "@") stands for the root domain itself.
+
+        :param dict data: Records by root domain
+
+        :returns: Records with prefix, type and value by lower case root domain
+        :rtype: dict[str, list[dict]]
+
+        """
+        if not isinstance(data, dict):
+            raise ValueError('Desired state must be an object of root domains')
+
+        desired = {}
+        for root_domain, records in data.items():
+            if not isinstance(records, list):
+                raise ValueError(f'Records of {root_domain} must be a list')
+
+            desired[root_domain.lower()] = []
+            for record in records:
+                if not isinstance(record, dict):
+                    raise ValueError(f'Invalid record of {root_domain}, expected an object: {record}')
+                prefix = record.get('prefix') or ''
+                if (record.get('type') not in StratoDnsApiSync.RECORD_TYPES or not isinstance(record.get('value'), str)
+                        or not record['value'] or not isinstance(prefix, str)):
+                    raise ValueError(f'Invalid record of {root_domain}: {record}')
+                desired[root_domain.lower()].append({
+                    'prefix': '' if prefix == '@' else prefix,
+                    'type': record['type'],
+                    'value': record['value'],
+                })
+
+        return desired
+
+    def __init__(
+            self,
+            api: typing.Union[StratoDnsApi, 'StratoDnsApiRouter'],
+            workers: int = DEFAULT_WORKERS,
+            prune: bool = False,
+            log_level=logging.INFO,
+        ):
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(log_level)
+
+        self._api = api
+        self._workers = workers
+        # remove records of prefixes and types that are not in the desired state
+        self._prune = prune
+
+    def plan(self, desired: dict[str, list[dict]]) -> dict[str, typing.Optional[dict[str, list[dict]]]]:
+        """Compute the changes needed to reach the desired state.
+
+        :param dict desired: Records by root domain, see desired_from_dict()
+
+        :returns: Records to 'add' and to 'remove' by root domain, only for domains with changes,
+            None for domains whose records could not be read
+        :rtype: dict[str, typing.Optional[dict[str, list[dict]]]]
+
+        """
+        domains = list(desired)
+        for domain in domains:
+            if self._api.new_batch(domain).root_domain != domain:
+                raise ValueError(f'{domain} is not a root domain')
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._pool_size(domains)) as executor:
+            current = dict(zip(domains, executor.map(self._api.fetch_txt_records, domains)))
+
+        plan = {}
+        for root_domain in domains:
+            if current[root_domain] is None:
+                # planning against no records would add every desired record and remove nothing
+                self._logger.error(f'Cannot read the records of {root_domain}, skipping it.')
+                plan[root_domain] = None
+                continue
+            changes = self._diff(current[root_domain], desired[root_domain])
+            if changes['add'] or changes['remove']:
+                plan[root_domain] = changes
+
+        self._logger.info(f'{len([c for c in plan.values() if c])} of {len(domains)} domain(s) need changes.')
+        return plan
+
+    def apply(self, desired: dict[str, list[dict]], plan: dict[str, dict[str, list[dict]]]) -> dict[str, StratoDnsApiResult]:
+        """Apply the changes of a plan, with one batch per domain in parallel.
+
+        :param dict desired: Records by root domain the plan was computed for
+        :param dict plan: Changes by root domain as returned by plan()
+
+        :returns: Result by root domain, failed for the domains whose records could not be read
+        :rtype: dict[str, StratoDnsApiResult]
+
+        """
+        planned = {root_domain: changes for root_domain, changes in plan.items() if changes is not None}
+        batches = [self._batch(root_domain, desired[root_domain], changes) for root_domain, changes in planned.items()]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._pool_size(batches)) as executor:
+            results = dict(zip(planned, executor.map(self._api.apply_batch, batches)))
+        results.update({root_domain: StratoDnsApiResult(False) for root_domain, changes in plan.items() if changes is None})
+
+        failed = [root_domain for root_domain, result in results.items() if not result]
+        if failed:
+            self._logger.error(f'Failed to sync domains: {", ".join(failed)}')
+        return results
+
+#######################################################################################################################
+# private methods
+    def _diff(self, current: StratoDnsApiRecordSet, desired: list[dict]) -> dict[str, list[dict]]:
+        """Records to add and to remove to turn the current into the desired records of a domain."""
+        desired_records = StratoDnsApiRecordSet.from_list(desired)
+        desired_names = set(desired_records.names())
+
+        add, remove = current.diff(desired_records)
+        remove = [r for r in remove if (r.prefix, r.type) in desired_names or self._prunable(r)]
+
+        return {
+            'add': [r._asdict() for r in add],
+            'remove': [r._asdict() for r in remove],
+        }
+
+    def _batch(self, root_domain: str, desired: list[dict], changes: dict[str, list[dict]]) -> StratoDnsApiBatch:
+        """Batch making the records of every changed prefix and type exactly the desired ones."""
+        batch = self._api.new_batch(root_domain)
+        for prefix, record_type in dict.fromkeys((r['prefix'], r['type']) for r in changes['add'] + changes['remove']):
+            full_domain = f'{prefix}.{root_domain}' if prefix else root_domain
+            values = [r['value'] for r in desired if (r['prefix'], r['type']) == (prefix, record_type)]
+            if values:
+                batch.set(full_domain, record_type, values)
+            else:
+                # pruned
+                batch.remove(full_domain, record_type)
+
+        return batch
+
+    def _prunable(self, record: StratoDnsApiRecord) -> bool:
+        return self._prune and not record.prefix.startswith(self.PROTECTED_PREFIX)
+
+    def _pool_size(self, items: typing.Sized) -> int:
+        return max(1, min(self._workers, len(items)))
@@ -0,0 +1,157 @@
+"""HTTP transport settings for the Strato DNS API."""
+import random
+import typing
+
+# Third party imports are deferred to the code paths using them to keep the CLI startup fast
+if typing.TYPE_CHECKING:
+    import httpx
+    import requests
+
+
+class StratoDnsApiTransport:
+    """Class to create HTTP sessions with timeouts, retries and connection pooling.
+
+    Only idempotent requests (GET, HEAD) are retried by the session itself. A POST of
+    the record set is not retried blindly, StratoDnsApi first reads the record set back
+    to check whether the failed push was applied anyway (see retry_push).
+    """
+
+    DEFAULT_CONNECT_TIMEOUT = 10.0
+    DEFAULT_READ_TIMEOUT = 60.0
+    DEFAULT_RETRIES = 3
+    DEFAULT_BACKOFF_FACTOR = 0.5
+    DEFAULT_BACKOFF_JITTER = 0.5
+    DEFAULT_BACKOFF_MAX = 30.0
+    DEFAULT_POOL_CONNECTIONS = 4
+    DEFAULT_POOL_MAXSIZE = 16
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    RETRY_METHODS = ('GET', 'HEAD')
+
+    @staticmethod
+    def from_dict(
+            data: dict,
+        ) -> 'StratoDnsApiTransport':
+        """Initialize Strato DNS API transport from dictionary.
+
+        :param dict data: Dictionary with transport settings
+
+        :returns: StratoDnsApiTransport instance
+        :rtype: StratoDnsApiTransport
+
+        """
+        return StratoDnsApiTransport(
+            connect_timeout=float(data.get('connect_timeout', StratoDnsApiTransport.DEFAULT_CONNECT_TIMEOUT)),
+            read_timeout=float(data.get('read_timeout', StratoDnsApiTransport.DEFAULT_READ_TIMEOUT)),
+            retries=int(data.get('retries', StratoDnsApiTransport.DEFAULT_RETRIES)),
+            backoff_factor=float(data.get('backoff_factor', StratoDnsApiTransport.DEFAULT_BACKOFF_FACTOR)),
+            backoff_jitter=float(data.get('backoff_jitter', StratoDnsApiTransport.DEFAULT_BACKOFF_JITTER)),
+            backoff_max=float(data.get('backoff_max', StratoDnsApiTransport.DEFAULT_BACKOFF_MAX)),
+            pool_connections=int(data.get('pool_connections', StratoDnsApiTransport.DEFAULT_POOL_CONNECTIONS)),
+            pool_maxsize=int(data.get('pool_maxsize', StratoDnsApiTransport.DEFAULT_POOL_MAXSIZE)),
+            retry_push=bool(data.get('retry_push', True)),
+        )
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        return (self._connect_timeout, self._read_timeout)
+    @property
+    def retries(self) -> int:
+        return self._retries
+    @property
+    def retry_push(self) -> bool:
+        return self._retry_push
+
+    def __init__(
+            self,
+            connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+            read_timeout: float = DEFAULT_READ_TIMEOUT,
+            retries: int = DEFAULT_RETRIES,
+            backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+            backoff_jitter: float = DEFAULT_BACKOFF_JITTER,
+            backoff_max: float = DEFAULT_BACKOFF_MAX,
+            pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+            pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+            retry_push: bool = True,
+        ):
+
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+        self._backoff_jitter = backoff_jitter
+        self._backoff_max = backoff_max
+        # number of hosts to keep connections to, and connections per host (concurrent requests of shared sessions)
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        # retry a failed push of the record set after checking that it was not applied
+        self._retry_push = retry_push
+
+    def create_session(self, headers: typing.Optional[dict] = None) -> 'requests.Session':
+        """Create an HTTP session using these transport settings.
+
+        :param dict headers: Additional default headers of the session
+
+        :returns: Session with retrying, pooling adapters mounted
+        :rtype: requests.Session
+
+        """
+        import requests
+        import requests.adapters
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=self._retries,
+            connect=self._retries,
+            read=self._retries,
+            status=self._retries,
+            status_forcelist=self.RETRY_STATUS_CODES,
+            allowed_methods=frozenset(self.RETRY_METHODS),
+            backoff_factor=self._backoff_factor,
+            backoff_jitter=self._backoff_jitter,
+            backoff_max=self._backoff_max,
+            respect_retry_after_header=True,
+            # the last response is returned instead of raising, callers check the status code
+            raise_on_status=False,
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            max_retries=retry, pool_connections=self._pool_connections, pool_maxsize=self._pool_maxsize)
+
+        session = requests.session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+        session.headers.update(headers or {})
+        return session
+
+    def create_async_client(self, headers: typing.Optional[dict] = None) -> 'httpx.AsyncClient':
+        """Create an asynchronous HTTP client using these transport settings.
+
+        The client does not retry by itself, AsyncStratoDnsApi retries GET requests
+        with backoff(), since httpx only retries failed connections.
+
+        :param dict headers: Additional default headers of the client
+
+        :returns: Client with a bounded connection pool
+        :rtype: httpx.AsyncClient
+
+        """
+        import httpx
+
+        return httpx.AsyncClient(
+            headers={'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive', **(headers or {})},
+            timeout=httpx.Timeout(self._read_timeout, connect=self._connect_timeout),
+            limits=httpx.Limits(max_connections=self._pool_maxsize, max_keepalive_connections=self._pool_maxsize),
+            follow_redirects=True,
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before a retry of the application itself, e.g. of a push.
+
+        :param int attempt: Number of the failed attempt, starting at 1
+
+        :returns: Exponential delay with random jitter in seconds
+        :rtype: float
+
+        """
+        delay = min(self._backoff_factor * (2 ** (attempt - 1)), self._backoff_max)
+        return delay + random.uniform(0, self._backoff_jitter)
@@ -0,0 +1,43 @@
+"""Fixtures running the local fake servers of the benchmarks for the tests."""
+import json
+
+import pytest
+
+import fake_strato
+
+
+@pytest.fixture
+def strato_server():
+    """Factory starting a fake Strato with the given records by root domain, stopped after the test."""
+    servers = []
+
+    def start(domains: dict[str, list[dict]], **kwargs) -> fake_strato.FakeStratoServer:
+        server = fake_strato.FakeStratoServer(fake_strato.FakeStrato(domains=domains, **kwargs))
+        servers.append(server.__enter__())
+        return server
+
+    yield start
+    for server in servers:
+        server.__exit__(None, None, None)
+
+
+@pytest.fixture
+def account_config(tmp_path):
+    """Factory of the config of an account on a fake Strato server, with the locks in the test directory."""
+    def config(server: fake_strato.FakeStratoServer) -> dict:
+        return {
+            'credentials': {'username': server.fake.username, 'password': server.fake.password},
+            'api_url': server.api_url,
+            'locking': {'dir': str(tmp_path / 'locks')},
+        }
+    return config
+
+
+@pytest.fixture
+def config_file(tmp_path, account_config):
+    """Factory writing the config file of an account on a fake Strato server, for the CLI."""
+    def write(server: fake_strato.FakeStratoServer, **settings) -> str:
+        path = tmp_path / 'strato-acme-config.json'
+        path.write_text(json.dumps({**account_config(server), **settings}))
+        return str(path)
+    return write
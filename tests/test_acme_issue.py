@@ -0,0 +1,102 @@
+import os
+import logging
+
+import pytest
+
+pytest.importorskip('cryptography')
+
+import fake_acme
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_acme_client import StratoDnsApiAcmeClient
+from strato_dns_api.strato_dns_api_acme_issue import StratoDnsApiAcmeIssuer
+
+RECORD = {'prefix': 'www', 'type': 'CNAME', 'value': 'target.example.net'}
+
+
+@pytest.fixture
+def issue(tmp_path, strato_server, account_config):
+    """Factory issuing certificates against a fake Strato and a fake ACME server, returning results, servers and cert home."""
+    def run(domains: list[str], records: dict[str, list[dict]], resolver=None, prepare=None, force=False):
+        server = strato_server({root_domain: list(domain_records) for root_domain, domain_records in records.items()})
+        acme = fake_acme.FakeAcme(resolver or fake_acme.strato_resolver(server.fake))
+        with fake_acme.FakeAcmeServer(acme) as acme_server:
+            api = StratoDnsApi.from_config(account_config(server), log_level=logging.WARNING)
+            client = StratoDnsApiAcmeClient(acme_server.directory_url,
+                StratoDnsApiAcmeClient.load_account_key(str(tmp_path / 'account.key')), poll_interval=0.01,
+                log_level=logging.WARNING)
+            issuer = StratoDnsApiAcmeIssuer(api, client, str(tmp_path / 'certs'), propagation_timeout=0,
+                log_level=logging.WARNING)
+            if prepare is not None:
+                prepare(issuer)
+            results = issuer.issue(domains, force=force)
+        return results, server.fake, acme, tmp_path / 'certs'
+    return run
+
+
+def test_issue_publishes_and_removes_challenges_with_one_push_per_root_domain(issue):
+    records = {'example.com': [RECORD], 'example.org': [RECORD]}
+
+    results, strato, acme, certs_dir = issue(['example.com', 'www.example.com', 'example.org'], records)
+
+    assert results == {'example.com': True, 'www.example.com': True, 'example.org': True}
+    # one push publishes and one removes the challenges of all orders of a root domain
+    assert strato.stats['pushes'] == 2 * len(records)
+    assert strato.records == records
+    assert acme.stats['validations'] == 6
+    for domain in results:
+        assert os.path.isfile(certs_dir / domain / 'fullchain.cer')
+
+
+def test_failed_validation_still_removes_challenges(issue):
+    records = {'example.com': [RECORD]}
+
+    results, strato, acme, certs_dir = issue(['example.com'], records, resolver=lambda name: [])
+
+    assert results == {'example.com': False}
+    assert strato.stats['pushes'] == 2
+    assert strato.records == records
+    assert not os.path.exists(certs_dir / 'example.com' / 'fullchain.cer')
+
+
+def test_error_of_one_order_fails_only_that_order(issue):
+    records = {'example.com': [RECORD], 'example.org': [RECORD]}
+
+    def break_example_org(issuer):
+        create_order = issuer._create_order
+
+        def failing(order):
+            if order.domain == 'example.org':
+                raise ConnectionResetError('connection reset')
+            create_order(order)
+        issuer._create_order = failing
+
+    results, strato, acme, certs_dir = issue(['example.com', 'example.org'], records, prepare=break_example_org)
+
+    assert results == {'example.com': True, 'example.org': False}
+    assert strato.records == records
+    assert os.path.isfile(certs_dir / 'example.com' / 'fullchain.cer')
+    assert not os.path.exists(certs_dir / 'example.org')
+
+
+def test_reissued_key_and_certificate_are_switched_together(issue):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+
+    def public_keys(directory):
+        key = serialization.load_pem_private_key((directory / 'example.com.key').read_bytes(), None)
+        certificate = x509.load_pem_x509_certificate((directory / 'example.com.cer').read_bytes())
+        return [k.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+            for k in (key.public_key(), certificate.public_key())]
+
+    _, _, _, certs_dir = issue(['example.com'], {'example.com': [RECORD]})
+    first = os.readlink(certs_dir / 'example.com')
+    first_key, _ = public_keys(certs_dir / 'example.com')
+    results, _, _, _ = issue(['example.com'], {'example.com': [RECORD]}, force=True)
+
+    assert results == {'example.com': True}
+    assert os.readlink(certs_dir / 'example.com') != first
+    key, certificate_key = public_keys(certs_dir / 'example.com')
+    assert key == certificate_key and key != first_key
+    # the previous bundle stays complete for readers that resolved the link before
+    assert public_keys(certs_dir / first) == [first_key, first_key]
+    assert oct((certs_dir / 'example.com' / 'example.com.key').stat().st_mode & 0o777) == oct(0o600)
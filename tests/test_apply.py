@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_lock import StratoDnsApiLock
+
+try:
+    from strato_dns_api.strato_dns_api_async import AsyncStratoDnsApi
+except ImportError:
+    AsyncStratoDnsApi = None
+
+API_CLASSES = [StratoDnsApi, pytest.param(AsyncStratoDnsApi, id='AsyncStratoDnsApi',
+    marks=pytest.mark.skipif(AsyncStratoDnsApi is None, reason='needs httpx'))]
+FOREIGN = {'prefix': 'www', 'type': 'CNAME', 'value': 'target.example.net'}
+
+
+def new_api(api_class, server, account_config, **settings):
+    return api_class.from_config({**account_config(server), 'transport': {'backoff_factor': 0, 'backoff_jitter': 0}, **settings})
+
+
+def apply(api, batch):
+    if not isinstance(api, StratoDnsApi):
+        async def run():
+            async with api:
+                return await api.apply_batch(batch)
+        return asyncio.run(run())
+    return api.apply_batch(batch)
+
+
+def after_call(api, method, hook):
+    """Run hook with the result after every call of a method of the API, returning what the hook returns."""
+    original = getattr(api, method)
+    if not isinstance(api, StratoDnsApi):
+        async def wrapper(*args):
+            return hook(await original(*args))
+    else:
+        def wrapper(*args):
+            return hook(original(*args))
+    setattr(api, method, wrapper)
+
+
+def challenge_batch(api):
+    batch = api.new_batch('example.com')
+    batch.add('_acme-challenge.example.com', 'TXT', 'value1')
+    batch.add('_acme-challenge.example.com', 'TXT', 'value2')
+    return batch
+
+
+@pytest.mark.parametrize('api_class', API_CLASSES)
+def test_batch_pushed_once(api_class, strato_server, account_config):
+    server = strato_server({'example.com': []})
+    api = new_api(api_class, server, account_config)
+
+    result = apply(api, challenge_batch(api))
+
+    assert result and result.changed
+    assert server.fake.stats['pushes'] == 1
+    assert {record['value'] for record in server.fake.records['example.com']} == {'value1', 'value2'}
+
+
+@pytest.mark.parametrize('api_class', API_CLASSES)
+def test_failed_push_applied_anyway_is_not_repeated(api_class, strato_server, account_config):
+    server = strato_server({'example.com': []})
+    api = new_api(api_class, server, account_config)
+    failures = [False]
+    after_call(api, '_push_txt_records', lambda pushed: failures.pop() if failures else pushed)
+
+    result = apply(api, challenge_batch(api))
+
+    assert result and result.changed
+    assert server.fake.stats['pushes'] == 1
+
+
+@pytest.mark.parametrize('api_class', API_CLASSES)
+def test_verify_applies_changes_to_modified_records(api_class, strato_server, account_config):
+    server = strato_server({'example.com': []})
+    api = new_api(api_class, server, account_config, locking={**account_config(server)['locking'], 'verify': True})
+    modified = []
+
+    def modify(records):
+        # another client changes the records after the first read
+        if not modified:
+            server.fake.records['example.com'] = [FOREIGN]
+            modified.append(True)
+        return records
+    after_call(api, '_fetch_records', modify)
+
+    result = apply(api, challenge_batch(api))
+
+    assert result and result.changed
+    assert server.fake.stats['pushes'] == 1
+    assert FOREIGN in server.fake.records['example.com'] and len(server.fake.records['example.com']) == 3
+
+
+@pytest.mark.skipif(AsyncStratoDnsApi is None, reason='needs httpx')
+def test_cancelled_async_batch_does_not_take_the_lock(strato_server, account_config):
+    server = strato_server({'example.com': []})
+    api = new_api(AsyncStratoDnsApi, server, account_config)
+    lock = StratoDnsApiLock(account_config(server)['locking']['dir'], timeout=0)
+
+    async def run():
+        async with api:
+            fd = lock.acquire('example.com')
+            task = asyncio.create_task(api.apply_batch(challenge_batch(api)))
+            await asyncio.sleep(1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            lock.release(fd)
+            await asyncio.sleep(3 * StratoDnsApiLock.POLL_INTERVAL)
+
+    asyncio.run(run())
+
+    fd = lock.acquire('example.com')
+    assert fd is not None
+    lock.release(fd)
+    assert server.fake.stats['pushes'] == 0
+
+
+def cached_api(api_class, server, account_config, cache_dir):
+    return new_api(api_class, server, account_config, cache={'dir': str(cache_dir), 'records_max_age': 300})
+
+
+def read_records(api):
+    if not isinstance(api, StratoDnsApi):
+        async def run():
+            async with api:
+                return await api.get_txt_records('example.com')
+        return asyncio.run(run())
+    return api.get_txt_records('example.com')
+
+
+@pytest.mark.parametrize('api_class', API_CLASSES)
+def test_push_with_expired_cached_session_logs_in_again(api_class, strato_server, account_config, tmp_path):
+    server = strato_server({'example.com': [FOREIGN]})
+    read_records(cached_api(api_class, server, account_config, tmp_path / 'cache'))
+    # the cached session expires, the cached records are still recent
+    server.fake.sessions.clear()
+    api = cached_api(api_class, server, account_config, tmp_path / 'cache')
+
+    result = apply(api, challenge_batch(api))
+
+    assert result and result.changed
+    assert server.fake.stats['pushes'] == 1
+    assert len(server.fake.records['example.com']) == 3
+    cached = read_records(cached_api(api_class, server, account_config, tmp_path / 'cache'))
+    assert sorted(record.value for record in cached) == sorted(r['value'] for r in server.fake.records['example.com'])
+
+
+@pytest.mark.parametrize('api_class', API_CLASSES)
+def test_push_rejected_by_strato_is_not_cached(api_class, strato_server, account_config, tmp_path):
+    server = strato_server({'example.com': [FOREIGN]})
+    read_records(cached_api(api_class, server, account_config, tmp_path / 'cache'))
+    # the domain moved to another package, Strato shows the package overview for the cached one
+    server.fake.packages = {'200': 'example.com'}
+    api = cached_api(api_class, server, account_config, tmp_path / 'cache')
+
+    result = apply(api, challenge_batch(api))
+
+    assert result and result.changed
+    assert server.fake.stats['pushes'] == 1
+    assert len(server.fake.records['example.com']) == 3
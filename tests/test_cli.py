@@ -0,0 +1,100 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from strato_dns_api.__main__ import cli
+
+
+def run(config: str, *args: str, input: str = None):
+    return CliRunner().invoke(cli, ['--config', config, '--log-level', 'WARNING', *args], input=input)
+
+
+def test_apply_pushes_once_per_domain(strato_server, config_file):
+    server = strato_server({'example.com': [{'prefix': '_acme-challenge', 'type': 'TXT', 'value': 'old'}]})
+    operations = [
+        {'action': 'add', 'domain': '_acme-challenge.example.com', 'type': 'TXT', 'value': 'new'},
+        {'action': 'remove', 'domain': '_acme-challenge.example.com', 'type': 'TXT', 'value': 'old'},
+    ]
+
+    result = run(config_file(server), 'apply', '--file', '-', input=json.dumps(operations))
+
+    assert result.exit_code == 0, result.output
+    assert server.fake.records['example.com'] == [{'prefix': '_acme-challenge', 'type': 'TXT', 'value': 'new'}]
+    assert server.fake.stats['pushes'] == 1
+
+
+@pytest.mark.parametrize('operations, message', [
+    ('{"action": "add"}', 'Expected a list of operations'),
+    ('[1]', 'Invalid operation 0: expected an object'),
+    ('[{"action": "add", "domain": "example.com", "type": "TXT", "value": "v"}, {"action": "remove", "type": "TXT"}]',
+        'Invalid operation 1: "domain" is missing'),
+    ('[{"action": "add", "domain": "example.com", "type": "TXT"}]', 'Invalid operation 0: "value" is missing'),
+    ('[{"action": "move", "domain": "example.com", "type": "TXT"}]', 'Invalid operation 0: "action"'),
+    ('[{"action": "add", "domain": "example.com", "type": "A", "value": "v"}]', 'Invalid operation 0: "type"'),
+    ('not json', 'Invalid JSON'),
+])
+def test_apply_rejects_invalid_operations(strato_server, config_file, operations, message):
+    server = strato_server({'example.com': []})
+
+    result = run(config_file(server), 'apply', '--file', '-', input=operations)
+
+    assert result.exit_code == 2
+    assert message in result.output
+    assert not isinstance(result.exception, (AttributeError, KeyError, TypeError))
+    assert server.fake.stats['requests'] == 0
+
+
+@pytest.mark.parametrize('state, message', [
+    ('["example.com"]', 'Desired state must be an object'),
+    ('{"example.com": {"prefix": "_dmarc"}}', 'Records of example.com must be a list'),
+    ('{"example.com": ["_dmarc"]}', 'Invalid record of example.com, expected an object'),
+    ('{"example.com": [{"prefix": "_dmarc", "type": "A", "value": "v"}]}', 'Invalid record of example.com'),
+    ('{"example.com": [{"prefix": "_dmarc", "type": "TXT", "value": 1}]}', 'Invalid record of example.com'),
+])
+def test_sync_rejects_invalid_state(strato_server, config_file, state, message):
+    server = strato_server({'example.com': []})
+
+    result = run(config_file(server), 'sync', '--file', '-', input=state)
+
+    assert result.exit_code == 2
+    assert message in result.output
+    assert server.fake.stats['requests'] == 0
+
+
+def test_sync_prunes_and_applies(strato_server, config_file):
+    server = strato_server({'example.com': [
+        {'prefix': '_dmarc', 'type': 'TXT', 'value': 'old'},
+        {'prefix': 'www', 'type': 'CNAME', 'value': 'old.example.net'},
+        {'prefix': '_acme-challenge', 'type': 'TXT', 'value': 'challenge'},
+    ]})
+    state = json.dumps({'example.com': [{'prefix': '_dmarc', 'type': 'TXT', 'value': 'new'}]})
+
+    result = run(config_file(server), 'sync', '--prune', '--dry-run', '--file', '-', input=state)
+    assert result.exit_code == 0, result.output
+    assert '- TXT _dmarc = old' in result.output
+    assert '- CNAME www = old.example.net' in result.output
+    assert '+ TXT _dmarc = new' in result.output
+    assert server.fake.stats['pushes'] == 0
+
+    result = run(config_file(server), 'sync', '--prune', '--file', '-', input=state)
+    assert result.exit_code == 0, result.output
+    assert sorted(r['value'] for r in server.fake.records['example.com']) == ['challenge', 'new']
+
+
+def test_sync_skips_domains_whose_records_cannot_be_read(strato_server, config_file):
+    server = strato_server({'example.com': []})
+    state = json.dumps({
+        'example.com': [{'prefix': '_dmarc', 'type': 'TXT', 'value': 'new'}],
+        'example.org': [{'prefix': '_dmarc', 'type': 'TXT', 'value': 'new'}],
+    })
+
+    result = run(config_file(server), 'sync', '--dry-run', '--file', '-', input=state)
+    assert result.exit_code == 1
+    assert 'example.org: cannot read records, skipped' in result.output
+    assert result.output.count('+ TXT _dmarc = new') == 1
+
+    result = run(config_file(server), 'sync', '--file', '-', input=state)
+    assert result.exit_code == 1
+    assert server.fake.records['example.com'] == [{'prefix': '_dmarc', 'type': 'TXT', 'value': 'new'}]
+    assert 'example.org' not in server.fake.records
@@ -0,0 +1,49 @@
+import os
+
+from strato_dns_api.strato_dns_api_deploy import StratoDnsApiDeployer
+
+
+def bundle(domain: str, serial: int) -> dict[str, bytes]:
+    return {name: f'{name} {serial}'.encode() for name in StratoDnsApiDeployer.bundle_files(domain)}
+
+
+def read(deploy_dir, domain: str) -> dict[str, bytes]:
+    directory = os.path.join(deploy_dir, domain)
+    return {name: open(os.path.join(directory, name), 'rb').read() for name in os.listdir(directory)}
+
+
+def test_deploy_switches_whole_bundle(tmp_path):
+    deployer = StratoDnsApiDeployer(str(tmp_path), markers=False)
+
+    assert deployer.deploy({'example.com': bundle('example.com', 1)}) == ['example.com']
+    first = os.readlink(tmp_path / 'example.com')
+    assert deployer.deploy({'example.com': bundle('example.com', 1)}) == []
+    assert deployer.deploy({'example.com': bundle('example.com', 2)}) == ['example.com']
+
+    assert os.readlink(tmp_path / 'example.com') != first
+    assert read(tmp_path, 'example.com') == bundle('example.com', 2)
+    # the previous bundle stays complete for readers that resolved the link before
+    assert read(tmp_path, first) == bundle('example.com', 1)
+    assert oct((tmp_path / 'example.com' / 'example.com.key').stat().st_mode & 0o777) == oct(0o600)
+
+
+def test_deploy_keeps_current_and_previous_bundle_only(tmp_path):
+    deployer = StratoDnsApiDeployer(str(tmp_path), markers=False)
+
+    for serial in range(4):
+        deployer.deploy({'example.com': bundle('example.com', serial)})
+
+    assert len(os.listdir(tmp_path / StratoDnsApiDeployer.BUNDLES_DIR / 'example.com')) == StratoDnsApiDeployer.KEEP_BUNDLES
+    assert read(tmp_path, 'example.com') == bundle('example.com', 3)
+
+
+def test_deploy_replaces_directory_written_in_place(tmp_path):
+    (tmp_path / 'example.com').mkdir()
+    for name, content in bundle('example.com', 1).items():
+        (tmp_path / 'example.com' / name).write_bytes(content)
+    deployer = StratoDnsApiDeployer(str(tmp_path), markers=False)
+
+    assert deployer.deploy({'example.com': bundle('example.com', 2)}) == ['example.com']
+
+    assert os.path.islink(tmp_path / 'example.com')
+    assert read(tmp_path, 'example.com') == bundle('example.com', 2)
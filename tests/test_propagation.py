@@ -0,0 +1,151 @@
+import time
+import socket
+import threading
+
+import dns.message
+import dns.rrset
+import dns.rdatatype
+import dns.resolver
+import pytest
+
+from strato_dns_api.strato_dns_api_propagation import StratoDnsApiPropagation
+
+
+class StubDns:
+    """UDP nameserver on localhost answering TXT queries from a dict."""
+
+    def __init__(self):
+        self.records: dict[str, list[str]] = {}
+        self.queries = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(('127.0.0.1', 0))
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._socket.getsockname()
+
+    def close(self):
+        self._socket.close()
+
+    def _serve(self):
+        while True:
+            try:
+                data, client = self._socket.recvfrom(4096)
+            except OSError:
+                return
+            self.queries += 1
+            query = dns.message.from_wire(data)
+            response = dns.message.make_response(query)
+            name = query.question[0].name.to_text().rstrip('.')
+            if name in self.records:
+                response.answer.append(dns.rrset.from_text(name + '.', 60, 'IN', 'TXT',
+                    *[f'"{value}"' for value in self.records[name]]))
+            self._socket.sendto(response.to_wire(), client)
+
+
+@pytest.fixture
+def stub_dns():
+    server = StubDns()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def silent_address():
+    """Address of a UDP socket that never answers, like an unreachable nameserver address."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    yield sock.getsockname()
+    sock.close()
+
+
+def test_wait_served(stub_dns):
+    stub_dns.records['_acme-challenge.example.com'] = ['other', 'value']
+    propagation = StratoDnsApiPropagation(nameservers=[stub_dns.address], query_timeout=0.5)
+
+    assert propagation.wait('_acme-challenge.example.com', 'value', 'example.com', timeout=5)
+
+
+def test_wait_times_out_if_not_served(stub_dns):
+    stub_dns.records['_acme-challenge.example.com'] = ['other']
+    propagation = StratoDnsApiPropagation(nameservers=[stub_dns.address], query_timeout=0.5)
+
+    start = time.monotonic()
+    assert not propagation.wait('_acme-challenge.example.com', 'value', 'example.com', timeout=1.5)
+    assert time.monotonic() - start < 5
+    assert stub_dns.queries >= 2
+
+
+def test_wait_until_value_appears(stub_dns):
+    propagation = StratoDnsApiPropagation(nameservers=[stub_dns.address], query_timeout=0.5)
+    threading.Timer(0.5, lambda: stub_dns.records.update({'_acme-challenge.example.com': ['value']})).start()
+
+    assert propagation.wait('_acme-challenge.example.com', 'value', 'example.com', timeout=10)
+
+
+def test_wait_one_answering_address_per_nameserver_is_enough(stub_dns, silent_address):
+    stub_dns.records['_acme-challenge.example.com'] = ['value']
+    propagation = StratoDnsApiPropagation(query_timeout=5)
+    propagation.authoritative_nameservers = lambda zone: {'ns1.example.net.': [silent_address, stub_dns.address]}
+
+    start = time.monotonic()
+    assert propagation.wait('_acme-challenge.example.com', 'value', 'example.com', timeout=30)
+    # the silent address is not waited for
+    assert time.monotonic() - start < 3
+
+
+def test_wait_fails_if_a_nameserver_does_not_answer(stub_dns, silent_address):
+    stub_dns.records['_acme-challenge.example.com'] = ['value']
+    propagation = StratoDnsApiPropagation(query_timeout=0.2)
+    propagation.authoritative_nameservers = lambda zone: {
+        'ns1.example.net.': [stub_dns.address],
+        'ns2.example.net.': [silent_address],
+    }
+
+    assert not propagation.wait('_acme-challenge.example.com', 'value', 'example.com', timeout=1)
+
+
+class FakeResolver:
+    """Resolver of the NS records and addresses of example.com."""
+
+    answers = {
+        ('example.com', 'NS'): ['ns1.example.net.', 'ns2.example.net.'],
+        ('ns1.example.net.', 'A'): ['192.0.2.1'],
+        ('ns1.example.net.', 'AAAA'): ['2001:db8::1'],
+        ('ns2.example.net.', 'AAAA'): ['2001:db8::2'],
+    }
+
+    errors = {}
+
+    def resolve(self, name, rdtype):
+        key = (name if isinstance(name, str) else name.to_text(), rdtype)
+        if key in self.errors:
+            raise self.errors[key]
+        if key not in self.answers:
+            raise dns.resolver.NoAnswer()
+        return [dns.rdata.from_text('IN', rdtype, value) for value in self.answers[key]]
+
+
+@pytest.mark.parametrize('ipv6, expected', [
+    (True, {'ns1.example.net.': [('192.0.2.1', 53), ('2001:db8::1', 53)], 'ns2.example.net.': [('2001:db8::2', 53)]}),
+    (False, {'ns1.example.net.': [('192.0.2.1', 53)]}),
+])
+def test_authoritative_nameservers_by_host(monkeypatch, ipv6, expected):
+    monkeypatch.setattr(dns.resolver, 'Resolver', FakeResolver)
+    monkeypatch.setattr(StratoDnsApiPropagation, '_ipv6_routable', staticmethod(lambda: ipv6))
+
+    assert StratoDnsApiPropagation().authoritative_nameservers('example.com') == expected
+
+
+def test_authoritative_nameservers_skips_addresses_that_cannot_be_resolved(monkeypatch):
+    class FailingResolver(FakeResolver):
+        errors = {
+            ('ns1.example.net.', 'A'): dns.resolver.LifetimeTimeout(timeout=5.0, errors=[]),
+            ('ns2.example.net.', 'AAAA'): dns.resolver.NoNameservers(),
+        }
+    monkeypatch.setattr(dns.resolver, 'Resolver', FailingResolver)
+    monkeypatch.setattr(StratoDnsApiPropagation, '_ipv6_routable', staticmethod(lambda: True))
+
+    assert StratoDnsApiPropagation().authoritative_nameservers('example.com') == {'ns1.example.net.': [('2001:db8::1', 53)]}
@@ -0,0 +1,75 @@
+from strato_dns_api.strato_dns_api import StratoDnsApi
+
+CHALLENGE = {'prefix': '_acme-challenge', 'type': 'TXT', 'value': 'value'}
+
+
+def new_api(server, account_config):
+    return StratoDnsApi.from_config({**account_config(server), 'transport': {'backoff_factor': 0, 'backoff_jitter': 0}})
+
+
+def test_add_existing_record_is_not_pushed(strato_server, account_config):
+    server = strato_server({'example.com': [CHALLENGE]})
+    api = new_api(server, account_config)
+
+    result = api.add_txt_record('_acme-challenge.example.com', 'TXT', 'value')
+
+    assert result and not result.changed
+    assert server.fake.stats['pushes'] == 0
+    assert server.fake.records['example.com'] == [CHALLENGE]
+
+
+def test_add_record_twice_is_pushed_once(strato_server, account_config):
+    server = strato_server({'example.com': [CHALLENGE]})
+    api = new_api(server, account_config)
+
+    first = api.add_txt_record('_acme-challenge.example.com', 'TXT', 'other')
+    second = api.add_txt_record('_acme-challenge.example.com', 'TXT', 'other')
+
+    assert first and first.changed
+    assert second and not second.changed
+    assert server.fake.stats['pushes'] == 1
+    assert server.fake.records['example.com'] == [CHALLENGE, {**CHALLENGE, 'value': 'other'}]
+
+
+def test_overwrite_with_same_value_is_not_pushed(strato_server, account_config):
+    server = strato_server({'example.com': [CHALLENGE]})
+    api = new_api(server, account_config)
+
+    result = api.add_txt_record('_acme-challenge.example.com', 'TXT', 'value', overwrite=True)
+
+    assert result and not result.changed
+    assert server.fake.stats['pushes'] == 0
+
+
+def test_remove_missing_record_is_not_pushed(strato_server, account_config):
+    server = strato_server({'example.com': [CHALLENGE]})
+    api = new_api(server, account_config)
+
+    missing_value = api.remove_txt_record('_acme-challenge.example.com', 'TXT', 'other')
+    missing_name = api.remove_txt_record('_acme-challenge.www.example.com', 'TXT')
+
+    assert missing_value and not missing_value.changed
+    assert missing_name and not missing_name.changed
+    assert server.fake.stats['pushes'] == 0
+    assert server.fake.records['example.com'] == [CHALLENGE]
+
+
+def test_remove_existing_record_is_pushed(strato_server, account_config):
+    server = strato_server({'example.com': [CHALLENGE]})
+    api = new_api(server, account_config)
+
+    result = api.remove_txt_record('_acme-challenge.example.com', 'TXT', 'value')
+
+    assert result and result.changed
+    assert server.fake.stats['pushes'] == 1
+    assert server.fake.records['example.com'] == []
+
+
+def test_change_of_unknown_domain_fails_unchanged(strato_server, account_config):
+    server = strato_server({'example.com': []})
+    api = new_api(server, account_config)
+
+    result = api.add_txt_record('_acme-challenge.example.org', 'TXT', 'value')
+
+    assert not result and not result.changed
+    assert server.fake.stats['pushes'] == 0
@@ -0,0 +1,61 @@
+import fixtures
+import pytest
+
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecord
+from strato_dns_api.strato_dns_api_record_parser import StratoDnsApiRecordParser
+
+
+@pytest.mark.parametrize('pretty', [False, True])
+def test_parse_fixture_page(pretty):
+    expected = fixtures.records(20)
+    page = fixtures.records_page('example.com', expected, pretty=pretty)
+
+    assert [record._asdict() for record in StratoDnsApiRecordParser.parse(page)] == expected
+
+
+def test_parse_attributes_in_any_order_and_entities():
+    page = (
+        '<select name="type" class="form-select"><option value="TXT">TXT</option>'
+        '<option selected value="CNAME">CNAME</option></select>'
+        '<input name="prefix" type="text" value="www&amp;co">'
+        '<textarea rows="2" name="value">target.example.net &lt;x&gt;</textarea>'
+    )
+
+    assert StratoDnsApiRecordParser.parse(page) == [StratoDnsApiRecord('www&co', 'CNAME', 'target.example.net <x>')]
+
+
+def test_parse_does_not_pair_across_records():
+    page = (
+        # first record without value
+        '<select class="form-select" name="type"><option value="TXT" selected="selected">TXT</option></select>'
+        '<input type="text" value="first" name="prefix">'
+        # second record without prefix
+        '<select class="form-select" name="type"><option value="TXT" selected="selected">TXT</option></select>'
+        '<textarea class="form-control" name="value">second</textarea>'
+        '<select class="form-select" name="type"><option value="TXT" selected="selected">TXT</option></select>'
+        '<input type="text" value="third" name="prefix">'
+        '<textarea class="form-control" name="value">third</textarea>'
+    )
+
+    assert StratoDnsApiRecordParser.parse(page) == [StratoDnsApiRecord('third', 'TXT', 'third')]
+
+
+def test_parse_uppercase_tags_and_attributes():
+    page = (
+        '<SELECT NAME="type"><OPTION VALUE="TXT" SELECTED>TXT</OPTION></SELECT>'
+        '<INPUT TYPE="text" NAME="prefix" VALUE="_acme-challenge">'
+        '<TEXTAREA NAME="value">Token</TEXTAREA>'
+    )
+
+    assert StratoDnsApiRecordParser.parse(page) == [StratoDnsApiRecord('_acme-challenge', 'TXT', 'Token')]
+
+
+def test_parse_attributes_separated_by_any_whitespace():
+    page = (
+        '<select\n  class="form-select"\n  name = "type">\n'
+        '<option\tselected\n\tvalue="CNAME">CNAME</option>\n</select>\n'
+        '<input  type="text"\n       value="www"   name="prefix">\n'
+        '<textarea\r\n  name="value"  rows="2">target.example.net</textarea>'
+    )
+
+    assert StratoDnsApiRecordParser.parse(page) == [StratoDnsApiRecord('www', 'CNAME', 'target.example.net')]
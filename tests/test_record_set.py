@@ -0,0 +1,85 @@
+import pytest
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_record_set import StratoDnsApiRecord, StratoDnsApiRecordSet
+
+WWW = StratoDnsApiRecord('www', 'CNAME', 'target.example.net')
+FIRST = StratoDnsApiRecord('_acme-challenge', 'TXT', 'value')
+SECOND = StratoDnsApiRecord('_acme-challenge', 'TXT', 'value2')
+
+
+def test_record_is_immutable_without_instance_dict():
+    with pytest.raises(AttributeError):
+        FIRST.value = 'other'
+    with pytest.raises(AttributeError):
+        FIRST.__dict__
+
+    assert FIRST == StratoDnsApiRecord('_acme-challenge', 'TXT', 'value')
+    assert len({FIRST, StratoDnsApiRecord(*FIRST)}) == 1
+
+
+def test_records_indexed_by_prefix_and_type_in_order():
+    records = StratoDnsApiRecordSet([SECOND, WWW, FIRST])
+
+    assert list(records) == [SECOND, WWW, FIRST]
+    assert records.get('_acme-challenge', 'TXT') == [SECOND, FIRST]
+    assert records.get('_acme-challenge', 'CNAME') == []
+    assert records.names() == [('_acme-challenge', 'TXT'), ('www', 'CNAME')]
+
+
+def test_add_and_remove_exact_values():
+    records = StratoDnsApiRecordSet([FIRST, SECOND])
+
+    assert not records.add(FIRST)
+    assert not records.remove(StratoDnsApiRecord('_acme-challenge', 'TXT', 'val'))
+    assert not records.remove(StratoDnsApiRecord('_acme-challenge', 'CNAME', 'value'))
+    assert list(records) == [FIRST, SECOND]
+
+    assert records.remove(FIRST)
+    assert list(records) == [SECOND] and records.get('_acme-challenge', 'TXT') == [SECOND]
+    assert records.remove(SECOND)
+    assert len(records) == 0 and records.names() == []
+
+
+def test_remove_all_of_a_name():
+    records = StratoDnsApiRecordSet([FIRST, WWW, SECOND])
+
+    assert records.remove_all('_acme-challenge', 'TXT') == [FIRST, SECOND]
+    assert records.remove_all('_acme-challenge', 'TXT') == []
+    assert list(records) == [WWW]
+
+
+def test_copy_equality_and_diff():
+    records = StratoDnsApiRecordSet([FIRST, WWW])
+    changed = records.copy()
+    changed.remove(FIRST)
+    changed.add(SECOND)
+
+    assert list(records) == [FIRST, WWW]
+    assert records == StratoDnsApiRecordSet([WWW, FIRST])
+    assert records != changed
+    assert records.diff(changed) == ([SECOND], [FIRST])
+    assert records.diff(records.copy()) == ([], [])
+
+
+def test_serialization():
+    records = StratoDnsApiRecordSet([FIRST, WWW])
+
+    assert records.to_form_fields() == {
+        'prefix': ['_acme-challenge', 'www'],
+        'type': ['TXT', 'CNAME'],
+        'value': ['value', 'target.example.net'],
+    }
+    assert StratoDnsApiRecordSet.from_list(records.to_list()) == records
+    with pytest.raises(KeyError):
+        StratoDnsApiRecordSet.from_list([{'prefix': 'www', 'type': 'CNAME'}])
+
+
+def test_remove_value_keeps_values_containing_it(strato_server, account_config):
+    server = strato_server({'example.com': [r._asdict() for r in (FIRST, SECOND)]})
+    api = StratoDnsApi.from_config(account_config(server))
+
+    assert api.remove_txt_record('_acme-challenge.example.com', 'TXT', 'value')
+
+    assert server.fake.records['example.com'] == [SECOND._asdict()]
+    assert list(api.get_txt_records('example.com')) == [SECOND]
@@ -0,0 +1,109 @@
+import os
+import logging
+
+import pytest
+
+from strato_dns_api.strato_dns_api import StratoDnsApi
+from strato_dns_api.strato_dns_api_renewal import StratoDnsApiRenewalScheduler
+
+CERTS_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'acme')
+
+
+class FakeIssuer:
+    """Records the renewals instead of running acme.sh, failing the first ones if asked to."""
+
+    def __init__(self, failures: int = 0, after_renew=None):
+        self.renewals = []
+        self._failures = failures
+        self._after_renew = after_renew
+
+    def renew(self, domains: list[str], options: dict[str, list[str]]) -> dict[str, bool]:
+        self.renewals.append((domains, options))
+        if self._after_renew is not None:
+            self._after_renew()
+        if len(self.renewals) <= self._failures:
+            raise RuntimeError('acme.sh crashed')
+        return {domain: True for domain in domains}
+
+
+@pytest.fixture
+def scheduler(strato_server, account_config):
+    """Factory of a scheduler over the fixture cert home, never logging in to the fake Strato."""
+    server = strato_server({})
+
+    def create(certs_dir: str = CERTS_DIR, issuer=None, **kwargs) -> StratoDnsApiRenewalScheduler:
+        api = StratoDnsApi.from_config(account_config(server), log_level=logging.WARNING)
+        return StratoDnsApiRenewalScheduler(api, certs_dir, issuer or FakeIssuer(), log_level=logging.DEBUG, **kwargs)
+    return create
+
+
+def test_scan_reads_issued_certificates_and_prefers_ecc(scheduler):
+    certificates = scheduler(jitter=0).scan()
+
+    assert [(c.domain, c.root_domain, c.next_renew_time, c.ecc) for c in certificates] == [
+        ('example.com', 'example.com', 1700000000, False),
+        ('www.example.com', 'example.com', 1700100000, True),
+        ('example.org', 'example.org', 1800000000, False),
+    ]
+    assert certificates[1].conf_file == os.path.join(CERTS_DIR, 'www.example.com_ecc', 'www.example.com.conf')
+
+
+def test_scan_missing_cert_home_finds_nothing(scheduler, tmp_path, caplog):
+    renewal = scheduler(str(tmp_path / 'missing'))
+
+    assert renewal.scan() == []
+    assert renewal.certificates == []
+    assert 'Cannot read certificates' in caplog.text
+
+
+def test_scheduled_time_adds_stable_jitter(scheduler):
+    certificates = scheduler().scan()
+    jitter = StratoDnsApiRenewalScheduler.DEFAULT_JITTER
+
+    times = [scheduler().scheduled_time(c) for c in certificates]
+    assert times == [scheduler().scheduled_time(c) for c in certificates]
+    for certificate, scheduled in zip(certificates, times):
+        assert certificate.next_renew_time <= scheduled < certificate.next_renew_time + jitter
+    # certificates due at the same time are spread
+    same_time = [c._replace(next_renew_time=1700000000) for c in certificates]
+    assert len({scheduler().scheduled_time(c) for c in same_time}) == len(same_time)
+    # a new renewal time draws a new delay
+    renewed = certificates[0]._replace(next_renew_time=certificates[0].next_renew_time + 5184000)
+    assert scheduler().scheduled_time(renewed) - renewed.next_renew_time != times[0] - certificates[0].next_renew_time
+    assert scheduler(jitter=0).scheduled_time(certificates[0]) == certificates[0].next_renew_time
+
+
+def test_due_renews_certificates_of_the_group_within_the_window(scheduler):
+    renewal = scheduler(jitter=0, group_window=0)
+    renewal.scan()
+
+    assert renewal.due(1699999999) == []
+    assert [[c.domain for c in group] for group in renewal.due(1700000000)] == [['example.com']]
+
+    renewal = scheduler(jitter=0, group_window=100000)
+    renewal.scan()
+    assert [[c.domain for c in group] for group in renewal.due(1700000000)] == [['example.com', 'www.example.com']]
+
+
+def test_run_forces_certificates_renewed_before_they_are_due(scheduler):
+    issuer = FakeIssuer()
+    renewal = scheduler(issuer=issuer, jitter=0, group_window=100000)
+
+    assert renewal.run(1700000000) == {'example.com': True, 'www.example.com': True}
+    assert issuer.renewals == [(['example.com', 'www.example.com'], {'example.com': [], 'www.example.com': ['--ecc', '--force']})]
+
+
+def test_run_forever_continues_after_failed_run(scheduler, caplog):
+    renewal = None
+
+    def stop_after_retry():
+        if len(issuer.renewals) == 2:
+            renewal.stop()
+    issuer = FakeIssuer(failures=1, after_renew=stop_after_retry)
+    renewal = scheduler(issuer=issuer)
+
+    renewal.run_forever(check_interval=0.01)
+
+    assert len(issuer.renewals) == 2
+    assert 'Renewal run failed.' in caplog.text
+    assert 'acme.sh crashed' in caplog.text
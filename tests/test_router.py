@@ -0,0 +1,50 @@
+from strato_dns_api.strato_dns_api_router import StratoDnsApiRouter
+from strato_dns_api.strato_dns_api_package_index import StratoDnsApiPackageIndex
+
+
+def test_package_index_matches_whole_labels_only():
+    index = StratoDnsApiPackageIndex({'1': 'Domains: myexample.com', '2': 'Domains: www.example.org'})
+
+    assert index.lookup('myexample.com') == '1'
+    assert index.lookup('example.com') is None
+    assert index.lookup('example.org') == '2'
+    assert index.lookup('example.org', exact=True) is None
+
+
+def test_route_prefers_exact_match_over_earlier_account(strato_server, account_config):
+    first = strato_server({'myexample.com': []})
+    second = strato_server({'example.com': []})
+    router = StratoDnsApiRouter.from_dict({'accounts': [
+        {'name': 'first', **account_config(first)},
+        {'name': 'second', **account_config(second)},
+    ]})
+
+    assert router.route('_acme-challenge.example.com') is router.api('second')
+    assert router.add_txt_record('_acme-challenge.example.com', 'TXT', 'value')
+    assert second.fake.records['example.com'] == [{'prefix': '_acme-challenge', 'type': 'TXT', 'value': 'value'}]
+    assert first.fake.records['myexample.com'] == []
+
+
+def test_route_configured_domains_without_login(strato_server, account_config):
+    first = strato_server({'example.com': []})
+    second = strato_server({'example.org': []})
+    router = StratoDnsApiRouter.from_dict({'accounts': [
+        {'name': 'first', **account_config(first)},
+        {'name': 'second', 'domains': ['example.org'], **account_config(second)},
+    ]})
+
+    assert router.known_account('www.example.org') == 'second'
+    assert router.route('www.example.org') is router.api('second')
+    assert first.fake.stats['logins'] == 0 and second.fake.stats['logins'] == 0
+
+
+def test_route_unknown_domain(strato_server, account_config):
+    first = strato_server({'example.com': []})
+    second = strato_server({'example.org': []})
+    router = StratoDnsApiRouter.from_dict({'accounts': [
+        {'name': 'first', **account_config(first)},
+        {'name': 'second', **account_config(second)},
+    ]})
+
+    assert router.route('example.net') is None
+    assert not router.add_txt_record('_acme-challenge.example.net', 'TXT', 'value')